@@ -3,9 +3,7 @@ load_dotenv()
 
 import logging
 import gradio as gr
-import uuid
 import os
-import time
 
 from pathlib import Path
 from config import (
@@ -19,7 +17,12 @@ from config import (
 from services.audio_service import AudioService
 from services.video_service import VideoService
 from services.file_service import FileService
-from services.task_service import TaskService, TaskType, TaskPriority, TaskStatus
+from services.task_service import TaskService, TaskType, TaskPriority, TaskStatus, DEFERRED
+from services.http_client import http_client
+from services.async_http import event_loop
+from services.ingest_service import IngestService
+from services.model_catalog import model_catalog
+from services import wav_io
 import mimetypes
 from datetime import datetime
 import json
@@ -314,9 +317,11 @@ h1 {
 
 class HeyGemApp:
     def __init__(self):
-        self.audio_service = AudioService()
-        self.video_service = VideoService()
+        self.audio_service = AudioService(http_client=http_client)
+        self.video_service = VideoService(http_client=http_client)
         self.file_service = FileService()
+        self.model_catalog = model_catalog
+        self.ingest_service = IngestService(catalog=self.model_catalog)
         self.task_service = TaskService()
         self.current_user = None
         self.is_logged_in = False
@@ -847,17 +852,50 @@ class HeyGemApp:
                 "model_name": model_name
             }
             
+            username = self.current_user
+
             def train_model_task(task):
-                # 这里是实际的训练逻辑
-                # 在实际应用中，这里应该调用模型训练API
+                # 本用户已训练过相同内容时直接复用代理视频与训练结果
+                trained = self.ingest_service.find_trained(file_path, username)
+                if trained:
+                    record = self.ingest_service.reuse(file_path, username, trained, name=model_name)
+                    return {
+                        "model_name": model_name,
+                        "reference_audio": record["training"].get("asr_format_audio_url"),
+                        "reference_text": record["training"].get("reference_audio_text")
+                    }
+
+                # 生成标准化的渲染代理视频，之后的渲染都使用代理视频
+                try:
+                    self.ingest_service.ingest(file_path, username)
+                except Exception as e:
+                    logger.error(f"生成渲染代理视频失败，将使用原视频: {str(e)}")
+
+                # 记录时长与缩略图，生成视频时无需再读取文件
+                file_info = self.file_service.get_file_info(file_path) or {}
+                self.model_catalog.update(
+                    username,
+                    file_path.stem,
+                    name=model_name,
+                    duration=file_info.get("duration"),
+                    thumbnail=file_info.get("thumbnail")
+                )
+
+                # 提取参考音频并训练声音模型
                 logger.info(f"开始训练模型: {model_name}")
-                time.sleep(5)  # 模拟训练过程
+                audio_path = self.file_service.get_user_tts_dir(username) / f"{file_path.stem}.wav"
+                if not self.audio_service.extract_audio(file_path, audio_path):
+                    raise RuntimeError("提取参考音频失败")
+                result = self.audio_service.train_voice_model(audio_path)
+                if not result:
+                    raise RuntimeError("声音模型训练失败")
+                self.model_catalog.set_training_result(username, file_path.stem, result)
                 
                 # 返回训练结果
                 return {
                     "model_name": model_name,
-                    "reference_audio": f"https://example.com/audio/{model_name}.wav",
-                    "reference_text": "这是一段参考文本，用于测试语音合成效果。"
+                    "reference_audio": result.get("asr_format_audio_url"),
+                    "reference_text": result.get("reference_audio_text")
                 }
             
             task_id = self.task_service.create_task(
@@ -891,14 +929,20 @@ class HeyGemApp:
             }
             
             def synthesize_audio_task(task):
-                # 这里是实际的音频合成逻辑
                 logger.info(f"开始合成音频，文本长度: {len(text)}")
-                time.sleep(3)  # 模拟合成过程
+                # 流式合成，边接收边写入并更新任务进度；请求在共享事件循环上执行
+                audio_path = event_loop.run(self.audio_service.synthesize_audio_async(
+                    text,
+                    reference_audio=reference_audio,
+                    reference_text=reference_text,
+                    username=task.username,
+                    task_id=task.task_id
+                ))
                 
                 # 返回合成结果
                 return {
-                    "audio_path": f"/tmp/audio_{uuid.uuid4()}.wav",
-                    "duration": len(text) * 0.1  # 模拟音频时长
+                    "audio_path": audio_path,
+                    "duration": wav_io.read_info(Path(audio_path)).duration
                 }
             
             task_id = self.task_service.create_task(
@@ -915,6 +959,46 @@ class HeyGemApp:
             logger.error(f"音频合成失败: {str(e)}")
             return None, f"音频合成失败: {str(e)}"
 
+    def synthesize_batch(self, texts, model_name, username=None):
+        """批量合成音频：同一模特的声音合成多条文案"""
+        try:
+            texts = [text.strip() for text in texts if text and text.strip()]
+            if not texts:
+                return None, "错误：请输入要合成的文本"
+            
+            model_result = self.get_model_training_result(model_name)
+            if not model_result:
+                return None, "错误: 未找到模型训练结果"
+            
+            params = {
+                "texts": texts,
+                "model_name": model_name
+            }
+            
+            def synthesize_batch_task(task):
+                logger.info(f"开始批量合成音频，共 {len(texts)} 条")
+                return self.audio_service.synthesize_batch(
+                    texts,
+                    model_result,
+                    username=task.username,
+                    task_id=task.task_id
+                )
+            
+            task_id = self.task_service.create_task(
+                task_type=TaskType.AUDIO_BATCH_SYNTHESIS,
+                params=params,
+                username=username or self.current_user,
+                priority=TaskPriority.NORMAL,
+                callback=synthesize_batch_task,
+                affinity_key=model_result.get("asr_format_audio_url")
+            )
+            
+            return task_id, f"已创建批量合成任务，任务ID: {task_id}"
+            
+        except Exception as e:
+            logger.error(f"批量合成失败: {str(e)}")
+            return None, f"批量合成失败: {str(e)}"
+
     def make_video(self, video_path, audio_path):
         """生成视频"""
         try:
@@ -928,17 +1012,18 @@ class HeyGemApp:
             }
             
             def make_video_task(task):
-                # 这里是实际的视频生成逻辑
                 logger.info(f"开始生成视频: {video_path}")
-                time.sleep(10)  # 模拟视频生成过程
-                
-                # 生成结果视频路径
-                result_video = f"{video_path.rsplit('.', 1)[0]}-r.mp4"
-                
-                # 返回生成结果
-                return {
-                    "video_path": result_video
-                }
+                model_video = self._resolve_model_video(video_path, task.username)
+                # 提交在共享事件循环上进行，提交后立即返回，不占用任务队列的工作线程；
+                # 渲染结束时由轮询器（或本地分段处理）结束本任务
+                code = event_loop.run(self.video_service.make_video_async(
+                    model_video, Path(audio_path), username=task.username, queue_task_id=task.task_id
+                ))
+                current = self.task_service.get_task(task.task_id)
+                if current and current["status"] == TaskStatus.PROCESSING:
+                    # 渲染缓存命中时任务已结束
+                    self.task_service.update_task_details(task.task_id, render_code=code)
+                return DEFERRED
             
             task_id = self.task_service.create_task(
                 task_type=TaskType.VIDEO_GENERATION,
@@ -954,6 +1039,18 @@ class HeyGemApp:
             logger.error(f"视频生成失败: {str(e)}")
             return None, f"视频生成失败: {str(e)}"
 
+    def _resolve_model_video(self, video_path, username) -> Path:
+        """模特输入可以是视频路径，也可以是用户目录中的模特名称"""
+        path = Path(video_path)
+        if path.is_file():
+            return path
+        candidate = self.file_service.get_user_dir(username) / path.name
+        if not candidate.suffix:
+            candidate = candidate.with_suffix(".mp4")
+        if not candidate.is_file():
+            raise FileNotFoundError(f"未找到模特视频: {video_path}")
+        return candidate
+
     def cleanup_files(self, days_old: int) -> str:
         """清理临时文件"""
         try:
@@ -998,37 +1095,39 @@ class HeyGemApp:
     def get_works_info(self):
         if not self.current_user:
             return []
-        works = []
-        for file in self.file_service.scan_works(self.current_user):
-            file_path = Path(file["path"]) if isinstance(file, dict) else Path(file)
-            works.append({
-                "name": file_path.stem,
-                "path": str(file_path),
-                "cover": None,
-                "created_time": file_path.stat().st_ctime
-            })
-        return works
+        return [{
+            "name": info["name"],
+            "path": info["path"],
+            "cover": None,
+            "created_time": info["created_time"]
+        } for info in self.file_service.scan_works(self.current_user)]
 
     def get_models_info(self):
         if not self.current_user:
             return []
-        models = []
-        for file in self.file_service.scan_models(self.current_user):
-            file_path = Path(file["path"])
-            models.append({
-                "name": file_path.stem,
-                "path": str(file_path),
-                "cover": None
-            })
-        return models
+        return [{
+            "name": info["name"],
+            "path": info["path"],
+            "cover": None
+        } for info in self.file_service.scan_models(self.current_user)]
 
     def get_model_training_result(self, model_name):
+        """从模特目录获取训练结果（内存索引，无文件读取）
+
+        旧版本保存的 {模特名}_training.json 在首次读取时导入模特目录。
+        """
+        model_key = Path(model_name).stem
+        result = self.model_catalog.get_training_result(self.current_user, model_key)
+        if result:
+            return result
         try:
             user_dir = self.file_service.get_user_dir(self.current_user)
-            result_file = user_dir / f"{model_name}_training.json"
+            result_file = user_dir / f"{model_key}_training.json"
             if result_file.exists():
                 with open(result_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    result = json.load(f)
+                self.model_catalog.set_training_result(self.current_user, model_key, result)
+                return result
             return None
         except Exception as e:
             logger.error(f"读取训练结果失败: {str(e)}")
@@ -1062,6 +1161,10 @@ def main():
         if 'app' in locals() and hasattr(app, 'task_service'):
             app.task_service.stop()
             logger.info("任务队列服务已停止")
+        if 'app' in locals() and hasattr(app, 'video_service'):
+            app.video_service.poller.stop()
+            app.video_service.backends.stop()
+        event_loop.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
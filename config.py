@@ -7,6 +7,36 @@ IS_WINDOWS = os.name == 'nt'
 # API endpoints - 所有服务都在同一台机器上，使用localhost
 TTS_URL = "http://localhost:18180"  # 语音服务
 VIDEO_URL = "http://localhost:8383"  # 视频服务基础URL
+# 多台face2face服务（逗号分隔），各节点需共享 face2face/temp 与 result 目录
+VIDEO_URLS = [url.strip() for url in os.getenv("VIDEO_URLS", VIDEO_URL).split(",") if url.strip()]
+
+# face2face backend pool - 健康检查与熔断
+BACKEND_HEALTH_INTERVAL = 15  # 健康检查间隔（秒）
+BACKEND_FAILURE_THRESHOLD = 3  # 连续失败多少次后熔断
+BACKEND_RESET_TIMEOUT = 30  # 熔断后多久允许试探请求（秒）
+
+# HTTP client configuration - 后端服务共享连接池
+HTTP_POOL_SIZE = 16  # 每个主机保持的长连接数
+HTTP_MAX_CONCURRENCY = 32  # 同时进行的后端请求上限
+HTTP_MAX_RETRIES = 3  # 传输层重试次数（连接失败、502/503/504）
+HTTP_RETRY_BACKOFF = 0.5  # 重试退避系数（秒）
+# 按接口路径配置 (连接超时, 读取超时)，单位秒
+HTTP_TIMEOUTS = {
+    "default": (3.05, 30),
+    "/easy/submit": (3.05, 60),
+    "/easy/query": (3.05, 10),
+    "/v1/preprocess_and_tran": (3.05, 600),
+    "/v1/invoke": (3.05, 600),
+}
+
+# face2face status polling - 后台统一轮询任务状态
+STATUS_POLL_MIN_INTERVAL = 2.0  # 最短轮询间隔（秒）
+STATUS_POLL_MAX_INTERVAL = 30.0  # 最长轮询间隔（秒）
+STATUS_POLL_BACKOFF = 1.5  # 状态无变化时间隔放大系数
+STATUS_POLL_LONG_JOB = 300  # 超过该时长（秒）视为长任务，起始间隔加倍
+STATUS_CACHE_TTL = 2.0  # 未跟踪的进行中任务状态缓存有效期（秒），跟踪中的任务由轮询器刷新
+STATUS_CACHE_KEEP = 600  # 已结束任务状态在缓存中保留时长（秒）
+VIDEO_RENDER_TIMEOUT = 3600  # 视频渲染的最长时间（秒），轮询超过该时长仍未结束的任务按失败处理
 
 # File paths - 根据操作系统选择基础目录
 if IS_WINDOWS:
@@ -27,6 +57,96 @@ for directory in [UPLOAD_DIR, OUTPUT_DIR, TTS_DIR, TTS_TRAIN_DIR, TTS_PRODUCT_DI
     if not IS_WINDOWS:  # 只在Linux环境下设置权限
         os.chmod(directory, 0o755)
 
+# Media probe cache - ffprobe结果缓存
+PROBE_CACHE_SIZE = 2048  # 内存LRU及磁盘索引最多保留的条目数
+PROBE_CACHE_FILE = BASE_DIR / "probe_cache.json"
+PROBE_CACHE_SAVE_DELAY = 5.0  # 索引变更后延迟保存的时间（秒），期间的变更合并写入
+
+# Render cache - 相同(模特视频, 音频, 渲染参数)直接复用已生成的视频
+RENDER_CACHE_DIR = BASE_DIR / "render_cache"
+RENDER_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024  # 20GB
+
+# Large video segmentation - 大文件分段规划
+SEGMENT_MIN_SECONDS = 5  # 单段最短时长
+SEGMENT_MAX_SECONDS = 300  # 单段最长时长，限制失败重做的代价
+SEGMENT_DEFAULT_OVERHEAD = 1.5  # 未测得数据前假定的每段固定开销（秒）
+SEGMENT_DEFAULT_COST = 0.2  # 未测得数据前假定的每秒内容处理耗时（秒）
+VIDEO_JOB_DIR = BASE_DIR / "video_jobs"  # 分段任务的持久化工作目录
+VIDEO_JOB_KEEP_DAYS = 3  # 未完成的工作目录保留天数
+
+# Model ingest - 上传后生成标准化的渲染代理视频
+PROXY_FPS = 25  # 代理视频固定帧率
+PROXY_MAX_SIDE = 1920  # 代理视频长边上限
+PROXY_GOP_SECONDS = 1  # 关键帧间隔（秒）
+PROXY_CRF = 18  # x264质量参数
+MODEL_CATALOG_FILE = BASE_DIR / "model_catalog.json"
+
+# Model video fitting - 按音频时长裁剪或循环模特视频
+FIT_CACHE_MAX_PER_MODEL = 8  # 每个模特保留的不同时长结果数，超出时删除最旧的
+PINGPONG_CHUNK_SECONDS = 3  # 倒放按块进行，每块解码后的帧全部驻留内存
+
+# Content-addressed media storage - 相同内容的上传只保存一份，用户目录中为硬链接
+BLOB_DIR = BASE_DIR / "blobs"
+BLOB_INDEX_FILE = BLOB_DIR / "index.json"  # 内容哈希 -> 引用该内容的用户文件
+
+# ffmpeg/ffprobe subprocess governor - 全局并发、线程、优先级与超时控制
+MEDIA_MAX_PROCESSES = max(2, os.cpu_count() or 4)  # 同时运行的ffmpeg/ffprobe进程上限
+# 各类别并发上限；每个进程的 -threads 按 CPU核数 / 类别上限 分配
+MEDIA_CATEGORY_LIMITS = {
+    "probe": 4,       # ffprobe探测
+    "thumbnail": 2,   # 缩略图
+    "audio": 2,       # 音频提取
+    "segment": 4,     # 分段切割、合并、裁剪
+    "transcode": 2,   # 代理视频等重新编码
+}
+# 各类别 (nice值, ionice类别)：ionice 2=尽力而为 3=空闲时
+MEDIA_CATEGORY_PRIORITY = {
+    "probe": (0, 2),
+    "thumbnail": (10, 3),
+    "audio": (0, 2),
+    "segment": (5, 2),
+    "transcode": (10, 2),
+}
+# 各类别默认超时（秒）
+MEDIA_CATEGORY_TIMEOUTS = {
+    "probe": 60,
+    "thumbnail": 30,
+    "audio": 600,
+    "segment": 1800,
+    "transcode": 3600,
+}
+
+# TTS synthesis - 流式合成
+TTS_STREAMING = True  # 请求TTS服务流式返回，边接收边写入文件
+TTS_STREAM_CHUNK_SIZE = 64 * 1024  # 每次读取的字节数
+TTS_SECONDS_PER_CHAR = 0.25  # 估算语音时长（秒/字），用于流式合成的进度显示
+TTS_PROGRESS_INTERVAL = 1.0  # 进度更新的最小间隔（秒）
+TTS_CHUNK_LENGTH = 100  # TTS服务单次处理的文本长度上限，长文本按句切分为不超过该长度的分片
+TTS_MAX_CONCURRENCY = 4  # 分片并行合成数
+TTS_CROSSFADE_SECONDS = 0.02  # 分片拼接处的交叉淡化时长
+TTS_BATCH_CONCURRENCY = 4  # 批量合成时同时处理的文案数
+TTS_FIXED_SEED = False  # 固定随机种子（需显式开启）：相同请求输出一致，合成音频缓存只在开启时使用
+TTS_CACHE_DIR = TTS_PRODUCT_DIR / "cache"  # 合成音频缓存（整段与单句分片）
+TTS_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024  # 5GB
+VOICE_MODEL_CACHE_FILE = BASE_DIR / "voice_models.json"  # 参考音频PCM哈希 -> 训练结果
+REFERENCE_SAMPLE_RATE = 24000  # 训练用参考音频采样率（语音无需44.1kHz）
+REFERENCE_CHANNELS = 1  # 训练用参考音频声道数
+
+# Audio post-processing - 合成音频的静音裁剪与响度归一化（每秒音频都对应一秒视频渲染）
+AUDIO_POSTPROCESS = True
+AUDIO_VAD_FRAME_SECONDS = 0.02  # VAD分析帧长
+AUDIO_VAD_THRESHOLD_DB = -50.0  # 低于该电平（dBFS）的帧视为静音
+AUDIO_VAD_RELATIVE_DB = 35.0  # 低于响亮帧电平该值以上的帧视为静音
+AUDIO_TRIM_PAD_SECONDS = 0.1  # 首尾裁剪后保留的静音
+AUDIO_MAX_PAUSE_SECONDS = 0.6  # 句间停顿上限，超出部分删除
+AUDIO_TARGET_DBFS = -20.0  # 有声部分的目标RMS电平
+AUDIO_PEAK_DBFS = -1.0  # 峰值上限
+AUDIO_MAX_GAIN_DB = 20.0  # 最大增益
+
+# Task scheduling - 按声音模型聚合TTS任务，减少TTS服务切换说话人
+TASK_AFFINITY_WINDOW = 8  # 调度时查看的等待任务数
+TASK_AFFINITY_MAX_SKIPS = 4  # 单个任务最多被同模型任务插队的次数（公平性上限）
+
 # Allowed video extensions - 只允许MP4格式
 ALLOWED_EXTENSIONS = {'.mp4'}
 
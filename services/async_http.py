@@ -0,0 +1,132 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from config import HTTP_POOL_SIZE, HTTP_MAX_CONCURRENCY, HTTP_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopThread:
+    """后台事件循环线程
+
+    所有异步后端调用都在这一个事件循环上执行：同步代码（任务队列回调）通过 run() 阻塞等待结果，
+    其他事件循环中的代码（如Gradio的异步处理函数）通过 wrap() 等待结果。
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            logger.info("异步事件循环已启动")
+
+    def stop(self, timeout: float = 5.0):
+        """停止事件循环，停止前关闭HTTP会话"""
+        with self.lock:
+            if not self.thread or not self.thread.is_alive():
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(async_http_client.close(), self.loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"关闭异步HTTP会话失败: {str(e)}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=timeout)
+            logger.info("异步事件循环已停止")
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """提交协程到事件循环，返回线程安全的Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """在同步代码中执行协程并等待结果"""
+        return self.submit(coro).result(timeout)
+
+    def wrap(self, coro: Awaitable) -> Awaitable:
+        """在其他事件循环中等待本循环执行的协程"""
+        return asyncio.wrap_future(self.submit(coro))
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+
+class AsyncHttpClient:
+    """后端服务共享的异步HTTP客户端
+
+    与 HttpClient 使用相同的连接池大小、并发上限与按接口路径的超时配置，
+    在途请求只占用事件循环，不占用线程。会话在事件循环中首次使用时创建。
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        max_concurrency: int = HTTP_MAX_CONCURRENCY,
+        timeouts: Optional[Dict[str, Tuple[float, float]]] = None
+    ):
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.timeouts = dict(HTTP_TIMEOUTS if timeouts is None else timeouts)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def get_timeout(self, url: str) -> aiohttp.ClientTimeout:
+        """根据接口路径获取超时（连接超时, 两次读取之间的超时）"""
+        path = urlparse(url).path
+        connect, read = self.timeouts.get(path, self.timeouts.get("default", (3.05, 30)))
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """发送请求并在上下文中读取响应，HTTP错误状态抛出 aiohttp.ClientResponseError
+
+        与同步客户端一致，收到响应头后即释放并发名额，响应体读取期间只占用连接。
+        """
+        session = await self._get_session()
+        kwargs.setdefault("timeout", self.get_timeout(url))
+        async with self._semaphore:
+            response = await session.request(method, url, **kwargs)
+        try:
+            response.raise_for_status()
+            yield response
+        finally:
+            response.release()
+
+    async def get_json(self, url: str, **kwargs) -> Dict[str, Any]:
+        async with self.request("GET", url, **kwargs) as response:
+            return await response.json(content_type=None)
+
+    async def post_json(self, url: str, **kwargs) -> Dict[str, Any]:
+        async with self.request("POST", url, **kwargs) as response:
+            return await response.json(content_type=None)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+# 创建全局事件循环与异步HTTP客户端实例
+event_loop = EventLoopThread()
+async_http_client = AsyncHttpClient()
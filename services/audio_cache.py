@@ -0,0 +1,36 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES
+from services.render_cache import RenderCache
+
+
+class AudioCache(RenderCache):
+    """按内容寻址的合成音频缓存
+
+    键为合成请求参数（文本、参考音频、参考文本、采样参数）及参考音频内容摘要的哈希，
+    参考音频被重新训练覆盖后旧结果不再命中。固定随机种子时相同请求的输出一致，可直接复用。整段文本与单句分片使用同一缓存，
+    修改脚本中的一句话时只需重新合成这一句。
+    """
+
+    SUFFIX = ".wav"
+    NAME = "音频缓存"
+
+    # 不影响合成结果的参数
+    IGNORED_FIELDS = ("streaming",)
+
+    def __init__(self, cache_dir: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    def make_key(self, payload: Dict[str, Any], reference_digest: Optional[str] = None) -> str:
+        """根据TTS请求参数与参考音频内容摘要计算缓存键"""
+        fields = {k: v for k, v in payload.items() if k not in self.IGNORED_FIELDS}
+        fields["reference_digest"] = reference_digest
+        data = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+# 创建全局音频缓存实例
+audio_cache = AudioCache()
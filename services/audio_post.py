@@ -0,0 +1,129 @@
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+from config import (
+    AUDIO_VAD_FRAME_SECONDS,
+    AUDIO_VAD_THRESHOLD_DB,
+    AUDIO_VAD_RELATIVE_DB,
+    AUDIO_TRIM_PAD_SECONDS,
+    AUDIO_MAX_PAUSE_SECONDS,
+    AUDIO_TARGET_DBFS,
+    AUDIO_PEAK_DBFS,
+    AUDIO_MAX_GAIN_DB,
+)
+from services import wav_io
+from services.tts_shards import read_samples, to_dtype
+
+logger = logging.getLogger(__name__)
+
+
+def _full_scale(dtype: np.dtype) -> float:
+    return float(-np.iinfo(dtype).min) if dtype.kind == 'i' else 1.0
+
+
+def frame_levels(mono: np.ndarray, frame_len: int) -> np.ndarray:
+    """按帧计算RMS电平（dBFS），末尾不足一帧的部分补零"""
+    frames = -(-len(mono) // frame_len)
+    padded = np.zeros(frames * frame_len, dtype=np.float32)
+    padded[:len(mono)] = mono
+    rms = np.sqrt(np.mean(np.square(padded.reshape(frames, frame_len)), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def voiced_frames(levels: np.ndarray) -> np.ndarray:
+    """帧能量VAD：高于绝对门限且不低于响亮帧电平一定范围的帧视为有声"""
+    if not len(levels):
+        return np.zeros(0, dtype=bool)
+    threshold = max(AUDIO_VAD_THRESHOLD_DB, float(np.percentile(levels, 95)) - AUDIO_VAD_RELATIVE_DB)
+    return levels > threshold
+
+
+def keep_frames(voiced: np.ndarray, pad_frames: int, max_pause_frames: int) -> np.ndarray:
+    """计算保留的帧：去掉首尾静音（保留少量余量），超长停顿压缩到上限
+
+    每段静音按首尾各保留一半上限，压缩后停顿仍落在原来的静音区间内。
+    """
+    keep = np.zeros(len(voiced), dtype=bool)
+    idx = np.flatnonzero(voiced)
+    if not len(idx):
+        return keep
+    first = max(0, idx[0] - pad_frames)
+    last = min(len(voiced), idx[-1] + 1 + pad_frames)
+    keep[first:last] = True
+
+    # 标记每段连续静音中的位置与长度
+    silent = ~voiced[first:last]
+    edges = np.diff(np.concatenate(([0], silent.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    if not len(starts):
+        return keep
+    ends = np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    run_id = np.cumsum(edges[:-1] == 1) - 1
+    pos = np.arange(len(silent)) - starts[np.maximum(run_id, 0)]
+    run_len = lengths[np.maximum(run_id, 0)]
+    head = max_pause_frames // 2
+    tail = max_pause_frames - head
+    drop = silent & (run_len > max_pause_frames) & (pos >= head) & (run_len - pos > tail)
+    keep[first:last] &= ~drop
+    return keep
+
+
+def normalize_gain(samples: np.ndarray, voiced_mask: np.ndarray, full_scale: float) -> float:
+    """有声部分的RMS调整到目标电平，并限制峰值与最大增益，返回线性增益"""
+    if not voiced_mask.any():
+        return 1.0
+    voiced = samples[voiced_mask].astype(np.float32) / full_scale
+    rms = float(np.sqrt(np.mean(np.square(voiced))))
+    peak = float(np.max(np.abs(voiced)))
+    if rms <= 0 or peak <= 0:
+        return 1.0
+    gain_db = min(AUDIO_TARGET_DBFS - 20.0 * np.log10(rms), AUDIO_MAX_GAIN_DB)
+    gain_db = min(gain_db, AUDIO_PEAK_DBFS - 20.0 * np.log10(peak))
+    return float(10.0 ** (gain_db / 20.0))
+
+
+def process_wav(src_path: Path, dst_path: Path) -> Dict[str, Any]:
+    """静音裁剪、停顿压缩与响度归一化，整段音频向量化处理后写出到dst_path（可与源相同）"""
+    info = wav_io.read_info(src_path)
+    samples = np.array(read_samples(src_path, info))
+    full_scale = _full_scale(samples.dtype)
+    frame_len = max(1, int(AUDIO_VAD_FRAME_SECONDS * info.sample_rate))
+
+    mono = samples.astype(np.float32).mean(axis=1) / full_scale
+    voiced = voiced_frames(frame_levels(mono, frame_len))
+    keep = keep_frames(
+        voiced,
+        int(AUDIO_TRIM_PAD_SECONDS / AUDIO_VAD_FRAME_SECONDS),
+        int(AUDIO_MAX_PAUSE_SECONDS / AUDIO_VAD_FRAME_SECONDS)
+    )
+    sample_keep = np.repeat(keep, frame_len)[:len(samples)]
+    sample_voiced = np.repeat(voiced, frame_len)[:len(samples)]
+
+    if not sample_keep.any():
+        # 整段都是静音时保持原样
+        sample_keep[:] = True
+    gain = normalize_gain(samples, sample_voiced & sample_keep, full_scale)
+    output = samples[sample_keep]
+    if gain != 1.0:
+        output = to_dtype(output.astype(np.float64) * gain, samples.dtype)
+
+    tmp_path = dst_path.with_name(f"{dst_path.stem}.post{dst_path.suffix}")
+    try:
+        wav_io.write_wav(tmp_path, info.fmt_chunk, np.ascontiguousarray(output))
+        # 替换目录项而不是原地写入，硬链接到缓存的源文件不受影响
+        os.replace(tmp_path, dst_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    stats = {
+        "original_seconds": round(len(samples) / info.sample_rate, 3),
+        "seconds": round(len(output) / info.sample_rate, 3),
+        "gain_db": round(float(20.0 * np.log10(gain)), 2)
+    }
+    logger.info(f"音频后处理: {stats['original_seconds']}秒 -> {stats['seconds']}秒, 增益 {stats['gain_db']}dB")
+    return stats
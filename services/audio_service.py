@@ -1,53 +1,136 @@
+import asyncio
+import functools
 import os
 import json
+import shutil
+import struct
+import tempfile
+import time
+import uuid
+import concurrent.futures
+import numpy as np
+import aiohttp
 import requests
 import logging
 from pathlib import Path
-from config import TTS_URL, VIDEO_URL, TTS_TRAIN_DIR, UPLOAD_DIR
+from config import (
+    TTS_URL, TTS_DIR, TTS_TRAIN_DIR, UPLOAD_DIR,
+    TTS_PRODUCT_DIR, TTS_STREAMING, TTS_STREAM_CHUNK_SIZE, TTS_SECONDS_PER_CHAR, TTS_PROGRESS_INTERVAL,
+    TTS_CHUNK_LENGTH, TTS_MAX_CONCURRENCY, TTS_CROSSFADE_SECONDS, TTS_FIXED_SEED, TTS_BATCH_CONCURRENCY,
+    REFERENCE_SAMPLE_RATE, REFERENCE_CHANNELS, AUDIO_POSTPROCESS
+)
 from datetime import datetime
+from services import audio_post, pcm_pipe, tts_shards, wav_io
+from services.http_client import HttpClient, http_client as default_http_client
+from services.async_http import AsyncHttpClient, async_http_client as default_async_http_client
+from services.audio_cache import audio_cache
+from services.probe_cache import probe_cache
+from services.task_service import task_queue
+from services.voice_cache import pcm_digest, voice_model_cache
 
 logger = logging.getLogger(__name__)
 
+class WavStreamWriter:
+    """流式写入WAV：数据先写入临时文件，结束后修正WAV头并替换为目标文件
+
+    流式返回的WAV头中长度字段为0或占位值，需按实际写入长度修正。
+    传入task_id时按已接收的音频时长估算并更新任务进度。
+    """
+
+    def __init__(self, audio_path: Path, task_id: str = None, expected_seconds: float = 0.0):
+        self.audio_path = audio_path
+        self.tmp_path = audio_path.with_name(f"{audio_path.stem}.tmp{audio_path.suffix}")
+        self.task_id = task_id
+        self.expected_seconds = expected_seconds
+        self.info = None
+        self.file = None
+        self.header = b""
+        self.byte_rate = 0
+        self.received = 0
+        self.last_report = time.monotonic()
+
+    def __enter__(self):
+        self.file = open(self.tmp_path, 'w+b')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            with self.file:
+                if exc_type is None:
+                    self.info = wav_io.patch_header(self.file)
+            if exc_type is None:
+                os.replace(self.tmp_path, self.audio_path)
+        finally:
+            self.tmp_path.unlink(missing_ok=True)
+        return False
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        self.file.write(chunk)
+        self.received += len(chunk)
+        if not self.task_id:
+            return
+        if not self.byte_rate and len(self.header) < 4096:
+            # 从流开头解析采样率等信息，用于按时长估算进度
+            self.header += chunk[:4096 - len(self.header)]
+            try:
+                info = wav_io.parse_header(self.header)
+                self.byte_rate = info.sample_rate * info.block_align
+                self.received -= info.data_offset
+            except (ValueError, struct.error):
+                pass
+        now = time.monotonic()
+        if self.byte_rate and self.expected_seconds and now - self.last_report >= TTS_PROGRESS_INTERVAL:
+            self.last_report = now
+            seconds = self.received / self.byte_rate
+            task_queue.update_task_details(
+                self.task_id, min(95.0, seconds / self.expected_seconds * 100.0),
+                audio_seconds=round(seconds, 2)
+            )
+
+
 class AudioService:
-    def __init__(self):
-        self.training_result = None
+    def __init__(self, tts_url: str = TTS_URL, http_client: HttpClient = None,
+                 async_http_client: AsyncHttpClient = None):
+        self.tts_url = tts_url
+        self.http = http_client or default_http_client  # 共享连接池
+        self.async_http = async_http_client or default_async_http_client  # 异步接口使用
 
-    def extract_audio(self, video_path, audio_path):
-        """从视频中提取音频"""
+    def extract_audio(self, video_path, audio_path, sample_rate: int = REFERENCE_SAMPLE_RATE,
+                      channels: int = REFERENCE_CHANNELS, job_id: str = None):
+        """从视频中提取音频
+
+        ffmpeg按目标采样率与声道数输出PCM到管道，边读边写WAV；进程受统一并发、超时与取消管理。
+        """
         try:
-            # 使用ffmpeg提取音频
-            os.system(f'ffmpeg -i "{video_path}" -vn -acodec pcm_s16le -ar 44100 -ac 2 "{audio_path}"')
+            pcm_pipe.extract_wav(Path(video_path), Path(audio_path), sample_rate, channels, job_id)
             return os.path.exists(audio_path)
         except Exception as e:
             logger.error(f"Error extracting audio: {str(e)}")
             return False
 
+    def extract_samples(self, video_path, sample_rate: int = REFERENCE_SAMPLE_RATE,
+                        channels: int = REFERENCE_CHANNELS, job_id: str = None) -> np.ndarray:
+        """从视频中提取音频采样到numpy数组（int16，形状为 (帧数, 声道数)），用于分析"""
+        return pcm_pipe.read_pcm(Path(video_path), sample_rate, channels, job_id)
+
     def train_voice_model(self, audio_path):
-        """训练语音模型"""
+        """训练语音模型，返回训练结果（由调用方记录到模特目录）"""
         try:
-            # 确保音频文件存在
-            if not os.path.exists(audio_path):
-                raise FileNotFoundError(f"Audio file not found: {audio_path}")
-
-            # 获取相对路径
-            audio_path = Path(audio_path)
-            # 兼容多用户：取audio_path的父目录（即TTS_TRAIN_DIR/用户名）
-            tts_train_root = TTS_TRAIN_DIR.parent
-            relative_path = audio_path.relative_to(tts_train_root)
-            reference_audio = str(relative_path).replace('\\', '/')  # 确保使用正斜杠
-
             # 准备训练参数
-            data = {
-                "format": "wav",
-                "reference_audio": reference_audio,
-                "lang": "zh"
-            }
+            data = self._training_payload(audio_path)
+
+            # 参考音频内容与已训练的相同时直接复用训练结果
+            digest, cached = self._cached_training(Path(audio_path))
+            if cached:
+                return cached
 
             logger.info(f"Sending training request with data: {data}")
 
             # 发送训练请求
-            response = requests.post(
-                f"{TTS_URL}/v1/preprocess_and_tran",
+            response = self.http.post(
+                f"{self.tts_url}/v1/preprocess_and_tran",
                 json=data,
                 headers={"Content-Type": "application/json"}
             )
@@ -60,7 +143,8 @@ class AudioService:
             
             # 保存训练结果
             result = response.json()
-            self.training_result = result
+            if digest:
+                voice_model_cache.put(digest, result)
             return result
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP Error during training: {str(e)}")
@@ -71,69 +155,95 @@ class AudioService:
             return None
 
 
-    def synthesize_audio(self, text, reference_audio=None, reference_text=None, username=None):
-        """合成音频"""
+    async def train_voice_model_async(self, audio_path):
+        """train_voice_model 的异步版本，在共享事件循环上等待TTS服务，不占用线程"""
+        loop = asyncio.get_running_loop()
         try:
-            # 使用保存的训练结果或传入的参数
-            ref_audio = reference_audio or (self.training_result.get('asr_format_audio_url') if self.training_result else None)
-            ref_text = reference_text or (self.training_result.get('reference_audio_text') if self.training_result else None)
+            data = self._training_payload(audio_path)
+            digest, cached = await loop.run_in_executor(None, self._cached_training, Path(audio_path))
+            if cached:
+                return cached
+
+            logger.info(f"Sending training request with data: {data}")
+            result = await self.async_http.post_json(
+                f"{self.tts_url}/v1/preprocess_and_tran",
+                json=data,
+                headers={"Content-Type": "application/json"}
+            )
+            logger.info(f"Training response content: {result}")
+            if digest:
+                voice_model_cache.put(digest, result)
+            return result
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"HTTP Error during training: {e.status} {e.message}")
+            return None
+        except Exception as e:
+            logger.error(f"Error training voice model: {str(e)}")
+            return None
+
+    def _training_payload(self, audio_path) -> dict:
+        """训练请求参数，参考音频使用相对TTS训练目录的路径"""
+        # 确保音频文件存在
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+        # 获取相对路径
+        audio_path = Path(audio_path)
+        # 兼容多用户：取audio_path的父目录（即TTS_TRAIN_DIR/用户名）
+        tts_train_root = TTS_TRAIN_DIR.parent
+        relative_path = audio_path.relative_to(tts_train_root)
+        reference_audio = str(relative_path).replace('\\', '/')  # 确保使用正斜杠
+        return {
+            "format": "wav",
+            "reference_audio": reference_audio,
+            "lang": "zh"
+        }
+
+    def _cached_training(self, audio_path: Path):
+        """计算参考音频PCM哈希并查找已有训练结果，返回 (缓存键, 训练结果)
+
+        缓存键包含用户目录名：训练结果中的参考音频指向训练时用户的目录，不跨用户复用。
+        """
+        try:
+            digest = f"{audio_path.parent.name}/{pcm_digest(audio_path)}"
+        except Exception as e:
+            logger.warning(f"计算参考音频哈希失败，跳过缓存: {str(e)}")
+            return None, None
+        cached = voice_model_cache.get(digest)
+        if cached:
+            logger.info(f"参考音频未变化，复用已有训练结果: {digest}")
+        return digest, cached
+
+    def synthesize_audio(self, text, reference_audio=None, reference_text=None, username=None,
+                         streaming: bool = TTS_STREAMING, task_id: str = None):
+        """合成音频
+
+        响应按块写入目标文件，结束后修正WAV头，内存占用与文本长度无关；
+        传入task_id时按已接收的音频时长更新任务进度。
+        长文本按句切分后并行合成，再按原顺序交叉淡化拼接。
+        固定随机种子时整段结果与各句分片都写入音频缓存，相同请求直接复用。
+        最后裁剪静音并归一化响度，缩短后续视频渲染的时长。
+        """
+        try:
+            # 参考音频与文本来自模特目录中该模特的训练结果，由调用方传入
+            ref_audio = reference_audio
+            ref_text = reference_text
 
             if not ref_audio or not ref_text:
                 raise ValueError("Missing reference audio or text")
 
             # 准备合成参数
-            data = {
-                "text": text,
-                "reference_audio": ref_audio,
-                "reference_text": ref_text,
-                "format": "wav",
-                "topP": 0.7,
-                "max_new_tokens": 1024,
-                "chunk_length": 100,
-                "repetition_penalty": 1.2,
-                "temperature": 0.7,
-                "need_asr": False,
-                "streaming": False,
-                "is_fixed_seed": 0,
-                "is_norm": 0
-            }
-
-            logger.info(f"Sending synthesis request with data: {data}")
+            data = self._build_payload(text, ref_audio, ref_text, streaming)
+            cache_key = self._cache_key(data)
+            audio_path = self._new_audio_path(username)
+            if not (cache_key and audio_cache.fetch(cache_key, audio_path)):
+                self._synthesize_to(text, data, audio_path, task_id)
+                if cache_key:
+                    audio_cache.store(cache_key, audio_path)
 
-            # 发送合成请求，设置stream=True以获取二进制数据
-            response = requests.post(
-                f"{TTS_URL}/v1/invoke",
-                json=data,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "audio/wav"  # 指定接受音频数据
-                },
-                stream=True  # 启用流式传输
-            )
-            
-            # 检查HTTP响应状态码，如果状态码不是200-299之间的值，将抛出HTTPError异常
-            response.raise_for_status()
-            
-            # 获取音频数据（二进制数据）
-            audio_data = response.raw.read()
-            
-            # 生成唯一的音频文件名
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]
-            audio_filename = f"audio_{timestamp}.wav"
-            # 用户音频目录
-            if username:
-                user_audio_dir = UPLOAD_DIR / username
-                user_audio_dir.mkdir(parents=True, exist_ok=True)
-                audio_path = user_audio_dir / audio_filename
-            else:
-                UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-                audio_path = UPLOAD_DIR / audio_filename
-            
-            # 保存音频文件
-            with open(audio_path, 'wb') as f:
-                f.write(audio_data)
-            
-            logger.info(f"Audio saved to: {audio_path}")
+            # 缓存中保存原始合成结果，后处理生成新文件，不影响缓存
+            if AUDIO_POSTPROCESS:
+                self._postprocess(audio_path, task_id)
             
             return str(audio_path)
         except requests.exceptions.HTTPError as e:
@@ -142,4 +252,313 @@ class AudioService:
             raise
         except Exception as e:
             logger.error(f"Error synthesizing audio: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    async def synthesize_audio_async(self, text, reference_audio=None, reference_text=None, username=None,
+                                     streaming: bool = TTS_STREAMING, task_id: str = None):
+        """synthesize_audio 的异步版本：请求与分片并发在共享事件循环上进行，
+        文件拼接、缓存与后处理在线程池中执行"""
+        loop = asyncio.get_running_loop()
+        try:
+            if not reference_audio or not reference_text:
+                raise ValueError("Missing reference audio or text")
+
+            data = self._build_payload(text, reference_audio, reference_text, streaming)
+            cache_key = await loop.run_in_executor(None, self._cache_key, data)
+            audio_path = self._new_audio_path(username)
+            hit = cache_key and await loop.run_in_executor(None, audio_cache.fetch, cache_key, audio_path)
+            if not hit:
+                shards = tts_shards.split_text(text, TTS_CHUNK_LENGTH) if len(text) > TTS_CHUNK_LENGTH else [text]
+                if len(shards) > 1:
+                    await self._synthesize_sharded_async(shards, reference_audio, reference_text, audio_path, task_id)
+                else:
+                    logger.info(f"Sending synthesis request with data: {data}")
+                    await self._stream_to_file_async(data, audio_path, task_id, len(text) * TTS_SECONDS_PER_CHAR)
+                logger.info(f"Audio saved to: {audio_path}")
+                if cache_key:
+                    await loop.run_in_executor(None, audio_cache.store, cache_key, audio_path)
+
+            if AUDIO_POSTPROCESS:
+                await loop.run_in_executor(None, self._postprocess, audio_path, task_id)
+            return str(audio_path)
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"HTTP Error during synthesis: {e.status} {e.message}")
+            raise
+        except Exception as e:
+            logger.error(f"Error synthesizing audio: {str(e)}")
+            raise
+
+    def synthesize_batch(self, texts, model: dict, username: str = None, task_id: str = None) -> dict:
+        """同一声音批量合成多条文案
+
+        model为模特的训练结果（asr_format_audio_url、reference_audio_text）。
+        各条文案在有界线程池中并发合成，复用共享连接池；每完成一条即更新任务进度并写入清单文件，
+        单条失败不影响其他文案。返回按原顺序排列的清单。
+        """
+        ref_audio = model.get("asr_format_audio_url")
+        ref_text = model.get("reference_audio_text")
+        if not ref_audio or not ref_text:
+            raise ValueError("Missing reference audio or text")
+
+        batch_id = datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]
+        manifest_dir = (UPLOAD_DIR / username if username else UPLOAD_DIR) / "batches"
+        manifest_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "batch_id": batch_id,
+            "manifest_path": str(manifest_dir / f"batch_{batch_id}.json"),
+            "items": [{"index": i, "text": text, "status": "pending"} for i, text in enumerate(texts)]
+        }
+        done = 0
+        failed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=TTS_BATCH_CONCURRENCY) as executor:
+            futures = {
+                executor.submit(self.synthesize_audio, text, ref_audio, ref_text, username): i
+                for i, text in enumerate(texts)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                item = manifest["items"][futures[future]]
+                try:
+                    item["audio_path"] = future.result()
+                    item["duration"] = round(wav_io.read_info(Path(item["audio_path"])).duration, 3)
+                    item["status"] = "completed"
+                except Exception as e:
+                    item["status"] = "failed"
+                    item["error"] = str(e)
+                    failed += 1
+                done += 1
+                self._save_manifest(manifest)
+                if task_id:
+                    task_queue.update_task_details(
+                        task_id, done / len(texts) * 99.0,
+                        items_total=len(texts), items_done=done, items_failed=failed
+                    )
+        logger.info(f"批量合成完成: {len(texts)} 条，失败 {failed} 条，清单: {manifest['manifest_path']}")
+        return manifest
+
+    def _save_manifest(self, manifest: dict):
+        """写入批量合成清单"""
+        manifest_path = Path(manifest["manifest_path"])
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def _synthesize_to(self, text: str, data: dict, audio_path: Path, task_id: str = None):
+        """合成到指定文件：长文本分片并行合成，否则单次请求流式写入"""
+        shards = tts_shards.split_text(text, TTS_CHUNK_LENGTH) if len(text) > TTS_CHUNK_LENGTH else [text]
+        if len(shards) > 1:
+            self._synthesize_sharded(shards, data["reference_audio"], data["reference_text"], audio_path, task_id)
+            logger.info(f"Audio saved to: {audio_path} ({len(shards)} shards)")
+            return
+
+        logger.info(f"Sending synthesis request with data: {data}")
+
+        # 发送合成请求，设置stream=True以获取二进制数据
+        response = self.http.post(
+            f"{self.tts_url}/v1/invoke",
+            json=data,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "audio/wav"  # 指定接受音频数据
+            },
+            stream=True  # 启用流式传输
+        )
+        
+        # 检查HTTP响应状态码，如果状态码不是200-299之间的值，将抛出HTTPError异常
+        try:
+            response.raise_for_status()
+            expected_seconds = len(text) * TTS_SECONDS_PER_CHAR
+            info = self._stream_to_file(response, audio_path, task_id, expected_seconds)
+        finally:
+            response.close()
+        
+        logger.info(f"Audio saved to: {audio_path} ({info.duration:.2f}s)")
+
+    def _postprocess(self, audio_path: Path, task_id: str = None):
+        """裁剪首尾静音、压缩过长停顿并归一化响度，减少后续视频渲染的时长；失败时保留原音频"""
+        try:
+            stats = audio_post.process_wav(audio_path, audio_path)
+        except Exception as e:
+            logger.warning(f"音频后处理失败，使用原始音频: {str(e)}")
+            return
+        if task_id:
+            task_queue.update_task_details(task_id, postprocess=stats)
+
+    def _synthesize_sharded(self, shards, ref_audio: str, ref_text: str, audio_path: Path,
+                            task_id: str = None) -> Path:
+        """分片并行合成：有界线程池并发请求，按分片序号拼接，结果与完成顺序无关"""
+        work_dir = Path(tempfile.mkdtemp(prefix="shards_", dir=TTS_PRODUCT_DIR))
+        try:
+            shard_paths = [work_dir / f"shard_{i:04d}.wav" for i in range(len(shards))]
+            done = 0
+            with concurrent.futures.ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY) as executor:
+                futures = {
+                    executor.submit(self._synthesize_shard, shard, ref_audio, ref_text, shard_paths[i]): i
+                    for i, shard in enumerate(shards)
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()  # 任一分片失败则整体失败
+                    done += 1
+                    if task_id:
+                        task_queue.update_task_details(
+                            task_id, done / len(shards) * 95.0,
+                            shards_total=len(shards), shards_done=done
+                        )
+            return self._join_shards(shard_paths, audio_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _synthesize_sharded_async(self, shards, ref_audio: str, ref_text: str, audio_path: Path,
+                                        task_id: str = None) -> Path:
+        """分片并发合成（异步），并发数受 TTS_MAX_CONCURRENCY 限制，按分片序号拼接"""
+        loop = asyncio.get_running_loop()
+        work_dir = Path(tempfile.mkdtemp(prefix="shards_", dir=TTS_PRODUCT_DIR))
+        semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+        done = 0
+
+        async def run_shard(text: str, shard_path: Path):
+            nonlocal done
+            async with semaphore:
+                await self._synthesize_shard_async(text, ref_audio, ref_text, shard_path)
+            done += 1
+            if task_id:
+                # 更新任务进度会重写任务存储文件，不在事件循环线程上执行
+                await loop.run_in_executor(None, functools.partial(
+                    task_queue.update_task_details, task_id, done / len(shards) * 95.0,
+                    shards_total=len(shards), shards_done=done
+                ))
+
+        try:
+            shard_paths = [work_dir / f"shard_{i:04d}.wav" for i in range(len(shards))]
+            await asyncio.gather(*(run_shard(shard, shard_paths[i]) for i, shard in enumerate(shards)))
+            return await loop.run_in_executor(None, self._join_shards, shard_paths, audio_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _synthesize_shard_async(self, text: str, ref_audio: str, ref_text: str, shard_path: Path) -> Path:
+        """合成单个分片（异步），已缓存的分片直接复用"""
+        loop = asyncio.get_running_loop()
+        data = self._build_payload(text, ref_audio, ref_text, TTS_STREAMING)
+        cache_key = await loop.run_in_executor(None, self._cache_key, data)
+        if cache_key and await loop.run_in_executor(None, audio_cache.fetch, cache_key, shard_path):
+            return shard_path
+        await self._stream_to_file_async(data, shard_path)
+        if cache_key:
+            await loop.run_in_executor(None, audio_cache.store, cache_key, shard_path)
+        return shard_path
+
+    def _join_shards(self, shard_paths, audio_path: Path) -> Path:
+        """按顺序交叉淡化拼接分片到目标文件"""
+        tmp_path = audio_path.with_name(f"{audio_path.stem}.tmp{audio_path.suffix}")
+        try:
+            tts_shards.crossfade_join(shard_paths, tmp_path, TTS_CROSSFADE_SECONDS)
+            os.replace(tmp_path, audio_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return audio_path
+
+    def _synthesize_shard(self, text: str, ref_audio: str, ref_text: str, shard_path: Path) -> Path:
+        """合成单个分片到指定文件，已缓存的分片直接复用"""
+        data = self._build_payload(text, ref_audio, ref_text, TTS_STREAMING)
+        cache_key = self._cache_key(data)
+        if cache_key and audio_cache.fetch(cache_key, shard_path):
+            return shard_path
+        response = self.http.post(
+            f"{self.tts_url}/v1/invoke",
+            json=data,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "audio/wav"
+            },
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            self._stream_to_file(response, shard_path)
+        finally:
+            response.close()
+        if cache_key:
+            audio_cache.store(cache_key, shard_path)
+        return shard_path
+
+    def _cache_key(self, payload: dict):
+        """合成音频缓存键，未开启固定种子时返回None（输出不确定，不缓存）"""
+        if not TTS_FIXED_SEED:
+            return None
+        return audio_cache.make_key(payload, self._reference_digest(payload["reference_audio"]))
+
+    def _reference_digest(self, ref_audio: str):
+        """参考音频内容摘要（按大小与mtime缓存），本地找不到文件时返回None，缓存键退化为仅按路径"""
+        ref_path = Path(ref_audio)
+        candidates = [ref_path] if ref_path.is_absolute() else [
+            root / ref_path for root in (TTS_TRAIN_DIR.parent, TTS_PRODUCT_DIR.parent, TTS_DIR)
+        ]
+        for candidate in candidates:
+            try:
+                return probe_cache.get_digest(candidate)
+            except OSError:
+                continue
+        logger.debug(f"本地未找到参考音频，缓存键仅按路径计算: {ref_audio}")
+        return None
+
+    def _build_payload(self, text: str, ref_audio: str, ref_text: str, streaming: bool) -> dict:
+        """TTS合成请求参数"""
+        return {
+            "text": text,
+            "reference_audio": ref_audio,
+            "reference_text": ref_text,
+            "format": "wav",
+            "topP": 0.7,
+            "max_new_tokens": 1024,
+            "chunk_length": TTS_CHUNK_LENGTH,
+            "repetition_penalty": 1.2,
+            "temperature": 0.7,
+            "need_asr": False,
+            "streaming": streaming,
+            "is_fixed_seed": 1 if TTS_FIXED_SEED else 0,
+            "is_norm": 0
+        }
+
+    def _new_audio_path(self, username: str = None) -> Path:
+        """生成唯一的音频文件路径（用户音频目录）
+
+        批量合成时多个线程可能在同一毫秒内生成路径，时间戳后附加随机后缀。
+        """
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')[:-3]
+        audio_filename = f"audio_{timestamp}_{uuid.uuid4().hex[:8]}.wav"
+        audio_dir = UPLOAD_DIR / username if username else UPLOAD_DIR
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        return audio_dir / audio_filename
+
+    def _stream_to_file(self, response, audio_path: Path, task_id: str = None,
+                        expected_seconds: float = 0.0) -> wav_io.WavInfo:
+        """边接收边写入临时文件，结束后修正WAV头并替换为目标文件"""
+        with WavStreamWriter(audio_path, task_id, expected_seconds) as writer:
+            for chunk in response.iter_content(chunk_size=TTS_STREAM_CHUNK_SIZE):
+                writer.write(chunk)
+        return writer.info
+
+    async def _stream_to_file_async(self, data: dict, audio_path: Path, task_id: str = None,
+                                    expected_seconds: float = 0.0) -> wav_io.WavInfo:
+        """发送合成请求并边接收边写入文件（异步）"""
+        async with self.async_http.request(
+            "POST",
+            f"{self.tts_url}/v1/invoke",
+            json=data,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "audio/wav"
+            }
+        ) as response:
+            # 文件读写与任务进度持久化都可能阻塞，放到线程池执行，事件循环只负责网络读取
+            loop = asyncio.get_running_loop()
+            writer = WavStreamWriter(audio_path, task_id, expected_seconds)
+            await loop.run_in_executor(None, writer.__enter__)
+            try:
+                async for chunk in response.content.iter_chunked(TTS_STREAM_CHUNK_SIZE):
+                    await loop.run_in_executor(None, writer.write, chunk)
+            except BaseException as e:
+                await asyncio.shield(loop.run_in_executor(None, writer.__exit__, type(e), e, e.__traceback__))
+                raise
+            await loop.run_in_executor(None, writer.__exit__, None, None, None)
+        return writer.info
@@ -0,0 +1,228 @@
+import json
+import logging
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Set
+
+from config import (
+    BASE_DIR,
+    BACKEND_HEALTH_INTERVAL,
+    BACKEND_FAILURE_THRESHOLD,
+    BACKEND_RESET_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+CIRCUIT_CLOSED = "closed"        # 正常
+CIRCUIT_OPEN = "open"            # 熔断中，不再派发
+CIRCUIT_HALF_OPEN = "half_open"  # 试探中，只放行一个请求
+
+
+class Backend:
+    """单个face2face服务节点"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.inflight = 0  # 已提交未结束的任务数
+        self.healthy = True
+        self.failures = 0  # 连续失败次数
+        self.circuit = CIRCUIT_CLOSED
+        self.opened_at = 0.0
+        self.trial_inflight = False  # 半开状态下是否已有试探请求
+
+    def is_available(self, now: float) -> bool:
+        """是否可以接收新任务"""
+        if self.circuit == CIRCUIT_OPEN and now - self.opened_at >= BACKEND_RESET_TIMEOUT:
+            self.circuit = CIRCUIT_HALF_OPEN
+            self.trial_inflight = False
+        if self.circuit == CIRCUIT_OPEN:
+            return False
+        if self.circuit == CIRCUIT_HALF_OPEN:
+            return not self.trial_inflight
+        return self.healthy
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "url": self.url,
+            "inflight": self.inflight,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "circuit": self.circuit
+        }
+
+
+class BackendPool:
+    """face2face 多节点路由
+
+    - 提交任务时选择可用节点中在途任务数最少的一个
+    - 记录任务编码所属节点，状态查询发往对应节点（持久化到磁盘，重启后仍可路由）
+    - 连续失败达到阈值后熔断节点，冷却后放行一个试探请求
+    - 后台线程定期探测节点健康状态
+    """
+
+    def __init__(self, urls: List[str], http_client, owners_path: Path = BASE_DIR / "backend_owners.json"):
+        if not urls:
+            raise ValueError("At least one face2face backend is required")
+        self.backends = [Backend(url) for url in urls]
+        self.http = http_client
+        self.owners_path = owners_path
+        self.owners: Dict[str, str] = {}  # 任务编码 -> 节点URL
+        self.counted: Set[str] = set()  # 已计入节点在途数的任务编码
+        self.lock = threading.Lock()
+        self.running = False
+        self.probe_thread = None
+        self._load_owners()
+
+    def start(self):
+        """启动健康检查线程（单节点时无需检查）"""
+        if self.running or len(self.backends) < 2:
+            return
+        self.running = True
+        self.probe_thread = threading.Thread(target=self._probe_loop, daemon=True)
+        self.probe_thread.start()
+        logger.info(f"face2face节点健康检查已启动，共 {len(self.backends)} 个节点")
+
+    def stop(self):
+        """停止健康检查线程"""
+        self.running = False
+        if self.probe_thread and self.probe_thread.is_alive():
+            self.probe_thread.join(timeout=5.0)
+
+    def acquire(self) -> Backend:
+        """选择在途任务最少的可用节点，并占用一个在途名额"""
+        with self.lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b.is_available(now)]
+            if not candidates:
+                raise RuntimeError("No healthy face2face backend available")
+            backend = min(candidates, key=lambda b: b.inflight)
+            backend.inflight += 1
+            if backend.circuit == CIRCUIT_HALF_OPEN:
+                backend.trial_inflight = True
+            return backend
+
+    def release(self, backend: Backend):
+        """释放在途名额（提交失败或任务结束）
+
+        同时结束半开状态下的试探：试探请求未得出结论（如4xx）时允许下一个请求继续试探。
+        """
+        with self.lock:
+            backend.inflight = max(0, backend.inflight - 1)
+            backend.trial_inflight = False
+
+    def record_success(self, backend: Backend):
+        with self.lock:
+            backend.failures = 0
+            backend.healthy = True
+            if backend.circuit != CIRCUIT_CLOSED:
+                logger.info(f"face2face节点恢复: {backend.url}")
+            backend.circuit = CIRCUIT_CLOSED
+            backend.trial_inflight = False
+
+    def record_failure(self, backend: Backend):
+        with self.lock:
+            backend.failures += 1
+            if backend.circuit == CIRCUIT_HALF_OPEN or backend.failures >= BACKEND_FAILURE_THRESHOLD:
+                if backend.circuit != CIRCUIT_OPEN:
+                    logger.warning(f"face2face节点熔断: {backend.url}，连续失败 {backend.failures} 次")
+                backend.circuit = CIRCUIT_OPEN
+                backend.opened_at = time.monotonic()
+                backend.trial_inflight = False
+
+    def assign(self, code: str, backend: Backend):
+        """记录任务编码所属节点"""
+        with self.lock:
+            self.owners[code] = backend.url
+            self.counted.add(code)
+            self._save_owners()
+
+    def adopt(self, code: str):
+        """重启前提交的任务重新纳入跟踪时，计入所属节点的在途数"""
+        with self.lock:
+            url = self.owners.get(code)
+            if url is None or code in self.counted:
+                return
+            self.counted.add(code)
+            for backend in self.backends:
+                if backend.url == url:
+                    backend.inflight += 1
+                    break
+
+    def owner(self, code: str) -> Backend:
+        """获取任务所属节点，未知编码回落到第一个节点"""
+        with self.lock:
+            url = self.owners.get(code)
+        for backend in self.backends:
+            if backend.url == url:
+                return backend
+        return self.backends[0]
+
+    def complete(self, code: str):
+        """任务结束：释放所属节点的在途名额并移除路由记录"""
+        with self.lock:
+            url = self.owners.pop(code, None)
+            if url is None:
+                return
+            self._save_owners()
+            if code not in self.counted:
+                return
+            self.counted.discard(code)
+        for backend in self.backends:
+            if backend.url == url:
+                self.release(backend)
+                break
+
+    def get_status(self) -> List[Dict[str, object]]:
+        """各节点状态"""
+        with self.lock:
+            return [backend.to_dict() for backend in self.backends]
+
+    def _probe(self, backend: Backend):
+        """探测节点：能返回非5xx响应即视为健康"""
+        try:
+            response = self.http.get(
+                f"{backend.url}/easy/query",
+                params={"code": "health-probe"},
+                timeout=(2, 5)
+            )
+            healthy = response.status_code < 500
+        except Exception as e:
+            logger.warning(f"face2face节点健康检查失败 {backend.url}: {str(e)}")
+            healthy = False
+        if healthy:
+            if not backend.healthy or backend.circuit == CIRCUIT_OPEN:
+                self.record_success(backend)
+        else:
+            with self.lock:
+                backend.healthy = False
+            self.record_failure(backend)
+
+    def _probe_loop(self):
+        """健康检查线程"""
+        while self.running:
+            for backend in self.backends:
+                if not self.running:
+                    break
+                self._probe(backend)
+            time.sleep(BACKEND_HEALTH_INTERVAL)
+
+    def _load_owners(self):
+        """加载任务路由记录"""
+        if not self.owners_path.exists():
+            return
+        try:
+            # 只恢复路由；在途数在任务重新纳入轮询时由 adopt() 计入
+            with open(self.owners_path, 'r', encoding='utf-8') as f:
+                self.owners = json.load(f)
+        except Exception as e:
+            logger.error(f"加载任务路由记录失败: {str(e)}")
+
+    def _save_owners(self):
+        """保存任务路由记录（调用方持有锁）"""
+        try:
+            with open(self.owners_path, 'w', encoding='utf-8') as f:
+                json.dump(self.owners, f)
+        except Exception as e:
+            logger.error(f"保存任务路由记录失败: {str(e)}")
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import BLOB_DIR, BLOB_INDEX_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """按内容寻址的媒体存储
+
+    每份内容只在 blobs/<哈希前两位>/<哈希><扩展名> 保存一次，用户目录中的文件是它的硬链接。
+    索引记录每份内容被哪些用户文件引用（引用计数）及各自的上传时间，最后一个引用释放后删除内容文件。
+    硬链接共享mtime，按时间清理时应使用索引中的上传时间。
+    跨文件系统无法硬链接时用户文件保持独立副本，但仍登记引用以便按哈希查找。
+    """
+
+    def __init__(self, blob_dir: Path = BLOB_DIR, index_path: Path = BLOB_INDEX_FILE):
+        self.blob_dir = blob_dir
+        self.index_path = index_path
+        self.index: Dict[str, Dict[str, Any]] = {}  # 哈希 -> {size, suffix, refs: [{path, username, added_at}]}
+        self.paths: Dict[str, str] = {}  # 用户文件路径 -> 哈希
+        self.lock = threading.Lock()
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def add(self, path: Path, digest: str, username: str) -> List[Dict[str, str]]:
+        """登记用户文件，返回此前引用相同内容的其他文件
+
+        内容已存在时用内容文件的硬链接替换用户文件，重复上传不再占用磁盘。
+        """
+        path = Path(path)
+        with self.lock:
+            if self.paths.get(str(path), digest) != digest:
+                # 同一路径此前登记为其他内容
+                self._drop_ref(str(path))
+            entry = self.index.get(digest)
+            blob_path = self._blob_path(digest, path.suffix if entry is None else entry["suffix"])
+            if entry is None or not blob_path.exists():
+                refs = entry["refs"] if entry else []
+                entry = {"size": path.stat().st_size, "suffix": path.suffix, "refs": refs}
+                blob_path = self._blob_path(digest, path.suffix)
+                self._link_blob(path, blob_path)
+            elif not self._same_file(path, blob_path):
+                self._replace_with_link(blob_path, path)
+            entry["refs"] = [ref for ref in entry["refs"] if ref["path"] != str(path)]
+            others = [dict(ref) for ref in entry["refs"]]
+            entry["refs"].append({"path": str(path), "username": username or "", "added_at": time.time()})
+            self.index[digest] = entry
+            self.paths[str(path)] = digest
+            self._save()
+        if others:
+            logger.info(f"上传内容已存在({len(others)}个引用)，已链接到 {blob_path}")
+        return others
+
+    def get_refs(self, digest: str) -> List[Dict[str, str]]:
+        """引用指定内容的用户文件"""
+        with self.lock:
+            entry = self.index.get(digest)
+            return [dict(ref) for ref in entry["refs"]] if entry else []
+
+    def uploaded_at(self, path: Path) -> Optional[float]:
+        """用户文件的上传时间，未登记时返回None"""
+        with self.lock:
+            entry = self.index.get(self.paths.get(str(path)))
+            for ref in entry["refs"] if entry else ():
+                if ref["path"] == str(path):
+                    return ref.get("added_at")
+        return None
+
+    def release(self, path: Path, save: bool = True) -> bool:
+        """释放用户文件的引用（文件本身由调用方删除），引用归零时删除内容文件
+
+        批量删除时传入 save=False，结束后调用 prune() 或 flush() 统一保存索引。
+        """
+        with self.lock:
+            released = self._drop_ref(str(path))
+            if released and save:
+                self._save()
+        return released
+
+    def flush(self):
+        """保存索引"""
+        with self.lock:
+            self._save()
+
+    def prune(self) -> int:
+        """清除已不存在的用户文件的引用，并删除无引用的内容文件，返回删除的内容文件数"""
+        removed = 0
+        with self.lock:
+            for digest, entry in list(self.index.items()):
+                for ref in entry["refs"]:
+                    if not os.path.exists(ref["path"]):
+                        self.paths.pop(ref["path"], None)
+                entry["refs"] = [ref for ref in entry["refs"] if ref["path"] in self.paths]
+                if not entry["refs"]:
+                    self._remove_blob(digest, entry)
+                    removed += 1
+            self._save()
+        if removed:
+            logger.info(f"已删除 {removed} 个无引用的内容文件")
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "blobs": len(self.index),
+                "refs": sum(len(entry["refs"]) for entry in self.index.values()),
+                "bytes": sum(entry["size"] for entry in self.index.values()),
+                "saved_bytes": sum(entry["size"] * (len(entry["refs"]) - 1)
+                                   for entry in self.index.values() if entry["refs"])
+            }
+
+    def _blob_path(self, digest: str, suffix: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}{suffix}"
+
+    @staticmethod
+    def _same_file(path: Path, blob_path: Path) -> bool:
+        try:
+            return os.path.samefile(path, blob_path)
+        except OSError:
+            return False
+
+    def _link_blob(self, path: Path, blob_path: Path):
+        """新内容：把用户文件硬链接为内容文件"""
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        blob_path.unlink(missing_ok=True)
+        try:
+            os.link(path, blob_path)
+        except OSError as e:
+            logger.warning(f"无法硬链接到内容存储，保留独立副本: {str(e)}")
+
+    def _replace_with_link(self, blob_path: Path, path: Path):
+        """重复内容：用内容文件的硬链接替换用户文件（先链接到临时文件再替换）
+
+        不修改内容文件的mtime，其他引用的探测缓存（按mtime校验）保持有效。
+        """
+        tmp_path = path.with_name(f"{path.stem}.link{path.suffix}")
+        try:
+            os.link(blob_path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"无法硬链接到内容存储，保留独立副本: {str(e)}")
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _drop_ref(self, path: str) -> bool:
+        """移除一个引用，引用归零时删除内容文件（调用方持有锁）"""
+        digest = self.paths.pop(path, None)
+        entry = self.index.get(digest)
+        if not entry:
+            return False
+        entry["refs"] = [ref for ref in entry["refs"] if ref["path"] != path]
+        if not entry["refs"]:
+            self._remove_blob(digest, entry)
+        return True
+
+    def _remove_blob(self, digest: str, entry: Dict[str, Any]):
+        """删除内容文件及索引条目（调用方持有锁）"""
+        self._blob_path(digest, entry["suffix"]).unlink(missing_ok=True)
+        del self.index[digest]
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+            self.paths = {ref["path"]: digest for digest, entry in self.index.items() for ref in entry["refs"]}
+            logger.info(f"已加载 {len(self.index)} 条内容存储索引")
+        except Exception as e:
+            logger.error(f"加载内容存储索引失败: {str(e)}")
+
+    def _save(self):
+        """保存索引（调用方持有锁），先写临时文件再替换"""
+        try:
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"保存内容存储索引失败: {str(e)}")
+
+
+# 创建全局内容存储实例
+blob_store = BlobStore()
@@ -0,0 +1,218 @@
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from config import (
+    IS_WINDOWS,
+    MEDIA_MAX_PROCESSES,
+    MEDIA_CATEGORY_LIMITS,
+    MEDIA_CATEGORY_PRIORITY,
+    MEDIA_CATEGORY_TIMEOUTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FFmpegRunner:
+    """ffmpeg/ffprobe 子进程统一管理
+
+    - 全局并发上限 + 按类别的并发上限（先取类别名额，再取全局名额）
+    - 按类别分配 ffmpeg 的 -threads，避免多个进程同时占满所有核心
+    - Linux下通过 nice/ionice 设置CPU与IO优先级
+    - 超时与按任务ID取消时杀掉整个进程组
+    - 记录每个类别的调用次数、等待时间与执行耗时
+    """
+
+    def __init__(
+        self,
+        max_processes: int = MEDIA_MAX_PROCESSES,
+        category_limits: Optional[Dict[str, int]] = None,
+        priorities: Optional[Dict[str, tuple]] = None,
+        timeouts: Optional[Dict[str, float]] = None
+    ):
+        self.cpu_count = os.cpu_count() or 4
+        self.category_limits = dict(MEDIA_CATEGORY_LIMITS if category_limits is None else category_limits)
+        self.priorities = dict(MEDIA_CATEGORY_PRIORITY if priorities is None else priorities)
+        self.timeouts = dict(MEDIA_CATEGORY_TIMEOUTS if timeouts is None else timeouts)
+        self.global_slots = threading.BoundedSemaphore(max_processes)
+        self.category_slots = {
+            category: threading.BoundedSemaphore(limit) for category, limit in self.category_limits.items()
+        }
+        self.nice_bin = None if IS_WINDOWS else shutil.which("nice")
+        self.ionice_bin = None if IS_WINDOWS else shutil.which("ionice")
+        self.jobs: Dict[str, Set[subprocess.Popen]] = {}  # 任务ID -> 运行中的进程
+        self.cancelled: Set[str] = set()
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, float]] = {}
+
+    def run(
+        self,
+        cmd: List[str],
+        category: str = "segment",
+        timeout: Optional[float] = None,
+        job_id: Optional[str] = None,
+        check: bool = True,
+        text: bool = False,
+        input: Any = None
+    ) -> subprocess.CompletedProcess:
+        """运行命令并等待结束，用法与 subprocess.run(capture_output=True) 一致"""
+        timeout = timeout if timeout is not None else self.timeouts.get(category)
+        with self.popen(
+            cmd, category, job_id,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text
+        ) as proc:
+            try:
+                stdout, stderr = proc.communicate(input=input, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._kill(proc)
+                proc.communicate()
+                self._record(category, "timeouts")
+                logger.error(f"{category} 进程超时({timeout}秒)已终止: {' '.join(map(str, cmd[:6]))} ...")
+                raise
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    @contextmanager
+    def popen(self, cmd: List[str], category: str = "segment", job_id: Optional[str] = None,
+              timeout: Optional[float] = None, **kwargs) -> Iterator[subprocess.Popen]:
+        """在并发名额内启动进程，退出上下文时确保进程已结束（用于管道流式读写）
+
+        指定timeout时超时后终止进程，读取端随即收到EOF。
+        """
+        if job_id and job_id in self.cancelled:
+            raise RuntimeError(f"Job {job_id} has been cancelled")
+        category_slot = self.category_slots.get(category)
+        wait_started = time.monotonic()
+        if category_slot:
+            category_slot.acquire()
+        self.global_slots.acquire()
+        started = time.monotonic()
+        proc = None
+        timer = None
+        try:
+            if not IS_WINDOWS:
+                kwargs.setdefault("start_new_session", True)  # 独立进程组，便于整组终止
+            proc = subprocess.Popen(self._prepare(cmd, category), **kwargs)
+            self._register(job_id, proc)
+            if job_id and job_id in self.cancelled:
+                self._kill(proc)
+            if timeout:
+                timer = threading.Timer(timeout, self._timeout, (proc, category, timeout))
+                timer.daemon = True
+                timer.start()
+            yield proc
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if proc is not None:
+                if proc.poll() is None:
+                    self._kill(proc)
+                proc.wait()
+                self._unregister(job_id, proc)
+            self.global_slots.release()
+            if category_slot:
+                category_slot.release()
+            elapsed = time.monotonic() - started
+            self._record(category, "count")
+            self._record(category, "wait_seconds", started - wait_started)
+            self._record(category, "total_seconds", elapsed)
+            self._record_max(category, elapsed)
+            if proc is not None and proc.returncode not in (0, None):
+                self._record(category, "failures")
+            logger.debug(f"{category} 进程耗时 {elapsed:.2f}秒，排队 {started - wait_started:.2f}秒")
+
+    def cancel(self, job_id: str) -> int:
+        """取消任务：终止该任务所有运行中的进程，之后的启动请求直接失败"""
+        with self.lock:
+            self.cancelled.add(job_id)
+            procs = list(self.jobs.get(job_id, ()))
+        for proc in procs:
+            self._kill(proc)
+        if procs:
+            logger.info(f"已终止任务 {job_id} 的 {len(procs)} 个ffmpeg进程")
+        return len(procs)
+
+    def release_job(self, job_id: str):
+        """任务结束后清除取消标记"""
+        with self.lock:
+            self.cancelled.discard(job_id)
+            self.jobs.pop(job_id, None)
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """各类别调用统计"""
+        with self.lock:
+            result = {category: dict(values) for category, values in self.metrics.items()}
+        for values in result.values():
+            count = values.get("count", 0)
+            values["avg_seconds"] = values.get("total_seconds", 0.0) / count if count else 0.0
+        return result
+
+    def _prepare(self, cmd: List[str], category: str) -> List[str]:
+        """添加线程限制和优先级前缀"""
+        cmd = [str(arg) for arg in cmd]
+        if Path(cmd[0]).stem == "ffmpeg" and "-threads" not in cmd:
+            threads = max(1, self.cpu_count // max(1, self.category_limits.get(category, 1)))
+            cmd[-1:-1] = ["-threads", str(threads)]  # 作用于输出（编码）
+        nice_value, io_class = self.priorities.get(category, (0, 2))
+        if self.ionice_bin and io_class:
+            cmd = [self.ionice_bin, "-c", str(io_class)] + cmd
+        if self.nice_bin and nice_value:
+            cmd = [self.nice_bin, "-n", str(nice_value)] + cmd
+        return cmd
+
+    def _timeout(self, proc: subprocess.Popen, category: str, timeout: float):
+        if proc.poll() is None:
+            self._kill(proc)
+            self._record(category, "timeouts")
+            logger.error(f"{category} 进程超时({timeout}秒)已终止: pid {proc.pid}")
+
+    def _kill(self, proc: subprocess.Popen):
+        """终止进程（POSIX下终止整个进程组）"""
+        try:
+            if IS_WINDOWS:
+                proc.kill()
+            else:
+                os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    def _register(self, job_id: Optional[str], proc: subprocess.Popen):
+        if not job_id:
+            return
+        with self.lock:
+            self.jobs.setdefault(job_id, set()).add(proc)
+
+    def _unregister(self, job_id: Optional[str], proc: subprocess.Popen):
+        if not job_id:
+            return
+        with self.lock:
+            procs = self.jobs.get(job_id)
+            if procs:
+                procs.discard(proc)
+                if not procs:
+                    del self.jobs[job_id]
+
+    def _record(self, category: str, key: str, value: float = 1):
+        with self.lock:
+            values = self.metrics.setdefault(category, {})
+            values[key] = values.get(key, 0) + value
+
+    def _record_max(self, category: str, elapsed: float):
+        with self.lock:
+            values = self.metrics.setdefault(category, {})
+            values["max_seconds"] = max(values.get("max_seconds", 0.0), elapsed)
+
+
+# 创建全局ffmpeg进程管理实例
+ffmpeg_runner = FFmpegRunner()
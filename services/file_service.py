@@ -1,13 +1,21 @@
+import errno
+import hashlib
 import logging
 import os
 import shutil
 import tempfile
 import threading
 import concurrent.futures
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
 from config import UPLOAD_DIR, TTS_TRAIN_DIR, ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH
 from typing import List, Dict, Any, Optional, Tuple
+from services.probe_cache import probe_cache
+from services.blob_store import blob_store
+from services.media_catalog import media_catalog
+from services.voice_cache import voice_model_cache
+from services.ffmpeg_runner import ffmpeg_runner
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +43,12 @@ class FileService:
         return file_size <= MAX_CONTENT_LENGTH
 
     def save_uploaded_file(self, file, filename: str, username: str) -> Path:
-        """保存上传的文件"""
+        """保存上传的文件
+
+        同一文件系统时直接硬链接Gradio的临时文件，否则由内核复制（copy_file_range/sendfile），
+        SHA-256在同一遍中计算并写入探测缓存，不再将整个文件读入内存。
+        之后按哈希登记到内容存储，重复上传的文件不占用额外磁盘。
+        """
         if not self.check_file_extension(filename):
             raise ValueError("只支持MP4格式的视频文件")
 
@@ -52,39 +65,94 @@ class FileService:
         user_dir = self.get_user_dir(username)
         file_path = user_dir / new_filename
         
-        # 对于大文件，使用分块复制
-        if file_size > 100 * 1024 * 1024:  # 100MB
-            self._copy_large_file(file.name, file_path)
-        else:
-            # 使用二进制模式复制文件
-            with open(file.name, 'rb') as src, open(file_path, 'wb') as dst:
-                dst.write(src.read())
-            
-        os.chmod(file_path, 0o644)
+        digest = self._transfer_file(file.name, file_path, file_size)
+        # 相同内容已上传过时替换为内容存储的硬链接
+        blob_store.add(file_path, digest, username)
+        probe_cache.set_digest(file_path, digest)
+        media_catalog.invalidate(file_path)
         logger.info(f"File saved: {file_path}")
         return file_path
 
-    def _copy_large_file(self, src_path: str, dst_path: Path, chunk_size: int = 8 * 1024 * 1024):
-        """分块复制大文件，减少内存占用"""
-        logger.info(f"使用分块复制处理大文件: {src_path} -> {dst_path}")
-        
+    def _transfer_file(self, src_path: str, dst_path: Path, expected_size: int,
+                       chunk_size: int = 8 * 1024 * 1024) -> str:
+        """转移上传文件并返回SHA-256
+
+        优先硬链接（Gradio仍持有临时文件，不使用重命名）；跨文件系统时按块由内核复制，
+        每块复制后从页缓存读回计算哈希，复用同一个缓冲区，内存占用与文件大小无关。
+        复制时先写入 .part 临时文件，完成后再替换为目标文件，列出目录时不会读到未写完的文件。
+        目标文件权限设为0644，face2face与TTS服务需要读取；硬链接时会同时修改Gradio临时文件的权限，不影响其使用。
+        """
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        sha256 = hashlib.sha256()
+        part_path = dst_path.with_name(f"{dst_path.name}.part")
         try:
-            with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            try:
+                os.link(src_path, dst_path)
+                linked = True
+            except OSError:
+                linked = False
+            with open(src_path, 'rb') as src, (nullcontext() if linked else open(part_path, 'wb')) as dst:
+                offset = 0
                 while True:
-                    chunk = src.read(chunk_size)  # 每次读取8MB
-                    if not chunk:
-                        break
-                    dst.write(chunk)
+                    if not linked:
+                        copied = self._kernel_copy(src.fileno(), dst.fileno(), offset, chunk_size)
+                        if not copied:
+                            break
+                        src.seek(offset)
+                        read = src.readinto(view[:copied])
+                    else:
+                        read = src.readinto(view)
+                        if not read:
+                            break
+                    sha256.update(view[:read])
+                    offset += read
+            if offset != expected_size:
+                raise IOError(f"文件大小不一致: {offset} != {expected_size}")
+            if linked:
+                os.chmod(dst_path, 0o644)
+            else:
+                os.chmod(part_path, 0o644)
+                os.replace(part_path, dst_path)
+            logger.info(f"{'硬链接' if linked else '内核复制'}上传文件: {src_path} -> {dst_path}")
+            return sha256.hexdigest()
         except Exception as e:
-            logger.error(f"分块复制文件失败: {str(e)}")
+            logger.error(f"保存上传文件失败: {str(e)}")
             # 如果复制失败，尝试删除目标文件
-            if dst_path.exists():
-                try:
-                    dst_path.unlink()
-                except:
-                    pass
+            part_path.unlink(missing_ok=True)
+            dst_path.unlink(missing_ok=True)
             raise
 
+    @staticmethod
+    def _kernel_copy(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+        """从offset处复制最多count字节，返回实际复制的字节数（0表示已到文件末尾）"""
+        if hasattr(os, "copy_file_range"):
+            try:
+                return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+        if hasattr(os, "sendfile"):
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            try:
+                return os.sendfile(dst_fd, src_fd, offset, count)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                    raise
+        # 不支持内核复制的平台（如Windows）回退到用户态复制
+        data = os.pread(src_fd, count, offset) if hasattr(os, "pread") else FileService._read_at(src_fd, offset, count)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            # os.write可能只写入部分数据
+            view = view[os.write(dst_fd, view):]
+        return len(data)
+
+    @staticmethod
+    def _read_at(fd: int, offset: int, count: int) -> bytes:
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, count)
+
     def get_audio_path(self, video_path: Path, username: str) -> Path:
         """获取对应的音频文件路径"""
         # 使用相同的时间戳文件名，只改变扩展名
@@ -97,14 +165,9 @@ class FileService:
         Returns:
             list[str]: 已上传MP4视频文件名称列表
         """
-        videos = []
         try:
             user_dir = self.get_user_dir(username)
-            # 扫描目录下的所有MP4文件
-            for file_path in user_dir.glob('*.mp4'):
-                if file_path.is_file():
-                    videos.append(str(file_path.name))
-            
+            videos = media_catalog.list_names(user_dir)
             logger.info(f"Found {len(videos)} MP4 videos in {user_dir}")
             return videos
         except Exception as e:
@@ -112,25 +175,16 @@ class FileService:
             return []
 
     def scan_works(self, username: str) -> List[dict]:
-        """扫描所有作品（以 -r.mp4 结尾）"""
-        works = []
+        """扫描所有作品（以 -r.mp4 结尾），文件信息由媒体目录缓存增量维护"""
         user_dir = self.get_user_dir(username)
-        for file in user_dir.glob("*-r.mp4"):
-            file_info = self.get_file_info(file)
-            if file_info:
-                works.append(file_info)
-        return works
+        return [info for info in media_catalog.list_infos(user_dir, self.get_file_info)
+                if info["path"].endswith("-r.mp4")]
 
     def scan_models(self, username: str) -> List[dict]:
-        """扫描所有模特模型"""
-        models = []
+        """扫描所有模特模型，文件信息由媒体目录缓存增量维护"""
         user_dir = self.get_user_dir(username)
-        for file in user_dir.glob("*.mp4"):
-            if not file.name.endswith("-r.mp4"):
-                file_info = self.get_file_info(file)
-                if file_info:
-                    models.append(file_info)
-        return models
+        return [info for info in media_catalog.list_infos(user_dir, self.get_file_info)
+                if not info["path"].endswith("-r.mp4")]
 
     def cleanup_temp_files(self, days_old: int = 7, username: str = None) -> dict:
         """清理临时文件
@@ -152,6 +206,7 @@ class FileService:
         
         # 计算截止时间
         cutoff_time = time.time() - (days_old * 24 * 60 * 60)
+        deleted_audio: List[Path] = []  # 已删除的训练与处理后音频，用于清理声音模型缓存
         
         # 使用线程池进行并行清理
         with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
@@ -164,30 +219,44 @@ class FileService:
                 
                 # 清理训练音频目录
                 user_tts_dir = self.get_user_tts_dir(username)
-                futures.append(executor.submit(self._cleanup_directory, user_tts_dir, cutoff_time, 'tts_train_dir', result))
+                futures.append(executor.submit(self._cleanup_directory, user_tts_dir, cutoff_time, 'tts_train_dir', result, deleted_audio))
                 
                 # 清理处理后的音频目录
                 tts_product_dir = user_tts_dir.parent / 'processed_audio'
-                futures.append(executor.submit(self._cleanup_directory, tts_product_dir, cutoff_time, 'tts_product_dir', result))
+                futures.append(executor.submit(self._cleanup_directory, tts_product_dir, cutoff_time, 'tts_product_dir', result, deleted_audio))
             else:
                 # 全局清理（管理员用）
                 futures.append(executor.submit(self._cleanup_directory, self.upload_dir, cutoff_time, 'upload_dir', result))
-                futures.append(executor.submit(self._cleanup_directory, self.tts_train_dir, cutoff_time, 'tts_train_dir', result))
+                futures.append(executor.submit(self._cleanup_directory, self.tts_train_dir, cutoff_time, 'tts_train_dir', result, deleted_audio))
                 tts_product_dir = self.tts_train_dir.parent / 'processed_audio'
-                futures.append(executor.submit(self._cleanup_directory, tts_product_dir, cutoff_time, 'tts_product_dir', result))
+                futures.append(executor.submit(self._cleanup_directory, tts_product_dir, cutoff_time, 'tts_product_dir', result, deleted_audio))
             
             # 等待所有清理任务完成
             concurrent.futures.wait(futures)
+
+        # 删除已无引用的内容存储文件，并统一保存索引
+        blob_store.prune()
+        # 参考音频已删除的训练结果不能再复用
+        voice_model_cache.invalidate_references(path.name for path in deleted_audio)
         
         return result
 
-    def _cleanup_directory(self, directory: Path, cutoff_time: float, result_key: str, result: Dict[str, Dict[str, int]]):
-        """清理指定目录中的过期文件"""
+    def _cleanup_directory(self, directory: Path, cutoff_time: float, result_key: str, result: Dict[str, Dict[str, int]],
+                           deleted: Optional[List[Path]] = None):
+        """清理指定目录中的过期文件，传入deleted时记录已删除的文件"""
         try:
             for file_path in directory.glob('*'):
                 try:
-                    if file_path.is_file() and file_path.stat().st_mtime < cutoff_time:
+                    if not file_path.is_file():
+                        continue
+                    # 硬链接到内容存储的文件共享mtime，按登记的上传时间判断
+                    uploaded_at = blob_store.uploaded_at(file_path) or file_path.stat().st_mtime
+                    if uploaded_at < cutoff_time:
                         file_path.unlink()
+                        blob_store.release(file_path, save=False)
+                        media_catalog.discard(file_path)
+                        if deleted is not None:
+                            deleted.append(file_path)
                         result[result_key]['deleted'] += 1
                 except Exception as e:
                     logger.error(f"删除文件失败 {file_path}: {str(e)}")
@@ -204,12 +273,23 @@ class FileService:
                 "path": str(file_path),
                 "created_time": stat.st_ctime,
                 "size": stat.st_size,
+                "duration": self._get_duration(file_path),
                 "thumbnail": self._generate_thumbnail(file_path) if file_path.suffix.lower() in ['.mp4', '.jpg', '.png'] else None
             }
         except Exception as e:
             logger.error(f"获取文件信息失败: {str(e)}")
             return None
 
+    def _get_duration(self, file_path: Path) -> Optional[float]:
+        """获取媒体时长，探测失败返回None"""
+        if file_path.suffix.lower() not in ['.mp4', '.wav']:
+            return None
+        try:
+            return probe_cache.get_duration(file_path)
+        except Exception as e:
+            logger.warning(f"获取媒体时长失败 {file_path}: {str(e)}")
+            return None
+
     def _generate_thumbnail(self, file_path: Path) -> str:
         """生成视频或图片的缩略图"""
         try:
@@ -217,12 +297,14 @@ class FileService:
                 # 使用 ffmpeg 生成视频缩略图
                 thumbnail_path = file_path.parent / f"{file_path.stem}_thumb.jpg"
                 if not thumbnail_path.exists():
-                    import subprocess
-                    subprocess.run([
-                        'ffmpeg', '-i', str(file_path),
-                        '-ss', '00:00:01', '-vframes', '1',
+                    # 不足1秒的视频取中间帧，避免截图时间超出视频长度
+                    duration = self._get_duration(file_path)
+                    seek = min(1.0, duration / 2) if duration else 1.0
+                    ffmpeg_runner.run([
+                        'ffmpeg', '-ss', f"{seek:.3f}", '-i', str(file_path),
+                        '-vframes', '1',
                         str(thumbnail_path)
-                    ], capture_output=True)
+                    ], category="thumbnail", check=False)
                 return str(thumbnail_path)
             elif file_path.suffix.lower() in ['.jpg', '.png']:
                 # 图片直接返回路径
@@ -0,0 +1,89 @@
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    HTTP_POOL_SIZE,
+    HTTP_MAX_CONCURRENCY,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    HTTP_TIMEOUTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """后端服务共享HTTP客户端
+
+    - 基于 requests.Session 的长连接池，状态轮询和任务提交复用同一个socket
+    - 按接口路径配置连接/读取超时，避免后端挂起时占死工作线程
+    - 信号量限制同时进行的请求数
+    - 传输层重试：连接失败对所有方法重试，502/503/504 仅对幂等方法重试
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        max_concurrency: int = HTTP_MAX_CONCURRENCY,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_factor: float = HTTP_RETRY_BACKOFF,
+        timeouts: Optional[Dict[str, Tuple[float, float]]] = None
+    ):
+        self.timeouts = dict(HTTP_TIMEOUTS if timeouts is None else timeouts)
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=True,  # 连接池满时等待空闲连接，而不是新建连接
+            max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_timeout(self, url: str) -> Tuple[float, float]:
+        """根据接口路径获取 (连接超时, 读取超时)"""
+        path = urlparse(url).path
+        return self.timeouts.get(path, self.timeouts.get("default", (3.05, 30)))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求，未显式指定timeout时使用接口对应的超时配置
+
+        流式响应(stream=True)在收到响应头后即释放并发名额，
+        响应体读取期间的连接数由连接池大小约束。
+        """
+        kwargs.setdefault("timeout", self.get_timeout(url))
+        with self._semaphore:
+            return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+# 创建全局HTTP客户端实例
+http_client = HttpClient()
@@ -0,0 +1,141 @@
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import PROXY_FPS, PROXY_MAX_SIDE, PROXY_GOP_SECONDS, PROXY_CRF
+from services.blob_store import blob_store
+from services.ffmpeg_runner import ffmpeg_runner
+from services.model_catalog import ModelCatalog, model_catalog as default_model_catalog
+from services.probe_cache import probe_cache
+from services.render_cache import link_or_copy
+
+logger = logging.getLogger(__name__)
+
+
+class IngestService:
+    """模特视频入库：上传后生成一次标准化的渲染代理视频
+
+    代理视频固定帧率、限制分辨率、短GOP（每秒一个关键帧）并启用faststart，
+    旋转信息在转码时应用到画面上。之后所有渲染都使用代理视频，解码量更少、分段更整齐。
+    """
+
+    PROXY_DIR = "proxy"
+
+    def __init__(self, catalog: ModelCatalog = None):
+        self.catalog = catalog or default_model_catalog
+
+    def ingest(self, video_path: Path, username: str) -> Dict[str, Any]:
+        """生成代理视频并记录到模特目录"""
+        video_path = Path(video_path)
+        proxy_path = video_path.parent / self.PROXY_DIR / video_path.name
+        proxy_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写临时文件再替换，避免渲染读到未写完的代理视频
+        tmp_path = proxy_path.with_name(f"{proxy_path.stem}.tmp{proxy_path.suffix}")
+        info = probe_cache.probe(video_path)
+        try:
+            if self._is_render_ready(video_path, info):
+                # 已符合要求，只重新封装以启用faststart
+                logger.info(f"模特视频已符合渲染要求，仅重新封装: {video_path}")
+                self._remux(video_path, tmp_path)
+            else:
+                logger.info(f"生成渲染代理视频: {video_path} -> {proxy_path}")
+                self._transcode(video_path, tmp_path)
+            os.replace(tmp_path, proxy_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        return self.catalog.update(
+            username,
+            video_path.stem,
+            source=str(video_path),
+            proxy=str(proxy_path),
+            proxy_info=probe_cache.probe(proxy_path)
+        )
+
+    def find_trained(self, video_path: Path, username: str) -> Optional[Dict[str, Any]]:
+        """按内容哈希查找同一用户已完成入库与声音模型训练的相同视频，返回其模特记录
+
+        训练结果中的参考音频路径由TTS服务生成，指向原用户的目录，因此不跨用户复用。
+        """
+        video_path = Path(video_path)
+        for ref in blob_store.get_refs(probe_cache.get_digest(video_path)):
+            ref_path = Path(ref["path"])
+            if ref_path == video_path or ref["username"] != (username or ""):
+                continue
+            record = self.catalog.get(username, ref_path.stem)
+            if record and record.get("training"):
+                return record
+        return None
+
+    def reuse(self, video_path: Path, username: str, record: Dict[str, Any], **fields) -> Dict[str, Any]:
+        """复用相同内容的入库结果：代理视频与缩略图硬链接到本视频名下，训练结果直接记录"""
+        video_path = Path(video_path)
+        reused = {
+            "source": str(video_path),
+            "training": record["training"],
+            "duration": record.get("duration")
+        }
+        source_proxy = Path(record["proxy"]) if record.get("proxy") else None
+        if source_proxy and source_proxy.exists():
+            proxy_path = video_path.parent / self.PROXY_DIR / video_path.name
+            link_or_copy(source_proxy, proxy_path)
+            reused.update(proxy=str(proxy_path), proxy_info=record.get("proxy_info"))
+        source_thumbnail = Path(record["thumbnail"]) if record.get("thumbnail") else None
+        if source_thumbnail and source_thumbnail.exists():
+            thumbnail_path = video_path.parent / f"{video_path.stem}_thumb{source_thumbnail.suffix}"
+            link_or_copy(source_thumbnail, thumbnail_path)
+            reused["thumbnail"] = str(thumbnail_path)
+        logger.info(f"复用相同内容的模特记录: {record.get('source')} -> {video_path}")
+        reused.update(fields)
+        return self.catalog.update(username, video_path.stem, **reused)
+
+    def _is_render_ready(self, video_path: Path, info: Dict[str, Any]) -> bool:
+        """源视频是否已是标准格式（h264、固定帧率、尺寸与GOP符合要求、无旋转）"""
+        if info.get("video_codec") != "h264" or info.get("rotation"):
+            return False
+        if abs((info.get("fps") or 0) - PROXY_FPS) > 0.01:
+            return False
+        if max(info.get("width") or 0, info.get("height") or 0) > PROXY_MAX_SIDE:
+            return False
+        interval = probe_cache.get_keyframe_interval(video_path)
+        return 0 < interval <= PROXY_GOP_SECONDS + 0.01
+
+    def _transcode(self, video_path: Path, proxy_path: Path):
+        """转码为标准代理视频"""
+        gop = PROXY_FPS * PROXY_GOP_SECONDS
+        scale = (
+            f"scale='if(gte(iw,ih),min(iw,{PROXY_MAX_SIDE}),-2)'"
+            f":'if(gte(iw,ih),-2,min(ih,{PROXY_MAX_SIDE}))'"
+        )
+        cmd = [
+            "ffmpeg",
+            "-i", str(video_path),
+            "-vf", f"{scale},fps={PROXY_FPS}",
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", str(PROXY_CRF),
+            "-pix_fmt", "yuv420p",
+            "-g", str(gop),
+            "-keyint_min", str(gop),
+            "-sc_threshold", "0",  # 禁止场景切换插入关键帧，保证GOP固定
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-movflags", "+faststart",
+            "-y",
+            str(proxy_path)
+        ]
+        ffmpeg_runner.run(cmd, category="transcode")
+
+    def _remux(self, video_path: Path, proxy_path: Path):
+        """流复制重新封装"""
+        cmd = [
+            "ffmpeg",
+            "-i", str(video_path),
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y",
+            str(proxy_path)
+        ]
+        ffmpeg_runner.run(cmd, category="transcode")
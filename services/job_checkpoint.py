@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: Path) -> str:
+    """计算文件SHA-256"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class JobCheckpoint:
+    """大文件分段任务的持久化工作目录
+
+    目录内的 manifest.json 记录分段方案和已完成片段（文件名、大小、SHA-256），
+    进程重启或任务重试时复用同一目录，校验通过的片段直接跳过，只重做缺失或损坏的部分。
+    执行中的任务参数也记录在清单中，进程重启后据此自动续跑。
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, work_dir: Path):
+        self.work_dir = work_dir
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = work_dir / self.MANIFEST
+        self.manifest: Dict[str, Any] = {"plan": None, "segments": {}}
+        self._load()
+
+    @property
+    def plan(self) -> Optional[Dict[str, Any]]:
+        return self.manifest.get("plan")
+
+    @property
+    def job(self) -> Optional[Dict[str, Any]]:
+        return self.manifest.get("job")
+
+    def set_job(self, job: Optional[Dict[str, Any]]):
+        """记录执行中的任务参数；传入None表示任务已不在执行（失败或取消），重启时不再续跑"""
+        self.manifest["job"] = job
+        self._save()
+
+    def set_plan(self, plan: Dict[str, Any]):
+        """记录分段方案；方案变化时之前的片段全部作废"""
+        plan = json.loads(json.dumps(plan))  # 与清单中的JSON形式保持一致
+        if self.manifest.get("plan") != plan:
+            self.manifest = {"plan": plan, "segments": {}, "job": self.manifest.get("job")}
+            self._save()
+
+    def is_done(self, index: int) -> bool:
+        """片段是否已完成且文件校验通过"""
+        record = self.manifest["segments"].get(str(index))
+        if not record:
+            return False
+        path = self.work_dir / record["file"]
+        try:
+            if path.stat().st_size != record["size"] or file_sha256(path) != record["sha256"]:
+                raise ValueError("checksum mismatch")
+        except (OSError, ValueError) as e:
+            logger.warning(f"片段 {index} 校验失败，将重新处理: {str(e)}")
+            del self.manifest["segments"][str(index)]
+            self._save()
+            return False
+        return True
+
+    def mark_done(self, index: int, path: Path):
+        """记录已完成的片段"""
+        self.manifest["segments"][str(index)] = {
+            "file": path.name,
+            "size": path.stat().st_size,
+            "sha256": file_sha256(path)
+        }
+        self._save()
+
+    def segment_path(self, index: int) -> Path:
+        record = self.manifest["segments"].get(str(index))
+        return self.work_dir / (record["file"] if record else f"processed_{index}.mp4")
+
+    def completed_count(self) -> int:
+        return len(self.manifest["segments"])
+
+    def remove(self):
+        """任务成功后删除工作目录"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    @classmethod
+    def interrupted(cls, root: Path) -> List["JobCheckpoint"]:
+        """上次进程退出时仍在执行的任务（清单中记录了任务参数）"""
+        if not root.exists():
+            return []
+        checkpoints = []
+        for work_dir in root.iterdir():
+            if (work_dir / cls.MANIFEST).exists():
+                checkpoint = cls(work_dir)
+                if checkpoint.job:
+                    checkpoints.append(checkpoint)
+        return checkpoints
+
+    @staticmethod
+    def prune(root: Path, max_age_days: float):
+        """删除长时间未更新的工作目录"""
+        if not root.exists():
+            return
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        for work_dir in root.iterdir():
+            try:
+                if work_dir.is_dir() and work_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                    logger.info(f"已清理过期任务工作目录: {work_dir}")
+            except OSError as e:
+                logger.error(f"清理任务工作目录失败 {work_dir}: {str(e)}")
+
+    def _load(self):
+        if not self.manifest_path.exists():
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            self.manifest.setdefault("segments", {})
+        except Exception as e:
+            logger.error(f"读取任务清单失败，将重新处理: {str(e)}")
+
+    def _save(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
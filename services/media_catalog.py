@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCatalog:
+    """用户目录的媒体文件列表缓存
+
+    每个目录记录 mtime_ns、文件名 -> inode 以及已计算的文件信息（时长、缩略图等）。
+    目录mtime未变时直接返回缓存；变化时用 scandir 只读取文件名与inode（不stat），
+    与上次结果比较，只为新增或被替换（inode变化）的文件重新计算信息。
+    原地改写文件不会改变目录mtime，写入方需调用 invalidate()。
+    describe返回None或时长未知（探测失败、文件未写完）的结果不缓存，下次列出时重新计算。
+    """
+
+    def __init__(self, suffix: str = ".mp4"):
+        self.suffix = suffix
+        self.dirs: Dict[str, Dict[str, Any]] = {}  # 目录 -> {mtime_ns, files, infos}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.rescans = 0
+
+    def list_names(self, directory: Path) -> List[str]:
+        """目录中的媒体文件名，按名称排序"""
+        with self.lock:
+            return sorted(self._refresh(Path(directory))["files"])
+
+    def list_infos(self, directory: Path, describe: Callable[[Path], Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """目录中媒体文件的信息，按名称排序；未缓存的文件调用describe计算，结果为None的文件跳过"""
+        directory = Path(directory)
+        with self.lock:
+            state = self._refresh(directory)
+            pending = {name: inode for name, inode in state["files"].items() if name not in state["infos"]}
+        # 计算信息可能需要运行ffmpeg，不持有锁
+        computed = {name: describe(directory / name) for name in pending}
+        with self.lock:
+            state = self.dirs.get(str(directory), state)
+            for name, info in computed.items():
+                if state["files"].get(name) == pending[name] and self._is_complete(info):
+                    state["infos"][name] = info
+            infos = [state["infos"].get(name, computed.get(name)) for name in sorted(state["files"])]
+        return [dict(info) for info in infos if info]
+
+    def invalidate(self, path: Path):
+        """文件被写入或替换后调用，下次列出时重新计算该文件的信息"""
+        path = Path(path)
+        with self.lock:
+            state = self.dirs.get(str(path.parent))
+            if state:
+                state["infos"].pop(path.name, None)
+
+    def discard(self, path: Path):
+        """文件被删除后调用"""
+        path = Path(path)
+        with self.lock:
+            state = self.dirs.get(str(path.parent))
+            if state:
+                state["files"].pop(path.name, None)
+                state["infos"].pop(path.name, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "directories": len(self.dirs),
+                "files": sum(len(state["files"]) for state in self.dirs.values()),
+                "hits": self.hits,
+                "rescans": self.rescans
+            }
+
+    @staticmethod
+    def _is_complete(info: Optional[Dict[str, Any]]) -> bool:
+        return bool(info) and info.get("duration") is not None
+
+    def _refresh(self, directory: Path) -> Dict[str, Any]:
+        """按目录mtime增量刷新（调用方持有锁）"""
+        key = str(directory)
+        try:
+            # 先读取mtime再扫描，扫描期间的改动会在下次刷新时发现
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            self.dirs.pop(key, None)
+            return {"mtime_ns": None, "files": {}, "infos": {}}
+        state = self.dirs.get(key)
+        if state and state["mtime_ns"] == mtime_ns:
+            self.hits += 1
+            return state
+
+        with os.scandir(directory) as it:
+            files = {
+                entry.name: entry.inode() for entry in it
+                if entry.name.lower().endswith(self.suffix) and entry.is_file()
+            }
+        old_files = state["files"] if state else {}
+        infos = {
+            name: info for name, info in (state["infos"].items() if state else ())
+            if old_files.get(name) == files.get(name)
+        }
+        changed = sum(1 for name, inode in files.items() if old_files.get(name) != inode)
+        removed = sum(1 for name in old_files if name not in files)
+        state = {"mtime_ns": mtime_ns, "files": files, "infos": infos}
+        self.dirs[key] = state
+        self.rescans += 1
+        logger.debug(f"媒体目录已刷新 {directory}: 新增或替换 {changed} 个, 删除 {removed} 个")
+        return state
+
+
+# 创建全局媒体目录缓存实例
+media_catalog = MediaCatalog()
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import MODEL_CATALOG_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCatalog:
+    """模特目录：按用户记录每个模特的派生信息
+
+    记录包括渲染代理视频、时长、缩略图与声音模型训练结果（asr_format_audio_url、
+    reference_audio_text）。内存索引 + 单个JSON文件持久化，启动时加载一次，
+    结构为 {用户名: {模特名: 记录}}，模特名为视频文件名（不含扩展名）。
+    """
+
+    def __init__(self, catalog_path: Path = MODEL_CATALOG_FILE):
+        self.catalog_path = catalog_path
+        self.models: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def get(self, username: str, model_name: str) -> Optional[Dict[str, Any]]:
+        """获取模特记录"""
+        with self.lock:
+            record = self.models.get(username or "", {}).get(model_name)
+            return dict(record) if record else None
+
+    def update(self, username: str, model_name: str, **fields) -> Dict[str, Any]:
+        """新增或更新模特记录"""
+        with self.lock:
+            record = self.models.setdefault(username or "", {}).setdefault(model_name, {
+                "created_at": datetime.now().isoformat()
+            })
+            record.update(fields)
+            record["updated_at"] = datetime.now().isoformat()
+            self._save()
+            return dict(record)
+
+    def remove(self, username: str, model_name: str) -> bool:
+        """删除模特记录"""
+        with self.lock:
+            if self.models.get(username or "", {}).pop(model_name, None) is None:
+                return False
+            self._save()
+            return True
+
+    def get_proxy_path(self, username: str, model_name: str) -> Optional[Path]:
+        """获取模特的渲染代理视频，不存在时返回None"""
+        record = self.get(username, model_name)
+        if record and record.get("proxy"):
+            proxy_path = Path(record["proxy"])
+            if proxy_path.exists():
+                return proxy_path
+        return None
+
+    def get_training_result(self, username: str, model_name: str) -> Optional[Dict[str, Any]]:
+        """获取模特的声音模型训练结果，不存在时返回None"""
+        record = self.get(username, model_name)
+        if record and record.get("training"):
+            return dict(record["training"])
+        return None
+
+    def set_training_result(self, username: str, model_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """训练完成后记录声音模型训练结果"""
+        return self.update(username, model_name, training=dict(result))
+
+    def _load(self):
+        if not self.catalog_path.exists():
+            return
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                self.models = json.load(f)
+        except Exception as e:
+            logger.error(f"加载模特目录失败: {str(e)}")
+
+    def _save(self):
+        """保存目录（调用方持有锁）"""
+        try:
+            tmp_path = self.catalog_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.models, f, ensure_ascii=False)
+            os.replace(tmp_path, self.catalog_path)
+        except Exception as e:
+            logger.error(f"保存模特目录失败: {str(e)}")
+
+
+# 创建全局模特目录实例
+model_catalog = ModelCatalog()
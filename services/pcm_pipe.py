@@ -0,0 +1,74 @@
+import subprocess
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from config import MEDIA_CATEGORY_TIMEOUTS
+from services import wav_io
+from services.ffmpeg_runner import ffmpeg_runner
+
+SAMPLE_WIDTH = 2  # s16le
+BLOCK_FRAMES = 65536  # 每次从管道读取的帧数
+
+
+def _decode_cmd(src_path: Path, sample_rate: int, channels: int):
+    return [
+        "ffmpeg",
+        "-v", "error",
+        "-i", str(src_path),
+        "-vn",
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "-ac", str(channels),
+        "pipe:1"
+    ]
+
+
+def iter_pcm(src_path: Path, sample_rate: int, channels: int, job_id: Optional[str] = None,
+             timeout: Optional[float] = None, block_frames: int = BLOCK_FRAMES) -> Iterator[np.ndarray]:
+    """解码音频为指定采样率与声道数的16位PCM，按块产出 (帧数, 声道数) 的int16数组
+
+    ffmpeg直接写入管道，不产生中间文件；提前停止迭代时进程随即终止。
+    """
+    frame_bytes = SAMPLE_WIDTH * channels
+    block_bytes = block_frames * frame_bytes
+    timeout = timeout if timeout is not None else MEDIA_CATEGORY_TIMEOUTS.get("audio")
+    with ffmpeg_runner.popen(
+        _decode_cmd(src_path, sample_rate, channels), "audio", job_id, timeout=timeout,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    ) as proc:
+        rest = b""
+        while True:
+            chunk = proc.stdout.read(block_bytes)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            usable = len(chunk) - len(chunk) % frame_bytes
+            rest = chunk[usable:]
+            if usable:
+                yield np.frombuffer(chunk[:usable], dtype='<i2').reshape(-1, channels)
+        proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed ({proc.returncode}): {src_path}")
+
+
+def read_pcm(src_path: Path, sample_rate: int, channels: int = 1, job_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> np.ndarray:
+    """解码整段音频到numpy数组，形状为 (帧数, 声道数)"""
+    blocks = list(iter_pcm(src_path, sample_rate, channels, job_id, timeout))
+    if not blocks:
+        return np.zeros((0, channels), dtype='<i2')
+    return np.concatenate(blocks)
+
+
+def extract_wav(src_path: Path, dst_path: Path, sample_rate: int, channels: int = 1,
+                job_id: Optional[str] = None, timeout: Optional[float] = None) -> wav_io.WavInfo:
+    """解码音频并边读边写为WAV文件，结束后修正文件头"""
+    fmt_chunk = wav_io.pcm_fmt_chunk(sample_rate, channels, SAMPLE_WIDTH * 8)
+    with open(dst_path, 'w+b') as f:
+        f.write(wav_io.build_header(fmt_chunk, 0))
+        for block in iter_pcm(src_path, sample_rate, channels, job_id, timeout):
+            f.write(block.tobytes())
+        return wav_io.patch_header(f)
@@ -0,0 +1,237 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import PROBE_CACHE_SIZE, PROBE_CACHE_FILE, PROBE_CACHE_SAVE_DELAY
+from services.ffmpeg_runner import ffmpeg_runner
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """解析ffprobe的帧率字符串，如 '30000/1001'"""
+    if not rate or rate in ("0/0", "N/A"):
+        return 0.0
+    if "/" in rate:
+        num, den = rate.split("/", 1)
+        return float(num) / float(den) if float(den) else 0.0
+    return float(rate)
+
+
+class ProbeCache:
+    """媒体文件探测结果缓存
+
+    以 (路径, 大小, mtime_ns) 为键缓存 ffprobe 结果（时长、分辨率、帧率、编码、关键帧）及内容摘要，
+    内存中为LRU，同时写入磁盘上的小索引文件，重启后无需重新探测。
+    索引在变更后延迟 save_delay 秒合并写入，写文件时不持有锁；关键帧列表较大且只用于分段渲染，只保存在内存中。
+    文件被修改后大小或mtime变化，旧条目自动失效。
+    """
+
+    def __init__(self, index_path: Path = PROBE_CACHE_FILE, max_entries: int = PROBE_CACHE_SIZE,
+                 save_delay: float = PROBE_CACHE_SAVE_DELAY):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # 路径 -> 条目
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # 串行化索引写入
+        self.save_timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+        atexit.register(self.flush)
+
+    def probe(self, path: Path) -> Dict[str, Any]:
+        """获取媒体信息：duration, width, height, fps, video_codec, audio_codec, sample_rate, channels"""
+        entry = self._lookup(Path(path))
+        if "info" not in entry:
+            entry["info"] = self._run_ffprobe(Path(path))
+            self._store(Path(path), entry)
+        return entry["info"]
+
+    def get_duration(self, path: Path) -> float:
+        """获取媒体时长（秒）"""
+        return self.probe(path).get("duration", 0.0)
+
+    def get_keyframes(self, path: Path) -> List[float]:
+        """获取视频关键帧时间点（秒），按时间排序"""
+        entry = self._lookup(Path(path))
+        if "keyframes" not in entry:
+            entry["keyframes"] = self._run_keyframe_probe(Path(path))
+            self._store(Path(path), entry)
+        return entry["keyframes"]
+
+    def get_keyframe_interval(self, path: Path) -> float:
+        """平均关键帧间隔（秒），无法确定时返回0"""
+        keyframes = self.get_keyframes(path)
+        if len(keyframes) < 2:
+            return 0.0
+        return (keyframes[-1] - keyframes[0]) / (len(keyframes) - 1)
+
+    def get_digest(self, path: Path) -> str:
+        """文件内容的SHA-256，与探测结果同样按 (路径, 大小, mtime_ns) 缓存"""
+        entry = self._lookup(Path(path))
+        if "sha256" not in entry:
+            sha256 = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha256.update(chunk)
+            entry["sha256"] = sha256.hexdigest()
+            self._store(Path(path), entry)
+        return entry["sha256"]
+
+    def set_digest(self, path: Path, digest: str):
+        """写入已知的文件摘要（如上传时边复制边计算的结果）"""
+        entry = self._lookup(Path(path))
+        entry["sha256"] = digest
+        self._store(Path(path), entry)
+
+    def invalidate(self, path: Path):
+        """移除指定文件的缓存"""
+        with self.lock:
+            if self.entries.pop(str(path), None) is not None:
+                self._schedule_save()
+
+    def flush(self):
+        """立即写入尚未保存的索引变更"""
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+        self._save()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def _lookup(self, path: Path) -> Dict[str, Any]:
+        """按 (路径, 大小, mtime_ns) 查找条目，未命中时返回新的空条目"""
+        stat = path.stat()
+        key = str(path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry)
+            self.misses += 1
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _store(self, path: Path, entry: Dict[str, Any]):
+        with self.lock:
+            self.entries[str(path)] = entry
+            self.entries.move_to_end(str(path))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._schedule_save()
+
+    def _schedule_save(self):
+        """安排延迟保存（调用方持有锁），期间的多次变更合并为一次写入"""
+        if self.save_timer is None:
+            self.save_timer = threading.Timer(self.save_delay, self._save_due)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def _save_due(self):
+        with self.lock:
+            self.save_timer = None
+        self._save()
+
+    def _run_ffprobe(self, path: Path) -> Dict[str, Any]:
+        """运行ffprobe获取格式与流信息"""
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-print_format", "json",
+            "-show_format",
+            "-show_streams",
+            str(path)
+        ]
+        result = ffmpeg_runner.run(cmd, category="probe", text=True)
+        data = json.loads(result.stdout or "{}")
+        info: Dict[str, Any] = {"duration": float(data.get("format", {}).get("duration") or 0.0)}
+        for stream in data.get("streams", []):
+            if stream.get("codec_type") == "video" and "video_codec" not in info:
+                info.update({
+                    "video_codec": stream.get("codec_name"),
+                    "width": stream.get("width"),
+                    "height": stream.get("height"),
+                    "fps": _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate")),
+                    "rotation": self._get_rotation(stream)
+                })
+            elif stream.get("codec_type") == "audio" and "audio_codec" not in info:
+                info.update({
+                    "audio_codec": stream.get("codec_name"),
+                    "sample_rate": int(stream.get("sample_rate") or 0),
+                    "channels": stream.get("channels")
+                })
+        return info
+
+    @staticmethod
+    def _get_rotation(stream: Dict[str, Any]) -> int:
+        """旋转角度：旧版ffprobe在tags.rotate，新版在side_data_list"""
+        rotate = (stream.get("tags") or {}).get("rotate")
+        if rotate is None:
+            for side_data in stream.get("side_data_list") or []:
+                if "rotation" in side_data:
+                    rotate = side_data["rotation"]
+                    break
+        return int(float(rotate or 0)) % 360
+
+    def _run_keyframe_probe(self, path: Path) -> List[float]:
+        """读取视频流的包标记获取关键帧时间，不解码画面"""
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            str(path)
+        ]
+        result = ffmpeg_runner.run(cmd, category="probe", text=True)
+        keyframes = []
+        for line in result.stdout.splitlines():
+            parts = line.strip().split(",")
+            if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+                keyframes.append(round(float(parts[0]), 3))
+        return sorted(keyframes)
+
+    def _load(self):
+        """加载磁盘索引"""
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, entry in data.items():
+                self.entries[key] = entry
+            logger.info(f"已加载 {len(self.entries)} 条媒体探测缓存")
+        except Exception as e:
+            logger.error(f"加载媒体探测缓存失败: {str(e)}")
+
+    def _save(self):
+        """保存磁盘索引（不含关键帧），只在复制快照时持有锁，先写临时文件再替换"""
+        with self.save_lock:
+            with self.lock:
+                data = {
+                    key: {field: value for field, value in entry.items() if field != "keyframes"}
+                    for key, entry in self.entries.items()
+                }
+            try:
+                tmp_path = self.index_path.with_suffix(".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.index_path)
+            except Exception as e:
+                logger.error(f"保存媒体探测缓存失败: {str(e)}")
+
+
+# 创建全局媒体探测缓存实例
+probe_cache = ProbeCache()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from config import RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES
+from services.probe_cache import probe_cache
+
+logger = logging.getLogger(__name__)
+
+
+def link_or_copy(src: Path, dst: Path):
+    """优先创建硬链接，跨文件系统时回退为复制"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class RenderCache:
+    """按内容寻址的渲染结果缓存
+
+    键为 模特视频内容哈希 + 音频内容哈希 + 渲染参数(chaofen/watermark_switch/pn)，
+    命中时把已有的 -r.mp4 硬链接到用户目录，无需重新提交face2face任务。
+    缓存文件与用户文件共享inode，写入用户目录的一方必须先写临时文件再 os.replace，不能原地覆盖。
+    缓存总大小超过上限时按最近访问时间淘汰。
+    """
+
+    SUFFIX = ".mp4"  # 缓存文件扩展名
+    NAME = "渲染缓存"  # 日志中的名称
+
+    def __init__(self, cache_dir: Path = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = cache_dir / "index.json"
+        self.index: Dict[str, Dict[str, Any]] = {}  # 键 -> {size, last_access}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def make_key(self, video_path: Path, audio_path: Path, options: Dict[str, Any]) -> str:
+        """计算缓存键，文件哈希由探测缓存按 (路径, 大小, mtime_ns) 复用"""
+        payload = json.dumps({
+            "video": probe_cache.get_digest(video_path),
+            "audio": probe_cache.get_digest(audio_path),
+            "options": {k: options[k] for k in sorted(options)}
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """命中时将缓存结果链接到目标路径"""
+        with self.lock:
+            entry = self.index.get(key)
+            cached_path = self._entry_path(key)
+            if not entry or not cached_path.exists():
+                if entry:
+                    # 索引与磁盘不一致，移除失效条目
+                    del self.index[key]
+                    self._save()
+                self.misses += 1
+                return False
+            entry["last_access"] = time.time()
+            self.hits += 1
+            self._save()
+        link_or_copy(cached_path, dest)
+        logger.info(f"{self.NAME}命中: {key[:12]} -> {dest}")
+        return True
+
+    def store(self, key: str, result_path: Path):
+        """保存结果文件，并按LRU淘汰超出容量的条目"""
+        if not result_path.exists():
+            logger.warning(f"{self.NAME}: 文件不存在，跳过缓存: {result_path}")
+            return
+        cached_path = self._entry_path(key)
+        link_or_copy(result_path, cached_path)
+        with self.lock:
+            self.index[key] = {"size": cached_path.stat().st_size, "last_access": time.time()}
+            self._evict()
+            self._save()
+        logger.info(f"{self.NAME}已保存: {key[:12]} ({result_path})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中统计与占用情况"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.index),
+                "bytes": sum(entry["size"] for entry in self.index.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.SUFFIX}"
+
+    def _evict(self):
+        """按最近访问时间淘汰（调用方持有锁）"""
+        total = sum(entry["size"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)["size"]
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+            logger.info(f"{self.NAME}淘汰: {key[:12]}")
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except Exception as e:
+            logger.error(f"加载{self.NAME}索引失败: {str(e)}")
+
+    def _save(self):
+        """保存索引（调用方持有锁）"""
+        try:
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"保存{self.NAME}索引失败: {str(e)}")
+
+
+# 创建全局渲染缓存实例
+render_cache = RenderCache()
@@ -0,0 +1,100 @@
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+from config import (
+    SEGMENT_MIN_SECONDS,
+    SEGMENT_MAX_SECONDS,
+    SEGMENT_DEFAULT_OVERHEAD,
+    SEGMENT_DEFAULT_COST,
+)
+
+
+class SegmentCostModel:
+    """分段处理耗时模型：耗时 ≈ 固定开销 + 片段时长 × 每秒耗时
+
+    用最近的实测样本做最小二乘拟合，样本不足时使用默认值。
+    """
+
+    def __init__(self, max_samples: int = 64):
+        self.samples: deque = deque(maxlen=max_samples)  # (片段时长, 实际耗时)
+        self.lock = threading.Lock()
+
+    def record(self, length: float, seconds: float):
+        """记录一个片段的实测耗时"""
+        with self.lock:
+            self.samples.append((length, seconds))
+
+    def estimate(self) -> Tuple[float, float]:
+        """返回 (每段固定开销, 每秒内容耗时)"""
+        with self.lock:
+            samples = list(self.samples)
+        if len(samples) < 4:
+            return SEGMENT_DEFAULT_OVERHEAD, SEGMENT_DEFAULT_COST
+        n = len(samples)
+        mean_x = sum(x for x, _ in samples) / n
+        mean_y = sum(y for _, y in samples) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+        if var_x <= 1e-9:
+            # 片段长度都相同时无法分离两项，按默认开销拆分
+            overhead = min(SEGMENT_DEFAULT_OVERHEAD, mean_y)
+            return overhead, max(0.0, (mean_y - overhead) / mean_x) if mean_x else SEGMENT_DEFAULT_COST
+        cost = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x
+        cost = max(cost, 0.0)
+        overhead = max(mean_y - cost * mean_x, 0.0)
+        return overhead, cost
+
+
+def plan_segments(
+    duration: float,
+    workers: int,
+    keyframe_interval: float = 0.0,
+    overhead: float = SEGMENT_DEFAULT_OVERHEAD,
+    cost_per_second: float = SEGMENT_DEFAULT_COST
+) -> Dict[str, Any]:
+    """根据时长、关键帧间隔、并行数和每段开销规划分段
+
+    片段长度向上对齐到关键帧间隔（流复制只能在关键帧处切分），
+    对每个候选段数估算总耗时 ceil(段数/并行数) × (开销 + 段长 × 每秒耗时)，取最小者；
+    耗时相同时取段数更少的方案。
+
+    Returns:
+        dict: segment_count, segment_length, workers, estimated_seconds, boundaries[(开始, 结束)]
+    """
+    workers = max(1, workers)
+    if duration <= 0:
+        return {"segment_count": 0, "segment_length": 0.0, "workers": workers, "estimated_seconds": 0.0, "boundaries": []}
+
+    min_length = min(SEGMENT_MIN_SECONDS, duration)
+    max_count = max(1, math.ceil(duration / min_length))
+    best = None
+    for count in range(1, max_count + 1):
+        length = duration / count
+        if keyframe_interval > 0:
+            length = math.ceil(length / keyframe_interval) * keyframe_interval
+        length = min(max(length, min_length), duration)
+        if length > SEGMENT_MAX_SECONDS and count < max_count:
+            continue
+        actual_count = math.ceil(duration / length - 1e-9)
+        waves = math.ceil(actual_count / workers)
+        estimated = waves * (overhead + length * cost_per_second)
+        if best is None or estimated < best[0] - 1e-9:
+            best = (estimated, actual_count, length)
+
+    estimated, count, length = best
+    boundaries: List[Tuple[float, float]] = []
+    start = 0.0
+    while start < duration - 1e-6:
+        end = min(start + length, duration)
+        boundaries.append((round(start, 3), round(end, 3)))
+        start = end
+    return {
+        "segment_count": len(boundaries),
+        "segment_length": round(length, 3),
+        "workers": min(workers, len(boundaries)),
+        "estimated_seconds": round(estimated, 2),
+        "overhead": round(overhead, 3),
+        "cost_per_second": round(cost_per_second, 4),
+        "boundaries": boundaries
+    }
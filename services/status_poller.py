@@ -0,0 +1,311 @@
+import logging
+import time
+import threading
+import concurrent.futures
+from typing import Dict, List, Optional, Callable, Any
+
+from config import (
+    STATUS_POLL_MIN_INTERVAL,
+    STATUS_POLL_MAX_INTERVAL,
+    STATUS_POLL_BACKOFF,
+    STATUS_POLL_LONG_JOB,
+    STATUS_CACHE_TTL,
+    STATUS_CACHE_KEEP,
+    VIDEO_RENDER_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# face2face 状态码
+SUCCESS_CODE = 10000
+STATUS_PROCESSING = 1
+STATUS_DONE = 2
+STATUS_FAILED = 3
+
+
+def is_terminal(status_data: Dict[str, Any]) -> bool:
+    """判断状态响应是否表示任务已结束（完成或失败）"""
+    if not status_data or status_data.get('code') != SUCCESS_CODE:
+        return False
+    return (status_data.get('data') or {}).get('status') in (STATUS_DONE, STATUS_FAILED)
+
+
+class _TrackedJob:
+    """轮询中的任务"""
+
+    def __init__(self, code: str, task_id: Optional[str] = None):
+        self.code = code
+        self.task_id = task_id  # 关联的任务队列任务ID
+        self.started_at = time.monotonic()
+        self.interval = STATUS_POLL_MIN_INTERVAL
+        self.next_poll = self.started_at
+        self.last_progress = None
+        self.errors = 0
+
+
+class StatusPoller:
+    """face2face 任务状态集中轮询器
+
+    后台单线程统一跟踪所有进行中的任务编码，每轮只查询到期的任务：
+    状态无变化时按系数放大间隔，长任务起始间隔加倍。
+    查询结果写入缓存，check_status/get_video_path 直接读缓存：跟踪中的任务返回最近一次轮询结果，
+    未跟踪的任务缓存按TTL过期，过期后同步查询，同一编码同时只发出一个请求；
+    任务结束时通知监听器，并把完成/失败事件推送到任务队列。
+    """
+
+    def __init__(
+        self,
+        fetch_status: Callable[[str], Dict[str, Any]],
+        task_queue=None,
+        max_workers: int = 4,
+        max_errors: int = 3,
+        deadline: float = VIDEO_RENDER_TIMEOUT,
+        resolve_result: Optional[Callable[[str, Dict[str, Any]], Any]] = None
+    ):
+        self.fetch_status = fetch_status
+        self.task_queue = task_queue
+        self.resolve_result = resolve_result  # 结果路径映射（如映射到用户目录），写入任务队列结果时使用
+        self.max_workers = max_workers
+        self.max_errors = max_errors  # 连续返回错误码的次数上限
+        self.deadline = deadline  # 跟踪超过该时长（秒）仍未结束的任务按失败处理
+        self.jobs: Dict[str, _TrackedJob] = {}
+        self.cache: Dict[str, tuple] = {}  # code -> (写入时间, 状态数据)
+        self.listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self.track_listeners: List[Callable[[str], None]] = []
+        self.events: Dict[str, threading.Event] = {}
+        self.fetching: Dict[str, concurrent.futures.Future] = {}  # 进行中的同步查询，同一编码的调用方共用
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """启动轮询线程"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        logger.info("任务状态轮询器已启动")
+
+    def stop(self):
+        """停止轮询线程"""
+        self.running = False
+        self.wakeup.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5.0)
+        logger.info("任务状态轮询器已停止")
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """注册任务结束监听器 listener(code, status_data)"""
+        self.listeners.append(listener)
+
+    def add_track_listener(self, listener: Callable[[str], None]):
+        """注册开始跟踪监听器 listener(code)，每个任务编码开始跟踪时调用一次"""
+        self.track_listeners.append(listener)
+
+    def track(self, code: str, task_id: Optional[str] = None):
+        """开始跟踪任务编码"""
+        with self.lock:
+            job = self.jobs.get(code)
+            if job:
+                job.task_id = task_id or job.task_id
+            else:
+                self.jobs[code] = _TrackedJob(code, task_id)
+            self.events.setdefault(code, threading.Event())
+        if not job:
+            for listener in list(self.track_listeners):
+                try:
+                    listener(code)
+                except Exception as e:
+                    logger.error(f"开始跟踪监听器执行失败: {str(e)}")
+        if not self.running:
+            self.start()
+        self.wakeup.set()
+
+    def untrack(self, code: str):
+        """停止跟踪任务编码"""
+        with self.lock:
+            self.jobs.pop(code, None)
+
+    def is_tracking(self, code: str) -> bool:
+        with self.lock:
+            return code in self.jobs
+
+    def get_cached(self, code: str) -> Optional[Dict[str, Any]]:
+        """读取缓存状态：跟踪中的任务由轮询器刷新，不过期；其他进行中的任务超过TTL视为过期"""
+        with self.lock:
+            entry = self.cache.get(code)
+            tracked = code in self.jobs
+        if not entry:
+            return None
+        cached_at, status_data = entry
+        if tracked:
+            return status_data
+        age = time.monotonic() - cached_at
+        ttl = STATUS_CACHE_KEEP if is_terminal(status_data) else STATUS_CACHE_TTL
+        return status_data if age <= ttl else None
+
+    def get_status(self, code: str) -> Dict[str, Any]:
+        """获取任务状态：优先读缓存，缓存失效时同步查询一次并纳入跟踪
+
+        同一编码的并发调用只发出一个请求，其余调用方等待其结果。
+        """
+        status_data = self.get_cached(code)
+        if status_data is not None:
+            return status_data
+        with self.lock:
+            future = self.fetching.get(code)
+            owner = future is None
+            if owner:
+                future = self.fetching[code] = concurrent.futures.Future()
+        if not owner:
+            return future.result()
+        try:
+            status_data = self.fetch_status(code)
+            self.update(code, status_data)
+            future.set_result(status_data)
+            return status_data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.fetching.pop(code, None)
+
+    def update(self, code: str, status_data: Dict[str, Any]):
+        """写入在轮询之外查询到的状态（如异步查询），未结束的任务纳入跟踪"""
+        self._record(code, status_data)
+        if not is_terminal(status_data):
+            self.track(code)
+
+    def wait(self, code: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """阻塞等待任务结束，返回最终状态；超时返回None"""
+        status_data = self.get_cached(code)
+        if status_data is not None and is_terminal(status_data):
+            return status_data
+        self.track(code)
+        with self.lock:
+            event = self.events.setdefault(code, threading.Event())
+        if not event.wait(timeout):
+            return None
+        return self.get_cached(code)
+
+    def _record(self, code: str, status_data: Dict[str, Any]):
+        """写入缓存，任务结束时触发完成事件"""
+        with self.lock:
+            self.cache[code] = (time.monotonic(), status_data)
+            job = self.jobs.pop(code, None) if is_terminal(status_data) else None
+            event = self.events.get(code)
+        if is_terminal(status_data):
+            self._on_complete(code, status_data, job.task_id if job else None)
+            if event:
+                event.set()
+
+    def _on_complete(self, code: str, status_data: Dict[str, Any], task_id: Optional[str]):
+        """任务结束：通知监听器并推送到任务队列"""
+        data = status_data.get('data') or {}
+        logger.info(f"face2face任务 {code} 已结束，状态: {data.get('status')}")
+        if self.task_queue and task_id:
+            if data.get('status') == STATUS_DONE:
+                video_path = data.get('result')
+                if self.resolve_result:
+                    try:
+                        video_path = self.resolve_result(code, status_data)
+                    except Exception as e:
+                        logger.error(f"结果路径映射失败: {str(e)}")
+                self.task_queue.update_task_progress(task_id, 100.0, result={"code": code, "video_path": video_path})
+            else:
+                self.task_queue.update_task_progress(task_id, 0.0, error=data.get('msg') or "视频生成失败")
+        for listener in list(self.listeners):
+            try:
+                listener(code, status_data)
+            except Exception as e:
+                logger.error(f"任务结束监听器执行失败: {str(e)}")
+
+    def _poll_one(self, job: _TrackedJob):
+        """查询单个任务并调整下次轮询时间
+
+        网络错误（节点重启、连接中断）不放弃，按退避间隔继续轮询，最长 STATUS_POLL_MAX_INTERVAL；
+        只有持续返回错误码或超过总时限时才按失败结束。
+        """
+        if time.monotonic() - job.started_at > self.deadline:
+            self._give_up(job, f"视频生成超过 {self.deadline:.0f} 秒仍未结束")
+            return
+        try:
+            status_data = self.fetch_status(job.code)
+        except Exception as e:
+            logger.warning(f"轮询任务 {job.code} 失败，{job.interval:.1f}秒后重试: {str(e)}")
+            job.interval = min(job.interval * STATUS_POLL_BACKOFF, STATUS_POLL_MAX_INTERVAL)
+            job.next_poll = time.monotonic() + job.interval
+            return
+
+        self._record(job.code, status_data)
+        if is_terminal(status_data):
+            return
+        if status_data.get('code') != SUCCESS_CODE:
+            # 服务端返回错误码（如任务不存在），连续多次后放弃跟踪
+            job.errors += 1
+            if job.errors >= self.max_errors:
+                logger.warning(f"任务 {job.code} 状态查询持续返回错误，停止跟踪: {status_data}")
+                self._give_up(job, status_data.get('msg') or "状态查询持续返回错误")
+                return
+        else:
+            job.errors = 0
+
+        data = status_data.get('data') or {}
+        progress = data.get('progress')
+        now = time.monotonic()
+        floor = STATUS_POLL_MIN_INTERVAL
+        if now - job.started_at > STATUS_POLL_LONG_JOB:
+            floor = min(STATUS_POLL_MIN_INTERVAL * 2, STATUS_POLL_MAX_INTERVAL)
+        if progress is not None and progress != job.last_progress:
+            # 有进展时保持较短间隔，并同步进度到任务队列
+            job.interval = floor
+            job.last_progress = progress
+            if self.task_queue and job.task_id:
+                self.task_queue.update_task_progress(job.task_id, min(float(progress), 99.0))
+        else:
+            job.interval = min(max(job.interval * STATUS_POLL_BACKOFF, floor), STATUS_POLL_MAX_INTERVAL)
+        job.next_poll = now + job.interval
+
+    def _give_up(self, job: _TrackedJob, reason: str):
+        """放弃跟踪：按失败结束处理，唤醒等待方并通知监听器（释放节点在途名额等）"""
+        logger.warning(f"放弃跟踪任务 {job.code}: {reason}")
+        self._record(job.code, {
+            "code": SUCCESS_CODE,
+            "data": {"status": STATUS_FAILED, "msg": reason},
+            "msg": reason
+        })
+
+    def _purge_cache(self):
+        """清理过期的缓存条目"""
+        now = time.monotonic()
+        with self.lock:
+            expired = [
+                code for code, (cached_at, _) in self.cache.items()
+                if now - cached_at > STATUS_CACHE_KEEP and code not in self.jobs
+            ]
+            for code in expired:
+                del self.cache[code]
+                self.events.pop(code, None)
+
+    def _run(self):
+        """轮询线程：每轮并发查询所有到期的任务"""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while self.running:
+                try:
+                    self.wakeup.clear()
+                    now = time.monotonic()
+                    with self.lock:
+                        due = [job for job in self.jobs.values() if job.next_poll <= now]
+                        next_wake = min((job.next_poll for job in self.jobs.values()), default=now + STATUS_POLL_MAX_INTERVAL)
+                    if due:
+                        concurrent.futures.wait([executor.submit(self._poll_one, job) for job in due])
+                        self._purge_cache()
+                        continue
+                    self.wakeup.wait(timeout=max(0.1, next_wake - now))
+                except Exception as e:
+                    logger.error(f"状态轮询线程异常: {str(e)}")
+                    time.sleep(5)
@@ -10,7 +10,8 @@ from typing import Dict, List, Optional, Callable, Any
 from datetime import datetime
 import uuid
 
-from config import BASE_DIR
+from config import BASE_DIR, TASK_AFFINITY_WINDOW, TASK_AFFINITY_MAX_SKIPS
+from services.ffmpeg_runner import ffmpeg_runner
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +34,10 @@ class TaskPriority(int, Enum):
 class TaskType(str, Enum):
     MODEL_TRAINING = "model_training"
     AUDIO_SYNTHESIS = "audio_synthesis"
+    AUDIO_BATCH_SYNTHESIS = "audio_batch_synthesis"  # 同一声音批量合成多条文案
     VIDEO_GENERATION = "video_generation"
     FILE_CLEANUP = "file_cleanup"
+    LOCAL_VIDEO_PROCESSING = "local_video_processing"  # 本地大文件分段处理
 
 class Task:
     def __init__(
@@ -44,7 +47,8 @@ class Task:
         params: Dict[str, Any],
         username: str,
         priority: TaskPriority = TaskPriority.NORMAL,
-        callback: Optional[Callable] = None
+        callback: Optional[Callable] = None,
+        affinity_key: Optional[str] = None
     ):
         self.task_id = task_id
         self.task_type = task_type
@@ -67,6 +71,10 @@ class Task:
             "memory": 512,  # 内存MB
             "gpu": 0.0,  # GPU使用量
         }
+        self.details: Dict[str, Any] = {}  # 任务附加信息（如分段进度）
+        self.affinity_key = affinity_key  # 亲和键（如TTS参考音频），相同键的任务尽量连续执行
+        self.affinity_skips = 0  # 被同亲和键任务插队的次数
+        self.affinity_jumped = False  # 本次出队是否因亲和键插队
 
     def to_dict(self) -> Dict[str, Any]:
         """将任务转换为字典表示"""
@@ -81,7 +89,9 @@ class Task:
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "progress": self.progress,
             "result": self.result,
-            "error": self.error
+            "error": self.error,
+            "details": self.details,
+            "affinity_key": self.affinity_key
         }
 
     def __lt__(self, other):
@@ -90,10 +100,19 @@ class Task:
             return self.priority > other.priority  # 高优先级先执行
         return self.created_at < other.created_at  # 同优先级按创建时间排序
 
+# 进程重启时处理中的任务被标记为失败的原因，可续跑的任务据此恢复
+INTERRUPTED_ERROR = "系统重启导致任务中断"
+
+# 回调返回该值表示任务已提交到外部执行（如face2face渲染），
+# 工作线程不等待结果，任务转为外部任务，由外部的完成事件调用 update_task_progress 结束
+DEFERRED = object()
+
+
 class TaskQueue:
     def __init__(self, max_concurrent_tasks: int = 2):
         self.task_queue = queue.PriorityQueue()
         self.active_tasks: Dict[str, Task] = {}
+        self.external_tasks: Dict[str, Task] = {}  # 由外部线程或服务执行的任务，不占用调度名额
         self.completed_tasks: Dict[str, Task] = {}
         self.max_concurrent_tasks = max_concurrent_tasks
         self.lock = threading.Lock()
@@ -102,6 +121,10 @@ class TaskQueue:
         self.timeout_thread = threading.Thread(target=self._check_timeouts, daemon=True)
         self.running = False
         
+        # 亲和调度：上一个任务的亲和键与统计
+        self.last_affinity_key: Optional[str] = None
+        self.affinity_stats = {"switches": 0, "switches_saved": 0}
+        
         # 资源管理
         self.available_resources = {
             "cpu": os.cpu_count() or 4,  # 可用CPU核心数
@@ -140,18 +163,55 @@ class TaskQueue:
             logger.info(f"已添加任务 {task.task_id} 到队列")
         return task.task_id
 
+    def register_external_task(self, task: Task) -> str:
+        """登记由外部线程执行的任务（如本地大文件处理）
+
+        任务直接进入处理中状态，不经过调度与资源分配，也不计入 max_concurrent_tasks，
+        通过 update_task_progress/update_task_details 更新状态。
+        """
+        with self.lock:
+            task.status = TaskStatus.PROCESSING
+            task.started_at = datetime.now()
+            task.timeout = 0  # 执行由外部线程负责，不做超时重试
+            task.resource_usage = {}
+            self.external_tasks[task.task_id] = task
+            self.save_tasks()
+            logger.info(f"已登记外部任务 {task.task_id}")
+        return task.task_id
+
+    def resume_interrupted_task(self, task_id: str) -> bool:
+        """续跑因重启中断的任务：从已结束任务移回外部执行中的任务，返回是否恢复"""
+        with self.lock:
+            task = self.completed_tasks.get(task_id)
+            if not task or task.status != TaskStatus.FAILED or task.error != INTERRUPTED_ERROR:
+                return False
+            del self.completed_tasks[task_id]
+            task.status = TaskStatus.PROCESSING
+            task.error = None
+            task.completed_at = None
+            task.timeout = 0
+            task.resource_usage = {}
+            self.external_tasks[task_id] = task
+            self.save_tasks()
+            logger.info(f"已恢复中断的任务 {task_id}")
+        return True
+
     def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
         with self.lock:
             # 检查活动任务
-            if task_id in self.active_tasks:
-                task = self.active_tasks[task_id]
+            task = self._running_task(task_id)
+            if task:
                 if task.status == TaskStatus.PROCESSING:
-                    logger.warning(f"无法取消正在处理的任务 {task_id}")
-                    return False
+                    if task.task_type != TaskType.LOCAL_VIDEO_PROCESSING:
+                        logger.warning(f"无法取消正在处理的任务 {task_id}")
+                        return False
+                    # 本地分段任务：终止其所有ffmpeg进程，剩余片段不再启动
+                    ffmpeg_runner.cancel(task_id)
+                    task.completed_at = datetime.now()
                 task.status = TaskStatus.CANCELLED
                 self.completed_tasks[task_id] = task
-                del self.active_tasks[task_id]
+                self._drop_running(task_id)
                 self.save_tasks()
                 logger.info(f"已取消任务 {task_id}")
                 return True
@@ -179,11 +239,17 @@ class TaskQueue:
             logger.warning(f"未找到任务 {task_id}")
             return False
 
+    def find_task(self, task_id: str) -> Optional[Task]:
+        """查找执行中或已结束的任务，不遍历等待队列，适合频繁的状态查询"""
+        with self.lock:
+            return self._running_task(task_id) or self.completed_tasks.get(task_id)
+
     def get_task(self, task_id: str) -> Optional[Task]:
         """获取任务信息"""
         with self.lock:
-            if task_id in self.active_tasks:
-                return self.active_tasks[task_id]
+            task = self._running_task(task_id)
+            if task:
+                return task
             if task_id in self.completed_tasks:
                 return self.completed_tasks[task_id]
             
@@ -209,8 +275,8 @@ class TaskQueue:
         with self.lock:
             result = []
             
-            # 检查活动任务
-            for task_id, task in self.active_tasks.items():
+            # 检查活动任务（含外部执行的任务）
+            for task in list(self.active_tasks.values()) + list(self.external_tasks.values()):
                 if task.username == username:
                     result.append(task.to_dict())
             
@@ -237,7 +303,7 @@ class TaskQueue:
         """获取队列状态"""
         with self.lock:
             pending_count = self.task_queue.qsize()
-            active_count = len(self.active_tasks)
+            active_count = len(self.active_tasks) + len(self.external_tasks)
             completed_count = len(self.completed_tasks)
             
             # 按任务类型统计
@@ -262,8 +328,8 @@ class TaskQueue:
             for task in tasks:
                 self.task_queue.put(task)
             
-            # 统计活动任务
-            for task in self.active_tasks.values():
+            # 统计活动任务（含外部执行的任务）
+            for task in list(self.active_tasks.values()) + list(self.external_tasks.values()):
                 type_counts[task.task_type]["processing"] += 1
             
             # 统计已完成任务
@@ -278,16 +344,18 @@ class TaskQueue:
             return {
                 "pending_count": pending_count,
                 "active_count": active_count,
+                "external_count": len(self.external_tasks),
                 "completed_count": completed_count,
                 "max_concurrent_tasks": self.max_concurrent_tasks,
-                "type_counts": type_counts
+                "type_counts": type_counts,
+                "affinity": dict(self.affinity_stats)
             }
 
     def update_task_progress(self, task_id: str, progress: float, result: Any = None, error: str = None) -> bool:
         """更新任务进度"""
         with self.lock:
-            if task_id in self.active_tasks:
-                task = self.active_tasks[task_id]
+            task = self._running_task(task_id)
+            if task:
                 task.progress = min(100.0, max(0.0, progress))
                 
                 if progress >= 100.0:
@@ -298,7 +366,7 @@ class TaskQueue:
                     
                     # 释放资源
                     self._release_resources(task)
-                    del self.active_tasks[task_id]
+                    self._drop_running(task_id)
                 elif error:
                     task.status = TaskStatus.FAILED
                     task.completed_at = datetime.now()
@@ -307,7 +375,7 @@ class TaskQueue:
                     
                     # 释放资源
                     self._release_resources(task)
-                    del self.active_tasks[task_id]
+                    self._drop_running(task_id)
                 
                 self.save_tasks()
                 return True
@@ -315,6 +383,19 @@ class TaskQueue:
             logger.warning(f"未找到活动任务 {task_id}")
             return False
 
+    def update_task_details(self, task_id: str, progress: Optional[float] = None, **details) -> bool:
+        """更新处理中任务的附加信息，可同时更新进度"""
+        with self.lock:
+            task = self._running_task(task_id)
+            if not task:
+                logger.warning(f"未找到活动任务 {task_id}")
+                return False
+            task.details.update(details)
+            if progress is not None:
+                task.progress = min(100.0, max(0.0, progress))
+            self.save_tasks()
+            return True
+
     def set_max_concurrent_tasks(self, count: int) -> bool:
         """设置最大并发任务数"""
         if count < 1:
@@ -329,6 +410,7 @@ class TaskQueue:
         try:
             data = {
                 "active_tasks": {task_id: task.to_dict() for task_id, task in self.active_tasks.items()},
+                "external_tasks": {task_id: task.to_dict() for task_id, task in self.external_tasks.items()},
                 "completed_tasks": {task_id: task.to_dict() for task_id, task in self.completed_tasks.items()}
             }
             
@@ -352,13 +434,14 @@ class TaskQueue:
                 self.completed_tasks[task_id] = task
                 
             # 恢复活动任务（仅加载PENDING状态的任务，其他状态视为失败）
-            for task_id, task_data in data.get("active_tasks", {}).items():
+            running = {**data.get("active_tasks", {}), **data.get("external_tasks", {})}
+            for task_id, task_data in running.items():
                 task = self._dict_to_task(task_data)
                 if task.status == TaskStatus.PENDING:
                     self.task_queue.put(task)
                 else:
                     task.status = TaskStatus.FAILED
-                    task.error = "系统重启导致任务中断"
+                    task.error = INTERRUPTED_ERROR
                     self.completed_tasks[task_id] = task
                     
             logger.info(f"已加载 {len(self.completed_tasks)} 个已完成任务")
@@ -372,7 +455,8 @@ class TaskQueue:
             task_type=task_data["task_type"],
             params={},  # 参数不保存
             username=task_data["username"],
-            priority=task_data.get("priority", TaskPriority.NORMAL)
+            priority=task_data.get("priority", TaskPriority.NORMAL),
+            affinity_key=task_data.get("affinity_key")
         )
         
         task.status = task_data["status"]
@@ -387,6 +471,7 @@ class TaskQueue:
         task.progress = task_data.get("progress", 0)
         task.result = task_data.get("result")
         task.error = task_data.get("error")
+        task.details = task_data.get("details") or {}
         
         return task
 
@@ -444,6 +529,28 @@ class TaskQueue:
                 logger.error(f"超时检查线程异常: {str(e)}")
                 time.sleep(30)
 
+    def _defer(self, task: Task):
+        """回调已提交外部执行：释放调度名额与资源，转为外部任务等待完成事件"""
+        with self.lock:
+            if self.active_tasks.pop(task.task_id, None) is None:
+                # 完成事件已先到达，任务已结束
+                return
+            self._release_resources(task)
+            task.resource_usage = {}
+            task.timeout = 0  # 不做超时重试，避免重复提交
+            self.external_tasks[task.task_id] = task
+            self.save_tasks()
+            logger.info(f"任务 {task.task_id} 已提交外部执行，等待完成事件")
+
+    def _running_task(self, task_id: str) -> Optional[Task]:
+        """执行中的任务，包括外部执行的任务（调用方持有锁）"""
+        return self.active_tasks.get(task_id) or self.external_tasks.get(task_id)
+
+    def _drop_running(self, task_id: str):
+        """从执行中任务中移除（调用方持有锁）"""
+        self.active_tasks.pop(task_id, None)
+        self.external_tasks.pop(task_id, None)
+
     def _allocate_resources(self, task: Task) -> bool:
         """为任务分配资源"""
         # 检查是否有足够的资源
@@ -462,6 +569,44 @@ class TaskQueue:
         for resource, amount in task.resource_usage.items():
             self.used_resources[resource] = max(0, self.used_resources[resource] - amount)
 
+    def _next_task(self) -> Task:
+        """取出下一个任务（调用方持有锁）
+
+        在队首的 TASK_AFFINITY_WINDOW 个同优先级任务中，优先选择与上一个任务亲和键相同的任务，
+        避免TTS服务频繁切换说话人；被插队的任务累计次数达到 TASK_AFFINITY_MAX_SKIPS 后不再被插队。
+        """
+        head = self.task_queue.get(block=False)
+        chosen = head
+        window = [head]
+        if (self.last_affinity_key and head.affinity_key != self.last_affinity_key
+                and head.affinity_skips < TASK_AFFINITY_MAX_SKIPS):
+            while len(window) < TASK_AFFINITY_WINDOW and not self.task_queue.empty():
+                candidate = self.task_queue.get(block=False)
+                window.append(candidate)
+                if candidate.priority != head.priority:
+                    break
+                if candidate.affinity_key == self.last_affinity_key:
+                    chosen = candidate
+                    break
+        for task in window:
+            if task is not chosen:
+                if chosen is not head and task.priority == head.priority and task.created_at < chosen.created_at:
+                    task.affinity_skips += 1
+                self.task_queue.put(task)
+        chosen.affinity_jumped = chosen is not head
+        return chosen
+
+    def _record_affinity(self, task: Task):
+        """任务实际开始执行后更新亲和键与统计（调用方持有锁）"""
+        if not task.affinity_key:
+            return
+        if task.affinity_jumped:
+            self.affinity_stats["switches_saved"] += 1
+            logger.info(f"亲和调度: 任务 {task.task_id} 提前执行，避免切换模型")
+        elif self.last_affinity_key and task.affinity_key != self.last_affinity_key:
+            self.affinity_stats["switches"] += 1
+        self.last_affinity_key = task.affinity_key
+
     def _process_queue(self):
         """处理任务队列的工作线程"""
         while self.running:
@@ -472,8 +617,8 @@ class TaskQueue:
                         time.sleep(1)
                         continue
                     
-                    # 获取下一个任务
-                    task = self.task_queue.get(block=False)
+                    # 获取下一个任务（优先与上一个任务亲和键相同的任务）
+                    task = self._next_task()
                     
                     # 检查资源是否足够
                     if not self._allocate_resources(task):
@@ -483,6 +628,8 @@ class TaskQueue:
                         time.sleep(5)
                         continue
                     
+                    self._record_affinity(task)
+
                     # 更新任务状态
                     task.status = TaskStatus.PROCESSING
                     task.started_at = datetime.now()
@@ -493,7 +640,10 @@ class TaskQueue:
                 if task.callback:
                     try:
                         result = task.callback(task)
-                        self.update_task_progress(task.task_id, 100.0, result=result)
+                        if result is DEFERRED:
+                            self._defer(task)
+                        else:
+                            self.update_task_progress(task.task_id, 100.0, result=result)
                     except Exception as e:
                         logger.error(f"任务 {task.task_id} 执行失败: {str(e)}")
                         
@@ -546,17 +696,24 @@ class TaskService:
         params: Dict[str, Any],
         username: str,
         priority: TaskPriority = TaskPriority.NORMAL,
-        callback: Optional[Callable] = None
+        callback: Optional[Callable] = None,
+        affinity_key: Optional[str] = None
     ) -> str:
-        """创建新任务"""
+        """创建新任务
+
+        音频合成任务未指定亲和键时使用参考音频，相同声音的任务会被尽量连续调度。
+        """
         task_id = str(uuid.uuid4())
+        if affinity_key is None and task_type in (TaskType.AUDIO_SYNTHESIS, TaskType.AUDIO_BATCH_SYNTHESIS):
+            affinity_key = params.get("reference_audio")
         task = Task(
             task_id=task_id,
             task_type=task_type,
             params=params,
             username=username,
             priority=priority,
-            callback=callback
+            callback=callback,
+            affinity_key=affinity_key
         )
         return self.task_queue.add_task(task)
         
@@ -582,6 +739,10 @@ class TaskService:
     def update_task_progress(self, task_id: str, progress: float, result: Any = None, error: str = None) -> bool:
         """更新任务进度"""
         return self.task_queue.update_task_progress(task_id, progress, result, error)
+
+    def update_task_details(self, task_id: str, progress: Optional[float] = None, **details) -> bool:
+        """更新任务附加信息"""
+        return self.task_queue.update_task_details(task_id, progress, **details)
         
     def set_max_concurrent_tasks(self, count: int) -> bool:
         """设置最大并发任务数"""
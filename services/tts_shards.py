@@ -0,0 +1,113 @@
+import re
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from services import wav_io
+
+# 句末标点（切分为句子）与句中标点（过长句子按分句切分）
+SENTENCE_END = re.compile(r'(?<=[。！？!?；;…\n])')
+CLAUSE_END = re.compile(r'(?<=[，,、：:])')
+
+
+def _pack(parts: List[str], max_chars: int) -> List[str]:
+    """将片段依次拼接，每块不超过max_chars；单个片段过长时按长度硬切"""
+    shards = []
+    current = ""
+    for part in parts:
+        while len(part) > max_chars:
+            if current:
+                shards.append(current)
+                current = ""
+            shards.append(part[:max_chars])
+            part = part[max_chars:]
+        if current and len(current) + len(part) > max_chars:
+            shards.append(current)
+            current = ""
+        current += part
+    if current:
+        shards.append(current)
+    return shards
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """按句子切分文本，相邻句子拼接为不超过max_chars的分片
+
+    超过max_chars的句子按分句拼接切分。分片边界总在句末（或过长句子的分句末），
+    修改一句话只影响所在分片，以及其后边界随之移动的分片。
+    """
+    units: List[str] = []
+    for sentence in SENTENCE_END.split(text):
+        # 保留句间空白，拼接英文句子时不会粘连
+        if not sentence.strip():
+            continue
+        if len(sentence) > max_chars:
+            units.extend(_pack(CLAUSE_END.split(sentence), max_chars))
+        else:
+            units.append(sentence)
+    return [shard.strip() for shard in _pack(units, max_chars) if shard.strip()]
+
+
+def _samples_dtype(info: wav_io.WavInfo) -> np.dtype:
+    """WAV采样对应的numpy类型"""
+    if info.format_tag == wav_io.WAVE_FORMAT_IEEE_FLOAT and info.bits_per_sample in (32, 64):
+        return np.dtype(f"<f{info.bits_per_sample // 8}")
+    if info.format_tag == wav_io.WAVE_FORMAT_PCM and info.bits_per_sample in (16, 32):
+        return np.dtype(f"<i{info.bits_per_sample // 8}")
+    raise ValueError(f"Unsupported sample format: {info.format_tag:#x}/{info.bits_per_sample}bit")
+
+
+def read_samples(path: Path, info: wav_io.WavInfo) -> np.ndarray:
+    """以内存映射方式读取采样数据，形状为 (帧数, 声道数)"""
+    if not info.frame_count:
+        return np.zeros((0, info.channels), dtype=_samples_dtype(info))
+    data = np.memmap(path, dtype=_samples_dtype(info), mode='r', offset=info.data_offset,
+                     shape=(info.frame_count * info.channels,))
+    return data.reshape(-1, info.channels)
+
+
+def crossfade_join(paths: List[Path], dst_path: Path, fade_seconds: float = 0.02) -> wav_io.WavInfo:
+    """按顺序拼接WAV文件，相邻片段之间做线性交叉淡化
+
+    逐个片段内存映射并直接写出，内存中只保留淡化所需的尾部采样。
+    所有片段的采样格式必须一致。
+    """
+    first = None
+    tail = None
+    with open(dst_path, 'w+b') as out:
+        for path in paths:
+            info = wav_io.read_info(path)
+            if first is None:
+                first = info
+                out.write(wav_io.build_header(info.fmt_chunk, 0))
+            elif (info.format_tag, info.channels, info.sample_rate, info.bits_per_sample) != \
+                    (first.format_tag, first.channels, first.sample_rate, first.bits_per_sample):
+                raise ValueError(f"WAV format mismatch: {path}")
+            samples = read_samples(path, info)
+            fade = int(fade_seconds * info.sample_rate)
+            if tail is not None:
+                n = min(len(tail), len(samples), fade)
+                out.write(tail[:len(tail) - n].tobytes())
+                if n:
+                    ramp = np.linspace(0.0, 1.0, n)[:, None]
+                    mixed = tail[len(tail) - n:] * (1.0 - ramp) + samples[:n] * ramp
+                    out.write(to_dtype(mixed, samples.dtype).tobytes())
+                samples = samples[n:]
+            # 保留末尾采样用于与下一片段淡化
+            keep = min(fade, len(samples))
+            out.write(samples[:len(samples) - keep].tobytes())
+            tail = np.array(samples[len(samples) - keep:])
+            del samples
+        if first is None:
+            raise ValueError("No audio to join")
+        out.write(tail.tobytes())
+        return wav_io.patch_header(out)
+
+
+def to_dtype(values: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """浮点采样转换为目标格式，整数格式先四舍五入并限幅"""
+    if dtype.kind == 'i':
+        limits = np.iinfo(dtype)
+        values = np.clip(np.rint(values), limits.min, limits.max)
+    return values.astype(dtype)
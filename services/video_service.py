@@ -1,67 +1,76 @@
+import asyncio
+import hashlib
 import logging
+import math
 import uuid
 import os
-import tempfile
+import time
 import threading
 import concurrent.futures
-import subprocess
 import shutil
+import tempfile
 from pathlib import Path
+import aiohttp
 import requests
-from config import VIDEO_URL, UPLOAD_DIR, OUTPUT_DIR
+from typing import List, Union
+from config import (
+    VIDEO_URLS, UPLOAD_DIR, OUTPUT_DIR, VIDEO_JOB_DIR, VIDEO_JOB_KEEP_DAYS,
+    FIT_CACHE_MAX_PER_MODEL, PINGPONG_CHUNK_SECONDS
+)
+from services import wav_io
+from services.job_checkpoint import JobCheckpoint
+from services.media_catalog import media_catalog
+from services.model_catalog import model_catalog
+from services.backend_pool import BackendPool
+from services.ffmpeg_runner import ffmpeg_runner
+from services.probe_cache import probe_cache
+from services.render_cache import render_cache
+from services.segment_planner import SegmentCostModel, plan_segments
+from services.http_client import HttpClient, http_client as default_http_client
+from services.async_http import AsyncHttpClient, async_http_client as default_async_http_client
+from services.status_poller import (
+    StatusPoller, is_terminal, SUCCESS_CODE, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED
+)
+from services.task_service import task_queue, Task, TaskType, TaskStatus
 
 logger = logging.getLogger(__name__)
 
 class VideoService:
-    def __init__(self, face2face_url: str = VIDEO_URL):
-        self.face2face_url = face2face_url
+    FIT_TOLERANCE = 0.5  # 模特视频比音频长不超过该值（秒）时不裁剪
+
+    def __init__(self, face2face_url: Union[str, List[str]] = VIDEO_URLS, http_client: HttpClient = None,
+                 async_http_client: AsyncHttpClient = None):
+        urls = [face2face_url] if isinstance(face2face_url, str) else list(face2face_url)
+        self.face2face_url = urls[0]
+        self.http = http_client or default_http_client  # 共享连接池
+        self.async_http = async_http_client or default_async_http_client  # 异步接口使用
+        self.backends = BackendPool(urls, self.http)  # 多节点路由
+        self.backends.start()
+        self.poller = StatusPoller(self._query_status, task_queue=task_queue,
+                                   resolve_result=self._resolve_result)  # 统一状态轮询
+        self.poller.add_track_listener(self.backends.adopt)
+        self.poller.add_listener(lambda code, status_data: self.backends.complete(code))
+        self.poller.add_listener(self._on_render_complete)
+        self.pending_renders = {}  # 任务编码 -> (渲染缓存键, 用户名)，渲染结束时移除
+        self.render_options = {"chaofen": 0, "watermark_switch": 0, "pn": 1}
         self.max_workers = min(os.cpu_count() or 4, 4)  # 最大并行工作线程数
-        self.chunk_size = 10  # 视频分段处理，每段秒数
+        self.cost_model = SegmentCostModel()  # 分段耗时模型，由实测数据修正
+        self.job_locks = {}  # 工作目录或输出路径 -> 锁，相同输入的任务串行执行
+        self.job_locks_guard = threading.Lock()
+        self.resume_interrupted_jobs()
 
-    def make_video(self, video_path: Path, audio_path: Path, username: str = None) -> str:
-        """生成视频，支持多用户隔离目录"""
+    def make_video(self, video_path: Path, audio_path: Path, username: str = None, queue_task_id: str = None) -> str:
+        """生成视频，支持多用户隔离目录
+
+        queue_task_id: 关联的任务队列任务ID，任务结束时由轮询器推送完成事件
+        """
         try:
-            # 获取相对路径（带用户名）
-            if username:
-                video_relative = f"{username}/{video_path.name}"
-                audio_relative = f"{username}/{audio_path.name}"
-            else:
-                video_relative = video_path.name
-                audio_relative = audio_path.name
-            task_id = str(uuid.uuid4())
-            
-            # 检查文件大小，大文件使用优化处理
-            video_size = video_path.stat().st_size
-            if video_size > 100 * 1024 * 1024:  # 100MB
-                logger.info(f"大文件视频处理: {video_path} ({video_size / (1024*1024):.2f} MB)")
-                # 大文件使用异步处理
-                threading.Thread(
-                    target=self._process_large_video,
-                    args=(video_path, audio_path, task_id, username),
-                    daemon=True
-                ).start()
+            task_id, data, cache_key = self._prepare_render(video_path, audio_path, username, queue_task_id)
+            if data is None:
                 return task_id
-            
-            data = {
-                "audio_url": audio_relative,
-                "video_url": video_relative,
-                "code": task_id,
-                "chaofen": 0,
-                "watermark_switch": 0,
-                "pn": 1
-            }
             logger.info(f"Sending video generation request with data: {data}")
-            response = requests.post(
-                f"{self.face2face_url}/easy/submit",
-                json=data,
-                headers={"Content-Type": "application/json"}
-            )
-            logger.info(f"Video generation response status: {response.status_code}")
-            logger.info(f"Video generation response content: {response.text}")
-            response.raise_for_status()
-            if not task_id:
-                raise ValueError("No task ID in response")
-            logger.info(f"Video generation started. Task ID: {task_id}")
+            self._submit(data)
+            self._track_render(task_id, cache_key, username, queue_task_id)
             return task_id
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP Error during video generation: {str(e)}")
@@ -71,107 +80,563 @@ class VideoService:
             logger.error(f"Error making video: {str(e)}")
             raise
 
-    def _process_large_video(self, video_path: Path, audio_path: Path, task_id: str, username: str = None):
-        """处理大型视频文件，使用分段并行处理"""
+    async def make_video_async(self, video_path: Path, audio_path: Path, username: str = None,
+                               queue_task_id: str = None) -> str:
+        """make_video 的异步版本：文件准备在线程池中执行，提交请求在共享事件循环上进行"""
+        loop = asyncio.get_running_loop()
         try:
-            logger.info(f"开始大型视频处理: {video_path}, 任务ID: {task_id}")
-            
-            # 创建临时工作目录
-            with tempfile.TemporaryDirectory() as temp_dir:
-                temp_dir_path = Path(temp_dir)
-                
-                # 1. 获取视频时长
-                duration = self._get_video_duration(video_path)
-                logger.info(f"视频时长: {duration}秒")
-                
-                # 2. 分段视频
-                segments = []
-                for i in range(0, int(duration), self.chunk_size):
-                    segment_path = temp_dir_path / f"segment_{i}.mp4"
-                    end_time = min(i + self.chunk_size, duration)
-                    self._extract_video_segment(video_path, segment_path, i, end_time)
-                    segments.append(segment_path)
-                
-                logger.info(f"视频已分割为 {len(segments)} 个片段")
-                
-                # 3. 分段音频
-                audio_segments = []
-                for i in range(0, int(duration), self.chunk_size):
-                    segment_path = temp_dir_path / f"audio_{i}.wav"
-                    end_time = min(i + self.chunk_size, duration)
-                    self._extract_audio_segment(audio_path, segment_path, i, end_time)
-                    audio_segments.append(segment_path)
-                
-                # 4. 并行处理每个片段
-                processed_segments = []
-                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    futures = []
-                    for i, (video_segment, audio_segment) in enumerate(zip(segments, audio_segments)):
-                        output_path = temp_dir_path / f"processed_{i}.mp4"
-                        futures.append(
-                            executor.submit(
-                                self._process_video_segment, 
-                                video_segment, 
-                                audio_segment, 
-                                output_path
-                            )
-                        )
-                    
-                    # 等待所有处理完成
-                    for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                        try:
-                            result_path = future.result()
-                            processed_segments.append((i, result_path))
-                            logger.info(f"片段 {i} 处理完成: {result_path}")
-                        except Exception as e:
-                            logger.error(f"片段 {i} 处理失败: {str(e)}")
-                
-                # 5. 合并处理后的片段
-                processed_segments.sort()  # 按索引排序
-                segment_files = [str(path) for _, path in processed_segments]
-                
-                # 准备合并文件列表
-                concat_file = temp_dir_path / "concat.txt"
+            task_id, data, cache_key = await loop.run_in_executor(
+                None, self._prepare_render, video_path, audio_path, username, queue_task_id
+            )
+            if data is None:
+                return task_id
+            logger.info(f"Sending video generation request with data: {data}")
+            await self._submit_async(data)
+            self._track_render(task_id, cache_key, username, queue_task_id)
+            return task_id
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"HTTP Error during video generation: {e.status} {e.message}")
+            raise
+        except Exception as e:
+            logger.error(f"Error making video: {str(e)}")
+            raise
+
+    def _prepare_render(self, video_path: Path, audio_path: Path, username: str = None, queue_task_id: str = None):
+        """准备渲染：返回 (任务ID, 提交参数, 渲染缓存键)
+
+        缓存命中或大文件本地处理时无需提交face2face，提交参数为None。
+        """
+        # 已入库的模特使用标准化代理视频
+        video_path = self._get_render_input(Path(video_path), username)
+        audio_path = Path(audio_path)
+        task_id = str(uuid.uuid4())
+
+        # 相同模特视频、音频与渲染参数的结果直接复用
+        cache_key = self._get_render_cache_key(video_path, audio_path)
+        if cache_key and self._serve_from_cache(cache_key, task_id, username, queue_task_id):
+            return task_id, None, cache_key
+
+        # 模特视频裁剪或循环到音频时长，渲染量只与文案长度相关
+        video_path = self._fit_to_audio(video_path, audio_path)
+        # 获取相对路径（带用户名）
+        video_relative = self._get_relative_path(video_path, username)
+        audio_relative = self._get_relative_path(audio_path, username)
+        
+        # 检查文件大小，大文件使用优化处理
+        video_size = video_path.stat().st_size
+        if video_size > 100 * 1024 * 1024:  # 100MB
+            logger.info(f"大文件视频处理: {video_path} ({video_size / (1024*1024):.2f} MB)")
+            # 登记到任务存储，使返回的任务ID可以查询
+            task_queue.register_external_task(Task(
+                task_id=task_id,
+                task_type=TaskType.LOCAL_VIDEO_PROCESSING,
+                params={"video_path": str(video_path), "audio_path": str(audio_path)},
+                username=username
+            ))
+            # 大文件使用异步处理
+            threading.Thread(
+                target=self._process_large_video,
+                args=(video_path, audio_path, task_id, username, cache_key, queue_task_id),
+                daemon=True
+            ).start()
+            return task_id, None, cache_key
+        
+        data = {
+            "audio_url": audio_relative,
+            "video_url": video_relative,
+            "code": task_id,
+            **self.render_options
+        }
+        return task_id, data, cache_key
+
+    def _track_render(self, task_id: str, cache_key: str, username: str = None, queue_task_id: str = None):
+        """提交成功后登记渲染缓存与所属用户，并交给轮询器跟踪"""
+        self.pending_renders[task_id] = (cache_key, username)
+        logger.info(f"Video generation started. Task ID: {task_id}")
+        self.poller.track(task_id, queue_task_id)
+
+    def _get_render_input(self, video_path: Path, username: str = None) -> Path:
+        """模特目录中有渲染代理视频时使用代理视频，否则使用原视频"""
+        proxy_path = model_catalog.get_proxy_path(username, video_path.stem)
+        if proxy_path:
+            logger.info(f"使用渲染代理视频: {proxy_path}")
+            return proxy_path
+        return video_path
+
+    def _fit_to_audio(self, video_path: Path, audio_path: Path) -> Path:
+        """生成与音频等长的模特视频：长则在开头关键帧处裁剪，短则正放倒放循环
+
+        结果按时长缓存在模特视频同级的 fitted/<毫秒>/ 目录中，文件名保持不变；
+        每个模特最多保留 FIT_CACHE_MAX_PER_MODEL 个时长。失败时返回原视频。
+        """
+        try:
+            audio_duration = probe_cache.get_duration(audio_path)
+            video_duration = probe_cache.get_duration(video_path)
+            if audio_duration <= 0 or video_duration <= 0:
+                return video_path
+            if 0 <= video_duration - audio_duration <= self.FIT_TOLERANCE:
+                return video_path
+
+            fitted_path = video_path.parent / "fitted" / str(int(audio_duration * 1000)) / video_path.name
+            # 相同模特、相同时长的并发请求只生成一次
+            with self._path_lock(fitted_path):
+                if fitted_path.exists() and fitted_path.stat().st_mtime >= video_path.stat().st_mtime:
+                    return fitted_path
+                fitted_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._tmp_path(fitted_path)
+                try:
+                    if video_duration > audio_duration:
+                        logger.info(f"裁剪模特视频到音频时长 {audio_duration:.2f}秒: {video_path}")
+                        self._trim_video(video_path, tmp_path, audio_duration)
+                    else:
+                        logger.info(f"循环模特视频到音频时长 {audio_duration:.2f}秒: {video_path}")
+                        self._loop_video(self._get_pingpong_unit(video_path), tmp_path, audio_duration)
+                    os.replace(tmp_path, fitted_path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+            self._evict_fitted(video_path)
+            return fitted_path
+        except Exception as e:
+            logger.warning(f"调整模特视频时长失败，使用原视频: {str(e)}")
+            return video_path
+
+    def _evict_fitted(self, video_path: Path):
+        """删除该模特最旧的时长结果，只保留最近生成的 FIT_CACHE_MAX_PER_MODEL 个"""
+        fitted_dir = video_path.parent / "fitted"
+        fitted = [
+            path for path in fitted_dir.glob(f"*/{video_path.name}")
+            if path.parent.name != "pingpong"
+        ]
+        fitted.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in fitted[FIT_CACHE_MAX_PER_MODEL:]:
+            with self._path_lock(path):
+                path.unlink(missing_ok=True)
+            try:
+                path.parent.rmdir()  # 目录中没有其他模特的结果时一并删除
+            except OSError:
+                pass
+            logger.info(f"已删除旧的时长适配视频: {path}")
+
+    def _get_pingpong_unit(self, video_path: Path) -> Path:
+        """正放+倒放拼接的循环单元，首尾画面衔接自然，每个模特只生成一次
+
+        reverse滤镜会缓存输入的全部帧，因此按 PINGPONG_CHUNK_SECONDS 分块倒放，
+        再按倒序与正放部分流复制拼接，内存占用与视频长度无关。
+        """
+        unit_path = video_path.parent / "fitted" / "pingpong" / video_path.name
+        with self._path_lock(unit_path):
+            if unit_path.exists() and unit_path.stat().st_mtime >= video_path.stat().st_mtime:
+                return unit_path
+            unit_path.parent.mkdir(parents=True, exist_ok=True)
+            duration = probe_cache.get_duration(video_path)
+            fps = probe_cache.probe(video_path).get("fps") or 25
+            work_dir = Path(tempfile.mkdtemp(prefix="pingpong_", dir=unit_path.parent))
+            tmp_path = self._tmp_path(unit_path)
+            try:
+                forward = work_dir / "forward.mp4"
+                self._encode_unit_part(video_path, forward, fps)
+                parts = [forward]
+                chunks = max(1, math.ceil(duration / PINGPONG_CHUNK_SECONDS))
+                for i in reversed(range(chunks)):
+                    part = work_dir / f"reverse_{i}.mp4"
+                    self._encode_unit_part(video_path, part, fps, start=i * PINGPONG_CHUNK_SECONDS,
+                                           length=PINGPONG_CHUNK_SECONDS, reverse=True)
+                    parts.append(part)
+                concat_file = work_dir / "concat.txt"
                 with open(concat_file, "w") as f:
-                    for segment in segment_files:
-                        f.write(f"file '{segment}'\n")
-                
-                # 合并输出文件路径
-                output_filename = f"{video_path.stem}-r.mp4"
-                if username:
-                    output_path = UPLOAD_DIR / username / output_filename
-                else:
-                    output_path = OUTPUT_DIR / output_filename
-                
-                # 确保输出目录存在
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                # 执行合并
-                self._merge_video_segments(concat_file, output_path)
-                
-                logger.info(f"大型视频处理完成: {output_path}")
-                
-                # 更新任务状态（模拟API响应）
-                self._update_task_status(task_id, str(output_path))
-                
+                    for part in parts:
+                        f.write(f"file '{part}'\n")
+                ffmpeg_runner.run([
+                    "ffmpeg",
+                    "-f", "concat",
+                    "-safe", "0",
+                    "-i", str(concat_file),
+                    "-c", "copy",
+                    "-movflags", "+faststart",
+                    "-y",
+                    str(tmp_path)
+                ], category="transcode")
+                os.replace(tmp_path, unit_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+                shutil.rmtree(work_dir, ignore_errors=True)
+        return unit_path
+
+    def _encode_unit_part(self, video_path: Path, output_path: Path, fps: float, start: float = None,
+                          length: float = None, reverse: bool = False):
+        """按统一参数编码循环单元的一部分（可截取区间并倒放），保证各部分可流复制拼接"""
+        gop = str(max(1, round(fps)))
+        cmd = ["ffmpeg"]
+        if start is not None:
+            cmd += ["-ss", f"{start:.3f}", "-t", f"{length:.3f}"]
+        cmd += ["-i", str(video_path), "-an"]
+        if reverse:
+            cmd += ["-vf", "reverse"]
+        cmd += [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", "18",
+            "-pix_fmt", "yuv420p",
+            "-g", gop,
+            "-keyint_min", gop,
+            "-sc_threshold", "0",
+            "-y",
+            str(output_path)
+        ]
+        ffmpeg_runner.run(cmd, category="transcode")
+
+    def _path_lock(self, path: Path) -> threading.Lock:
+        """按输出路径获取锁，避免并发写入同一文件"""
+        with self.job_locks_guard:
+            return self.job_locks.setdefault(str(path), threading.Lock())
+
+    @staticmethod
+    def _tmp_path(path: Path) -> Path:
+        """同目录下唯一的临时文件名，写完后 os.replace 到目标路径"""
+        return path.with_name(f"{path.stem}.{uuid.uuid4().hex[:8]}.tmp{path.suffix}")
+
+    def _trim_video(self, video_path: Path, output_path: Path, duration: float):
+        """从开头（关键帧）流复制截取指定时长，不含音频"""
+        cmd = [
+            "ffmpeg",
+            "-i", str(video_path),
+            "-t", f"{duration:.3f}",
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y",
+            str(output_path)
+        ]
+        ffmpeg_runner.run(cmd, category="segment")
+
+    def _loop_video(self, unit_path: Path, output_path: Path, duration: float):
+        """循环流复制循环单元直到指定时长（循环边界为关键帧）"""
+        cmd = [
+            "ffmpeg",
+            "-stream_loop", "-1",
+            "-i", str(unit_path),
+            "-t", f"{duration:.3f}",
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y",
+            str(output_path)
+        ]
+        ffmpeg_runner.run(cmd, category="segment")
+
+    def _get_relative_path(self, path: Path, username: str = None) -> str:
+        """face2face服务使用相对于上传目录的路径"""
+        try:
+            return path.relative_to(UPLOAD_DIR).as_posix()
+        except ValueError:
+            return f"{username}/{path.name}" if username else path.name
+
+    def _get_render_cache_key(self, video_path: Path, audio_path: Path) -> str:
+        """计算渲染缓存键，失败时返回None（不影响正常生成）"""
+        try:
+            return render_cache.make_key(video_path, audio_path, self.render_options)
+        except Exception as e:
+            logger.warning(f"计算渲染缓存键失败: {str(e)}")
+            return None
+
+    def _get_result_path(self, filename: str, username: str = None) -> Path:
+        """生成结果的保存路径"""
+        if username:
+            return UPLOAD_DIR / username / filename
+        return OUTPUT_DIR / filename
+
+    def _serve_from_cache(self, cache_key: str, task_id: str, username: str = None, queue_task_id: str = None) -> bool:
+        """渲染缓存命中时直接链接结果，并登记为已完成的本地任务"""
+        output_path = self._get_result_path(f"{task_id}-r.mp4", username)
+        if not render_cache.fetch(cache_key, output_path):
+            return False
+        media_catalog.invalidate(output_path)
+        task = Task(
+            task_id=task_id,
+            task_type=TaskType.LOCAL_VIDEO_PROCESSING,
+            params={},
+            username=username
+        )
+        task.details = {"cache_hit": True}
+        task_queue.register_external_task(task)
+        result = {"code": task_id, "video_path": str(output_path)}
+        task_queue.update_task_progress(task_id, 100.0, result=result)
+        if queue_task_id:
+            task_queue.update_task_progress(queue_task_id, 100.0, result=result)
+        return True
+
+    def _on_render_complete(self, code: str, status_data: dict):
+        """face2face任务结束：成功的结果写入渲染缓存"""
+        pending = self.pending_renders.pop(code, None)
+        data = status_data.get('data') or {}
+        if not pending or not pending[0] or data.get('status') != STATUS_DONE or not data.get('result'):
+            return
+        cache_key, username = pending
+        result_path = Path(data['result'])
+        if username:
+            result_path = self._get_result_path(result_path.name, username)
+            media_catalog.invalidate(result_path)
+        render_cache.store(cache_key, result_path)
+
+    def _resolve_result(self, code: str, status_data: dict):
+        """face2face返回的结果路径映射为用户目录中的路径，供轮询器写入队列任务结果"""
+        result = (status_data.get('data') or {}).get('result')
+        pending = self.pending_renders.get(code)
+        if result and pending and pending[1]:
+            return str(self._get_result_path(Path(result).name, pending[1]))
+        return result
+
+    def _submit(self, data: dict):
+        """将任务提交到在途任务最少的可用节点，并记录任务所属节点"""
+        backend = self.backends.acquire()
+        try:
+            response = self.http.post(
+                f"{backend.url}/easy/submit",
+                json=data,
+                headers={"Content-Type": "application/json"}
+            )
+            logger.info(f"Video generation response status: {response.status_code} ({backend.url})")
+            logger.info(f"Video generation response content: {response.text}")
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            self.backends.release(backend)
+            # 4xx为请求本身的问题，不计入节点故障
+            if e.response is None or e.response.status_code >= 500:
+                self.backends.record_failure(backend)
+            raise
+        except Exception:
+            self.backends.release(backend)
+            self.backends.record_failure(backend)
+            raise
+        self.backends.record_success(backend)
+        self.backends.assign(data["code"], backend)
+
+    async def _submit_async(self, data: dict):
+        """_submit 的异步版本，路由记录的写盘在线程池中执行"""
+        loop = asyncio.get_running_loop()
+        backend = self.backends.acquire()
+        try:
+            result = await self.async_http.post_json(
+                f"{backend.url}/easy/submit",
+                json=data,
+                headers={"Content-Type": "application/json"}
+            )
+            logger.info(f"Video generation response content: {result} ({backend.url})")
+        except aiohttp.ClientResponseError as e:
+            self.backends.release(backend)
+            # 4xx为请求本身的问题，不计入节点故障
+            if e.status >= 500:
+                self.backends.record_failure(backend)
+            raise
+        except Exception:
+            self.backends.release(backend)
+            self.backends.record_failure(backend)
+            raise
+        self.backends.record_success(backend)
+        await loop.run_in_executor(None, self.backends.assign, data["code"], backend)
+
+    def _process_large_video(self, video_path: Path, audio_path: Path, task_id: str, username: str = None,
+                             cache_key: str = None, queue_task_id: str = None):
+        """处理大型视频文件，使用分段并行处理
+
+        工作目录按输入内容持久化，已完成的片段记录在清单中，
+        重启或重试后只处理缺失的片段。结束时同时结束关联的任务队列任务。
+        """
+        try:
+            logger.info(f"开始大型视频处理: {video_path}, 任务ID: {task_id}")
+            JobCheckpoint.prune(VIDEO_JOB_DIR, VIDEO_JOB_KEEP_DAYS)
+            job_key = self._get_job_key(video_path, audio_path, cache_key)
+            with self.job_locks_guard:
+                job_lock = self.job_locks.setdefault(job_key, threading.Lock())
+            # 相同输入的任务共用工作目录，串行执行
+            with job_lock:
+                checkpoint = JobCheckpoint(VIDEO_JOB_DIR / job_key)
+                # 记录任务参数，进程重启后由 resume_interrupted_jobs 续跑
+                checkpoint.set_job({
+                    "video_path": str(video_path),
+                    "audio_path": str(audio_path),
+                    "task_id": task_id,
+                    "queue_task_id": queue_task_id,
+                    "username": username,
+                    "cache_key": cache_key
+                })
+                try:
+                    self._run_segmented_job(checkpoint, video_path, audio_path, task_id, username, cache_key, queue_task_id)
+                except Exception:
+                    # 失败或取消的任务不自动续跑，工作目录保留供重新提交时复用
+                    checkpoint.set_job(None)
+                    raise
         except Exception as e:
             logger.error(f"大型视频处理失败: {str(e)}")
             # 更新任务状态为失败
-            self._update_task_status(task_id, None, error=str(e))
+            self._update_task_status(task_id, None, error=str(e), queue_task_id=queue_task_id)
+        finally:
+            ffmpeg_runner.release_job(task_id)
+
+    def _run_segmented_job(self, checkpoint: JobCheckpoint, video_path: Path, audio_path: Path, task_id: str,
+                           username: str, cache_key: str, queue_task_id: str = None):
+        """在持久化工作目录中执行分段处理"""
+        work_dir = checkpoint.work_dir
+        
+        # 1. 获取视频时长并规划分段（续跑时沿用清单中的方案）
+        plan = checkpoint.plan
+        if not plan:
+            duration = self._get_video_duration(video_path)
+            logger.info(f"视频时长: {duration}秒")
+            plan = self._plan_segments(video_path, duration)
+            checkpoint.set_plan(plan)
+            plan = checkpoint.plan
+        boundaries = plan["boundaries"]
+        total = len(boundaries)
+        pending = [i for i in range(total) if not checkpoint.is_done(i)]
+        task_queue.update_task_details(task_id, plan=plan)
+        logger.info(
+            f"分段方案: {plan['segment_count']} 段 x {plan['segment_length']}秒, "
+            f"并行数 {plan['workers']}, 预计耗时 {plan['estimated_seconds']}秒, "
+            f"已完成 {total - len(pending)} 段"
+        )
+        
+        # 2. 分段视频与音频（仅未完成的片段）
+        for i in pending:
+            start_time, end_time = boundaries[i]
+            self._extract_video_segment(video_path, work_dir / f"segment_{i}.mp4", start_time, end_time, task_id)
+            self._extract_audio_segment(audio_path, work_dir / f"audio_{i}.wav", start_time, end_time, task_id)
+        
+        logger.info(f"视频已分割，待处理 {len(pending)} 个片段")
+        
+        # 3. 并行处理每个片段
+        done_count = total - len(pending)
+        failed_segments = []
+        task_queue.update_task_details(
+            task_id, done_count / total * 95.0 if total else 0.0,
+            segments_total=total, segments_done=done_count, segments_failed=[]
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, plan["workers"])) as executor:
+            futures = {}
+            for i in pending:
+                start_time, end_time = boundaries[i]
+                future = executor.submit(
+                    self._process_timed_segment, 
+                    work_dir / f"segment_{i}.mp4", 
+                    work_dir / f"audio_{i}.wav", 
+                    work_dir / f"processed_{i}.mp4",
+                    end_time - start_time,
+                    task_id
+                )
+                futures[future] = i
+            
+            # 等待所有处理完成，完成一段即写入清单
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    result_path = future.result()
+                    checkpoint.mark_done(i, result_path)
+                    done_count += 1
+                    # 中间文件不再需要
+                    (work_dir / f"segment_{i}.mp4").unlink(missing_ok=True)
+                    (work_dir / f"audio_{i}.wav").unlink(missing_ok=True)
+                    logger.info(f"片段 {i} 处理完成: {result_path}")
+                except Exception as e:
+                    failed_segments.append(i)
+                    logger.error(f"片段 {i} 处理失败: {str(e)}")
+                # 合并阶段预留最后5%的进度
+                task_queue.update_task_details(
+                    task_id, done_count / total * 95.0,
+                    segments_done=done_count,
+                    segments_failed=sorted(failed_segments)
+                )
+        
+        if failed_segments:
+            # 保留工作目录，重试时只重做失败的片段
+            raise RuntimeError(f"{len(failed_segments)} 个片段处理失败: {sorted(failed_segments)}")
+        
+        # 4. 按顺序合并处理后的片段
+        concat_file = work_dir / "concat.txt"
+        with open(concat_file, "w") as f:
+            for i in range(total):
+                f.write(f"file '{checkpoint.segment_path(i)}'\n")
+        
+        # 合并输出文件路径
+        output_path = self._get_result_path(f"{video_path.stem}-r.mp4", username)
+        
+        # 确保输出目录存在
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 执行合并
+        self._merge_video_segments(concat_file, output_path, task_id)
+        media_catalog.invalidate(output_path)
+        
+        logger.info(f"大型视频处理完成: {output_path}")
+        if cache_key:
+            render_cache.store(cache_key, output_path)
+        checkpoint.remove()
+        
+        # 更新任务状态
+        self._update_task_status(task_id, str(output_path), queue_task_id=queue_task_id)
+
+    def resume_interrupted_jobs(self):
+        """续跑上次进程退出时未完成的大文件分段任务
+
+        任务存储在重启时把它们标记为中断失败，这里恢复本地任务及关联的队列任务，
+        在原工作目录中继续处理，校验通过的片段直接跳过。输入文件已不存在的任务放弃续跑。
+        """
+        for checkpoint in JobCheckpoint.interrupted(VIDEO_JOB_DIR):
+            job = checkpoint.job
+            video_path, audio_path = Path(job["video_path"]), Path(job["audio_path"])
+            if not (video_path.exists() and audio_path.exists()):
+                logger.warning(f"中断任务的输入文件已不存在，放弃续跑: {job['task_id']}")
+                checkpoint.set_job(None)
+                continue
+            task_id = job["task_id"]
+            if not task_queue.resume_interrupted_task(task_id):
+                task_queue.register_external_task(Task(
+                    task_id=task_id,
+                    task_type=TaskType.LOCAL_VIDEO_PROCESSING,
+                    params={"video_path": str(video_path), "audio_path": str(audio_path)},
+                    username=job.get("username")
+                ))
+            if job.get("queue_task_id"):
+                task_queue.resume_interrupted_task(job["queue_task_id"])
+            logger.info(f"续跑中断的分段任务 {task_id}，已完成 {checkpoint.completed_count()} 段")
+            threading.Thread(
+                target=self._process_large_video,
+                args=(video_path, audio_path, task_id, job.get("username"), job.get("cache_key"),
+                      job.get("queue_task_id")),
+                daemon=True
+            ).start()
+
+    def _get_job_key(self, video_path: Path, audio_path: Path, cache_key: str = None) -> str:
+        """工作目录名：优先使用内容哈希（渲染缓存键），否则使用路径、大小与修改时间"""
+        if cache_key:
+            return cache_key
+        parts = []
+        for path in (video_path, audio_path):
+            stat = path.stat()
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+    def _plan_segments(self, video_path: Path, duration: float) -> dict:
+        """根据时长、关键帧间隔、并行数与实测开销规划分段"""
+        try:
+            keyframe_interval = probe_cache.get_keyframe_interval(video_path)
+        except Exception as e:
+            logger.warning(f"获取关键帧间隔失败: {str(e)}")
+            keyframe_interval = 0.0
+        overhead, cost_per_second = self.cost_model.estimate()
+        return plan_segments(duration, self.max_workers, keyframe_interval, overhead, cost_per_second)
+
+    def _process_timed_segment(self, video_segment: Path, audio_segment: Path, output_path: Path, length: float, job_id: str = None) -> Path:
+        """处理片段并记录耗时，用于修正分段耗时模型"""
+        started = time.monotonic()
+        result = self._process_video_segment(video_segment, audio_segment, output_path, job_id)
+        self.cost_model.record(length, time.monotonic() - started)
+        return result
 
     def _get_video_duration(self, video_path: Path) -> float:
-        """获取视频时长（秒）"""
-        cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-show_entries", "format=duration", 
-            "-of", "default=noprint_wrappers=1:nokey=1", 
-            str(video_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return float(result.stdout.strip())
+        """获取视频时长（秒），结果由探测缓存复用"""
+        return probe_cache.get_duration(video_path)
 
-    def _extract_video_segment(self, video_path: Path, output_path: Path, start_time: int, end_time: int):
+    def _extract_video_segment(self, video_path: Path, output_path: Path, start_time: float, end_time: float, job_id: str = None):
         """提取视频片段"""
         cmd = [
             "ffmpeg",
@@ -183,10 +648,16 @@ class VideoService:
             "-y",  # 覆盖输出文件
             str(output_path)
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        ffmpeg_runner.run(cmd, category="segment", job_id=job_id)
 
-    def _extract_audio_segment(self, audio_path: Path, output_path: Path, start_time: int, end_time: int):
-        """提取音频片段"""
+    def _extract_audio_segment(self, audio_path: Path, output_path: Path, start_time: float, end_time: float, job_id: str = None):
+        """提取音频片段：PCM WAV直接按采样偏移切片，其他格式使用ffmpeg"""
+        if audio_path.suffix.lower() == '.wav':
+            try:
+                wav_io.slice_wav(audio_path, output_path, start_time, end_time)
+                return
+            except ValueError as e:
+                logger.warning(f"无法直接切片WAV，改用ffmpeg: {str(e)}")
         cmd = [
             "ffmpeg",
             "-i", str(audio_path),
@@ -196,9 +667,9 @@ class VideoService:
             "-y",  # 覆盖输出文件
             str(output_path)
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        ffmpeg_runner.run(cmd, category="segment", job_id=job_id)
 
-    def _process_video_segment(self, video_segment: Path, audio_segment: Path, output_path: Path) -> Path:
+    def _process_video_segment(self, video_segment: Path, audio_segment: Path, output_path: Path, job_id: str = None) -> Path:
         """处理单个视频片段"""
         # 这里调用实际的处理逻辑，可以是API调用或本地处理
         # 简化示例：合并视频和音频
@@ -215,11 +686,15 @@ class VideoService:
             "-y",
             str(output_path)
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        ffmpeg_runner.run(cmd, category="segment", job_id=job_id)
         return output_path
 
-    def _merge_video_segments(self, concat_file: Path, output_path: Path):
-        """合并视频片段"""
+    def _merge_video_segments(self, concat_file: Path, output_path: Path, job_id: str = None):
+        """合并视频片段
+
+        先写临时文件再替换目录项：结果可能是渲染缓存条目的硬链接，原地覆盖会改写缓存内容。
+        """
+        tmp_path = output_path.with_name(f"{output_path.stem}.tmp{output_path.suffix}")
         cmd = [
             "ffmpeg",
             "-f", "concat",
@@ -227,38 +702,113 @@ class VideoService:
             "-i", str(concat_file),
             "-c", "copy",
             "-y",
-            str(output_path)
+            str(tmp_path)
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        try:
+            ffmpeg_runner.run(cmd, category="segment", job_id=job_id)
+            os.replace(tmp_path, output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
 
-    def _update_task_status(self, task_id: str, result_path: str = None, error: str = None):
-        """更新任务状态（模拟API响应）"""
-        # 实际实现中，这里应该更新数据库或缓存中的任务状态
+    def _update_task_status(self, task_id: str, result_path: str = None, error: str = None,
+                            queue_task_id: str = None):
+        """更新本地处理任务（及关联的任务队列任务）的最终状态到任务存储"""
         logger.info(f"更新任务状态: {task_id}, 结果: {result_path}, 错误: {error}")
-        # 这里只是记录日志，实际应用中应该实现持久化存储
+        if error:
+            task_queue.update_task_progress(task_id, 0.0, error=error)
+            if queue_task_id:
+                task_queue.update_task_progress(queue_task_id, 0.0, error=error)
+        else:
+            task_queue.update_task_progress(task_id, 100.0, result={"video_path": result_path})
+            if queue_task_id:
+                task_queue.update_task_progress(queue_task_id, 100.0, result={"code": task_id, "video_path": result_path})
+
+    def _local_status(self, task: Task) -> dict:
+        """将本地任务转换为与face2face查询接口一致的响应格式"""
+        if task.status == TaskStatus.COMPLETED:
+            status = STATUS_DONE
+        elif task.status in (TaskStatus.FAILED, TaskStatus.CANCELLED):
+            status = STATUS_FAILED
+        else:
+            status = STATUS_PROCESSING
+        return {
+            "code": SUCCESS_CODE,
+            "data": {
+                "status": status,
+                "progress": task.progress,
+                "result": (task.result or {}).get("video_path"),
+                "msg": task.error,
+                "details": task.details,
+                "local": True
+            }
+        }
 
     def check_status(self, task_id: str) -> dict:
-        """检查视频生成状态"""
+        """检查视频生成状态
+
+        本地处理的任务直接从任务存储读取，face2face任务读取轮询器的状态缓存。
+        """
         if not task_id:
             raise ValueError("Task ID is required")
+        # 本地任务登记后即为执行中，只需查找执行中与已结束的任务
+        task = task_queue.find_task(task_id)
+        if task and task.task_type == TaskType.LOCAL_VIDEO_PROCESSING:
+            return self._local_status(task)
+        return self.poller.get_status(task_id)
 
+    async def check_status_async(self, task_id: str) -> dict:
+        """check_status 的异步版本：缓存未命中时在共享事件循环上查询节点，结果交给轮询器"""
+        if not task_id:
+            raise ValueError("Task ID is required")
+        task = task_queue.find_task(task_id)
+        if task and task.task_type == TaskType.LOCAL_VIDEO_PROCESSING:
+            return self._local_status(task)
+        status_data = self.poller.get_cached(task_id)
+        if status_data is None:
+            status_data = await self._query_status_async(task_id)
+            self.poller.update(task_id, status_data)
+        return status_data
+
+    def wait_for_result(self, task_id: str, timeout: float = None, interval: float = 2.0):
+        """阻塞等待视频生成结束，返回最终状态；超时返回None
+
+        face2face任务等待轮询器的完成事件，本地分段处理的任务按间隔读取任务存储。
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            status_data = self.check_status(task_id)
+            if is_terminal(status_data):
+                return status_data
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return None
+            if not (status_data.get('data') or {}).get('local'):
+                return self.poller.wait(task_id, remaining)
+            time.sleep(interval if remaining is None else min(interval, remaining))
+
+    def _query_status(self, task_id: str) -> dict:
+        """向任务所属的face2face节点查询任务状态"""
+        backend = self.backends.owner(task_id)
         try:
             # 发送状态查询请求
-            response = requests.get(
-                f"{self.face2face_url}/easy/query",
+            response = self.http.get(
+                f"{backend.url}/easy/query",
                 params={"code": task_id},
                 headers={"Content-Type": "application/json"}
             )
             
             # 记录响应内容以便调试
-            logger.info(f"Status check response status: {response.status_code}")
-            logger.info(f"Status check response content: {response.text}")
+            logger.debug(f"Status check response status: {response.status_code}")
+            logger.debug(f"Status check response content: {response.text}")
             
             response.raise_for_status()
             
             status_data = response.json()
             logger.info(f"Status checked for task {task_id}: {status_data}")
             return status_data
+        except requests.exceptions.ConnectionError:
+            self.backends.record_failure(backend)
+            raise
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP Error during status check: {str(e)}")
             logger.error(f"Response content: {e.response.text if hasattr(e, 'response') else 'No response content'}")
@@ -267,6 +817,24 @@ class VideoService:
             logger.error(f"Error checking status: {str(e)}")
             raise
 
+    async def _query_status_async(self, task_id: str) -> dict:
+        """_query_status 的异步版本"""
+        backend = self.backends.owner(task_id)
+        try:
+            status_data = await self.async_http.get_json(
+                f"{backend.url}/easy/query",
+                params={"code": task_id},
+                headers={"Content-Type": "application/json"}
+            )
+            logger.info(f"Status checked for task {task_id}: {status_data}")
+            return status_data
+        except aiohttp.ClientConnectionError:
+            self.backends.record_failure(backend)
+            raise
+        except Exception as e:
+            logger.error(f"Error checking status: {str(e)}")
+            raise
+
     def get_video_path(self, task_id: str, username: str = None) -> Path:
         """获取生成的视频文件路径，支持多用户隔离目录"""
         status_data = self.check_status(task_id)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path, PurePath
+from typing import Any, Dict, Iterable, Optional
+
+from config import VOICE_MODEL_CACHE_FILE
+from services.pcm_pipe import iter_pcm
+
+logger = logging.getLogger(__name__)
+
+# 计算哈希前统一解码为的PCM格式
+PCM_SAMPLE_RATE = 16000
+PCM_CHANNELS = 1
+
+
+def pcm_digest(audio_path: Path) -> str:
+    """解码为统一格式的PCM后计算SHA-256，不同容器/编码中的相同音频得到相同结果"""
+    sha256 = hashlib.sha256()
+    for block in iter_pcm(audio_path, PCM_SAMPLE_RATE, PCM_CHANNELS):
+        sha256.update(block)
+    return sha256.hexdigest()
+
+
+class VoiceModelCache:
+    """声音模型缓存：解码后PCM哈希 -> 训练结果（asr_format_audio_url、reference_audio_text）
+
+    参考音频内容不变时直接返回已有训练结果，跳过TTS服务的预处理与ASR。
+    """
+
+    REQUIRED_FIELDS = ("asr_format_audio_url", "reference_audio_text")
+
+    def __init__(self, cache_path: Path = VOICE_MODEL_CACHE_FILE):
+        self.cache_path = cache_path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """获取训练结果"""
+        with self.lock:
+            entry = self.entries.get(digest)
+            return dict(entry["result"]) if entry else None
+
+    def put(self, digest: str, result: Dict[str, Any]):
+        """保存训练结果，缺少必要字段时不缓存"""
+        if not all(result.get(field) for field in self.REQUIRED_FIELDS):
+            return
+        with self.lock:
+            self.entries[digest] = {"result": dict(result), "created_at": datetime.now().isoformat()}
+            self._save()
+
+    def invalidate(self, digest: str):
+        """删除训练结果（如TTS服务端文件已失效）"""
+        with self.lock:
+            if self.entries.pop(digest, None) is not None:
+                self._save()
+
+    def invalidate_references(self, deleted_names: Iterable[str]) -> int:
+        """参考音频文件被删除后（如定期清理）移除指向这些文件的训练结果，返回移除的条目数"""
+        deleted_names = set(deleted_names)
+        if not deleted_names:
+            return 0
+        with self.lock:
+            stale = [
+                digest for digest, entry in self.entries.items()
+                if PurePath(str(entry["result"]["asr_format_audio_url"]).replace('\\', '/')).name in deleted_names
+            ]
+            for digest in stale:
+                del self.entries[digest]
+            if stale:
+                self._save()
+        if stale:
+            logger.info(f"参考音频已删除，移除 {len(stale)} 条声音模型缓存")
+        return len(stale)
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            logger.error(f"加载声音模型缓存失败: {str(e)}")
+
+    def _save(self):
+        """保存缓存（调用方持有锁）"""
+        try:
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"保存声音模型缓存失败: {str(e)}")
+
+
+# 创建全局声音模型缓存实例
+voice_model_cache = VoiceModelCache()
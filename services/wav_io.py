@@ -0,0 +1,139 @@
+import mmap
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+# WAVE 格式标签
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo:
+    """WAV文件头信息"""
+
+    def __init__(self, format_tag: int, channels: int, sample_rate: int, bits_per_sample: int,
+                 data_offset: int, data_size: int, fmt_chunk: bytes):
+        self.format_tag = format_tag
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits_per_sample
+        self.data_offset = data_offset  # 采样数据在文件中的起始偏移
+        self.data_size = data_size  # 采样数据字节数
+        self.fmt_chunk = fmt_chunk  # 原始fmt块内容，写出时原样保留
+
+    @property
+    def block_align(self) -> int:
+        """每帧（所有声道一个采样）的字节数"""
+        return self.channels * self.bits_per_sample // 8
+
+    @property
+    def frame_count(self) -> int:
+        return self.data_size // self.block_align if self.block_align else 0
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count / self.sample_rate if self.sample_rate else 0.0
+
+
+def parse_header(buf) -> WavInfo:
+    """解析RIFF/WAVE头，支持PCM、IEEE float与WAVE_FORMAT_EXTENSIBLE
+
+    流式写出的WAV的data块大小可能为0或0xFFFFFFFF，此时按文件剩余长度计算。
+    """
+    if len(buf) < 12 or bytes(buf[0:4]) != b"RIFF" or bytes(buf[8:12]) != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(buf):
+        chunk_id = bytes(buf[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", buf, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt = bytes(buf[body:body + chunk_size])
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk precedes fmt chunk")
+            remaining = len(buf) - body
+            if chunk_size == 0 or chunk_size == 0xFFFFFFFF or chunk_size > remaining:
+                chunk_size = remaining
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", fmt, 0)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                # 子格式GUID的前两个字节即实际格式
+                format_tag = struct.unpack_from("<H", fmt, 24)[0]
+            if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+                raise ValueError(f"Unsupported WAV format tag: {format_tag:#x}")
+            info = WavInfo(format_tag, channels, sample_rate, bits, body, chunk_size, fmt)
+            # 去掉末尾不完整的帧
+            info.data_size -= info.data_size % info.block_align
+            return info
+        offset = body + chunk_size + (chunk_size & 1)  # 块按偶数字节对齐
+    raise ValueError("WAV data chunk not found")
+
+
+def read_info(path: Path) -> WavInfo:
+    """读取WAV文件头"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return parse_header(mm)
+
+
+def build_header(fmt_chunk: bytes, data_size: int) -> bytes:
+    """根据fmt块和数据长度构造WAV文件头"""
+    fmt_size = len(fmt_chunk)
+    pad = fmt_size & 1
+    riff_size = 4 + (8 + fmt_size + pad) + (8 + data_size)
+    return b"".join([
+        b"RIFF", struct.pack("<I", min(riff_size, 0xFFFFFFFF)), b"WAVE",
+        b"fmt ", struct.pack("<I", fmt_size), fmt_chunk, b"\x00" * pad,
+        b"data", struct.pack("<I", min(data_size, 0xFFFFFFFF)),
+    ])
+
+
+def pcm_fmt_chunk(sample_rate: int, channels: int, bits_per_sample: int = 16,
+                  format_tag: int = WAVE_FORMAT_PCM) -> bytes:
+    """构造标准PCM fmt块"""
+    block_align = channels * bits_per_sample // 8
+    return struct.pack("<HHIIHH", format_tag, channels, sample_rate,
+                       sample_rate * block_align, block_align, bits_per_sample)
+
+
+def write_wav(path: Path, fmt_chunk: bytes, data) -> None:
+    """写出WAV文件，data为任意支持缓冲协议的对象（bytes/memoryview/numpy数组）"""
+    view = memoryview(data).cast("B")
+    with open(path, 'wb') as f:
+        f.write(build_header(fmt_chunk, len(view)))
+        f.write(view)
+
+
+def patch_header(f: BinaryIO) -> WavInfo:
+    """流式写入结束后按实际文件长度修正RIFF与data块的长度字段"""
+    f.flush()
+    f.seek(0, 2)
+    file_size = f.tell()
+    f.seek(0)
+    info = parse_header(f.read(min(file_size, 65536)))
+    data_size = file_size - info.data_offset
+    f.seek(4)
+    f.write(struct.pack("<I", min(file_size - 8, 0xFFFFFFFF)))
+    f.seek(info.data_offset - 4)
+    f.write(struct.pack("<I", min(data_size, 0xFFFFFFFF)))
+    f.seek(0, 2)
+    info.data_size = data_size - data_size % info.block_align
+    return info
+
+
+def slice_wav(src_path: Path, dst_path: Path, start_time: float, end_time: float) -> WavInfo:
+    """按时间截取WAV片段：内存映射源文件，按帧偏移直接复制采样数据，不启动子进程"""
+    with open(src_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        info = parse_header(mm)
+        start_frame = max(0, min(info.frame_count, int(round(start_time * info.sample_rate))))
+        end_frame = max(start_frame, min(info.frame_count, int(round(end_time * info.sample_rate))))
+        begin = info.data_offset + start_frame * info.block_align
+        end = info.data_offset + end_frame * info.block_align
+        with memoryview(mm) as view:
+            segment = view[begin:end]
+            try:
+                write_wav(dst_path, info.fmt_chunk, segment)
+            finally:
+                segment.release()
+        return info
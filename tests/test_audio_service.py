@@ -0,0 +1,24 @@
+import threading
+
+from services import audio_service as audio_service_module
+from services.audio_service import AudioService
+
+
+def test_concurrent_audio_paths_are_unique(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_service_module, "UPLOAD_DIR", tmp_path)
+    service = AudioService.__new__(AudioService)
+    barrier = threading.Barrier(8)
+    paths = []
+
+    def new_path():
+        barrier.wait()
+        paths.append(service._new_audio_path("alice"))
+
+    threads = [threading.Thread(target=new_path) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(paths)) == 8
+    assert all(path.parent == tmp_path / "alice" for path in paths)
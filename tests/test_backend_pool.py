@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from services import backend_pool as backend_pool_module
+from services.backend_pool import BackendPool, CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend_pool_module, "BACKEND_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(backend_pool_module, "BACKEND_RESET_TIMEOUT", 0)
+    return BackendPool(["http://node-a"], http_client=None, owners_path=tmp_path / "owners.json")
+
+
+def _open_circuit(pool):
+    backend = pool.backends[0]
+    pool.record_failure(backend)
+    assert backend.circuit == CIRCUIT_CLOSED
+    pool.record_failure(backend)
+    assert backend.circuit == CIRCUIT_OPEN
+    return backend
+
+
+def test_open_circuit_rejects_until_reset(pool, monkeypatch):
+    monkeypatch.setattr(backend_pool_module, "BACKEND_RESET_TIMEOUT", 3600)
+    _open_circuit(pool)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_half_open_allows_single_trial_and_closes_on_success(pool):
+    backend = _open_circuit(pool)
+    assert pool.acquire() is backend
+    assert backend.circuit == CIRCUIT_HALF_OPEN
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    pool.record_success(backend)
+    assert backend.circuit == CIRCUIT_CLOSED
+    assert pool.acquire() is backend
+
+
+def test_half_open_failure_reopens(pool):
+    backend = _open_circuit(pool)
+    pool.acquire()
+    pool.release(backend)
+    pool.record_failure(backend)
+    assert backend.circuit == CIRCUIT_OPEN
+
+
+def test_inconclusive_trial_does_not_lock_out_backend(pool):
+    backend = _open_circuit(pool)
+    pool.acquire()
+    # 试探请求返回4xx：只释放名额，不记录成功或失败
+    pool.release(backend)
+    assert pool.acquire() is backend
+
+
+def test_restored_owners_count_only_when_adopted(tmp_path):
+    owners_path = tmp_path / "owners.json"
+    owners_path.write_text(json.dumps({"old-1": "http://node-a", "old-2": "http://node-a"}))
+    pool = BackendPool(["http://node-a"], http_client=None, owners_path=owners_path)
+    backend = pool.backends[0]
+    assert backend.inflight == 0
+
+    pool.adopt("old-1")
+    pool.adopt("old-1")
+    assert backend.inflight == 1
+    pool.complete("old-2")  # 未重新跟踪的任务结束不影响在途数
+    assert backend.inflight == 1
+    pool.complete("old-1")
+    assert backend.inflight == 0
+    assert pool.owners == {}
+
+
+def test_submitted_task_released_on_complete(pool):
+    backend = pool.acquire()
+    pool.assign("code", backend)
+    pool.adopt("code")
+    assert backend.inflight == 1
+    pool.complete("code")
+    assert backend.inflight == 0
@@ -0,0 +1,78 @@
+import os
+
+from services.blob_store import BlobStore
+
+
+def _store(tmp_path):
+    return BlobStore(tmp_path / "blobs", tmp_path / "blobs" / "index.json")
+
+
+def _upload(tmp_path, name, data=b"video"):
+    path = tmp_path / "users" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_duplicate_upload_links_to_existing_blob(tmp_path):
+    store = _store(tmp_path)
+    first = _upload(tmp_path, "a.mp4")
+    second = _upload(tmp_path, "b.mp4")
+
+    assert store.add(first, "d1", "alice") == []
+    mtime_ns = first.stat().st_mtime_ns
+    others = store.add(second, "d1", "bob")
+
+    assert [ref["path"] for ref in others] == [str(first)]
+    assert os.path.samefile(first, second)
+    # 重复上传不修改共享inode的mtime
+    assert first.stat().st_mtime_ns == mtime_ns
+    assert store.uploaded_at(second) >= store.uploaded_at(first)
+    assert store.get_stats()["refs"] == 2
+
+
+def test_release_removes_blob_with_last_reference(tmp_path):
+    store = _store(tmp_path)
+    first = _upload(tmp_path, "a.mp4")
+    second = _upload(tmp_path, "b.mp4")
+    store.add(first, "d1", "alice")
+    store.add(second, "d1", "alice")
+    blob_path = tmp_path / "blobs" / "d1"[:2] / "d1.mp4"
+
+    assert store.release(first)
+    assert blob_path.exists()
+    assert store.release(second)
+    assert not blob_path.exists()
+    assert not store.release(second)
+    assert store.get_stats()["blobs"] == 0
+
+
+def test_batched_release_is_saved_by_prune(tmp_path):
+    store = _store(tmp_path)
+    paths = [_upload(tmp_path, f"{i}.mp4", bytes([i])) for i in range(3)]
+    for i, path in enumerate(paths):
+        store.add(path, f"d{i}", "alice")
+
+    for path in paths[:2]:
+        path.unlink()
+        store.release(path, save=False)
+    paths[2].unlink()  # 未经release删除的文件由prune清理
+    assert store.prune() == 1
+
+    reloaded = _store(tmp_path)
+    assert reloaded.get_stats()["blobs"] == 0
+    assert reloaded.uploaded_at(paths[0]) is None
+
+
+def test_readding_path_with_new_content_releases_old_blob(tmp_path):
+    store = _store(tmp_path)
+    path = _upload(tmp_path, "a.mp4")
+    store.add(path, "d1", "alice")
+    store.add(path, "d1", "alice")
+    assert len(store.get_refs("d1")) == 1
+
+    path.unlink()
+    path.write_bytes(b"other")
+    store.add(path, "d2", "alice")
+    assert store.get_refs("d1") == []
+    assert len(store.get_refs("d2")) == 1
@@ -0,0 +1,67 @@
+import time
+
+from services import video_service as video_service_module
+from services.job_checkpoint import JobCheckpoint
+from services.task_service import INTERRUPTED_ERROR, Task, TaskQueue, TaskStatus, TaskType
+from services.video_service import VideoService
+
+
+def _interrupted_queue(tmp_path, monkeypatch):
+    """重启后的任务队列：执行中的任务已被标记为中断失败"""
+    monkeypatch.setattr(TaskQueue, "load_tasks", lambda self: None)
+    tasks = TaskQueue()
+    tasks.task_db_path = tmp_path / "tasks.json"
+    for task_id, task_type in (("local-1", TaskType.LOCAL_VIDEO_PROCESSING), ("queue-1", TaskType.VIDEO_GENERATION)):
+        task = Task(task_id, task_type, {}, "alice")
+        task.status = TaskStatus.FAILED
+        task.error = INTERRUPTED_ERROR
+        tasks.completed_tasks[task_id] = task
+    return tasks
+
+
+def test_interrupted_segmented_job_resumes(tmp_path, monkeypatch):
+    job_dir = tmp_path / "jobs"
+    video = tmp_path / "model.mp4"
+    audio = tmp_path / "audio.wav"
+    video.write_bytes(b"v")
+    audio.write_bytes(b"a")
+    JobCheckpoint(job_dir / "key").set_job({
+        "video_path": str(video), "audio_path": str(audio), "task_id": "local-1",
+        "queue_task_id": "queue-1", "username": "alice", "cache_key": "key"
+    })
+    # 失败后清除了任务参数的工作目录不续跑
+    JobCheckpoint(job_dir / "failed").set_job(None)
+
+    tasks = _interrupted_queue(tmp_path, monkeypatch)
+    monkeypatch.setattr(video_service_module, "VIDEO_JOB_DIR", job_dir)
+    monkeypatch.setattr(video_service_module, "task_queue", tasks)
+    service = VideoService.__new__(VideoService)
+    started = []
+    service._process_large_video = lambda *args: started.append(args)
+
+    service.resume_interrupted_jobs()
+    deadline = time.monotonic() + 5
+    while not started and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert started == [(video, audio, "local-1", "alice", "key", "queue-1")]
+    assert set(tasks.external_tasks) == {"local-1", "queue-1"}
+    assert tasks.find_task("queue-1").status == TaskStatus.PROCESSING
+    assert tasks.find_task("queue-1").error is None
+
+
+def test_job_with_missing_inputs_is_dropped(tmp_path, monkeypatch):
+    job_dir = tmp_path / "jobs"
+    checkpoint = JobCheckpoint(job_dir / "key")
+    checkpoint.set_job({
+        "video_path": str(tmp_path / "gone.mp4"), "audio_path": str(tmp_path / "gone.wav"),
+        "task_id": "local-1", "queue_task_id": None, "username": "alice", "cache_key": None
+    })
+    tasks = _interrupted_queue(tmp_path, monkeypatch)
+    monkeypatch.setattr(video_service_module, "VIDEO_JOB_DIR", job_dir)
+    monkeypatch.setattr(video_service_module, "task_queue", tasks)
+
+    VideoService.__new__(VideoService).resume_interrupted_jobs()
+
+    assert JobCheckpoint(job_dir / "key").job is None
+    assert tasks.find_task("local-1").status == TaskStatus.FAILED
@@ -0,0 +1,86 @@
+import os
+
+from services.media_catalog import MediaCatalog
+
+
+def _touch_dir(directory, step):
+    # 目录mtime精度可能较粗，显式推进以触发刷新
+    st = os.stat(directory)
+    os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + step * 1_000_000_000))
+
+
+class _Describe:
+    def __init__(self, duration=1.0):
+        self.calls = []
+        self.duration = duration
+
+    def __call__(self, path):
+        self.calls.append(path.name)
+        return {"name": path.name, "duration": self.duration}
+
+
+def test_unchanged_directory_is_served_from_cache(tmp_path):
+    catalog = MediaCatalog()
+    (tmp_path / "a.mp4").write_bytes(b"a")
+    (tmp_path / "notes.txt").write_bytes(b"x")
+    describe = _Describe()
+
+    assert [info["name"] for info in catalog.list_infos(tmp_path, describe)] == ["a.mp4"]
+    assert catalog.list_infos(tmp_path, describe) == [{"name": "a.mp4", "duration": 1.0}]
+    assert describe.calls == ["a.mp4"]
+    assert catalog.get_stats()["rescans"] == 1
+
+
+def test_refresh_describes_only_added_and_replaced_files(tmp_path):
+    catalog = MediaCatalog()
+    (tmp_path / "a.mp4").write_bytes(b"a")
+    (tmp_path / "b.mp4").write_bytes(b"b")
+    describe = _Describe()
+    catalog.list_infos(tmp_path, describe)
+
+    (tmp_path / "c.mp4").write_bytes(b"c")
+    replacement = tmp_path / "b.tmp"
+    replacement.write_bytes(b"bb")
+    os.replace(replacement, tmp_path / "b.mp4")
+    (tmp_path / "a.mp4").unlink()
+    _touch_dir(tmp_path, 1)
+    describe.calls.clear()
+
+    names = [info["name"] for info in catalog.list_infos(tmp_path, describe)]
+
+    assert names == ["b.mp4", "c.mp4"]
+    assert sorted(describe.calls) == ["b.mp4", "c.mp4"]
+
+
+def test_invalidate_and_discard(tmp_path):
+    catalog = MediaCatalog()
+    (tmp_path / "a.mp4").write_bytes(b"a")
+    describe = _Describe()
+    catalog.list_infos(tmp_path, describe)
+
+    catalog.invalidate(tmp_path / "a.mp4")
+    catalog.list_infos(tmp_path, describe)
+    assert describe.calls == ["a.mp4", "a.mp4"]
+
+    catalog.discard(tmp_path / "a.mp4")
+    assert catalog.list_names(tmp_path) == []
+
+
+def test_failed_or_partial_infos_are_not_cached(tmp_path):
+    catalog = MediaCatalog()
+    (tmp_path / "a.mp4").write_bytes(b"a")
+    (tmp_path / "b.mp4").write_bytes(b"b")
+    results = {"a.mp4": None, "b.mp4": {"name": "b.mp4", "duration": None}}
+    calls = []
+
+    def describe(path):
+        calls.append(path.name)
+        return results[path.name]
+
+    assert catalog.list_infos(tmp_path, describe) == [{"name": "b.mp4", "duration": None}]
+
+    results.update({"a.mp4": {"name": "a.mp4", "duration": 2.0}, "b.mp4": {"name": "b.mp4", "duration": 3.0}})
+    infos = catalog.list_infos(tmp_path, describe)
+
+    assert [info["duration"] for info in infos] == [2.0, 3.0]
+    assert sorted(calls) == ["a.mp4", "a.mp4", "b.mp4", "b.mp4"]
@@ -0,0 +1,52 @@
+import json
+
+from services.probe_cache import ProbeCache
+
+
+def _cache(tmp_path, save_delay=60.0):
+    return ProbeCache(tmp_path / "probe_cache.json", max_entries=16, save_delay=save_delay)
+
+
+def test_saves_are_batched_until_flush(tmp_path):
+    cache = _cache(tmp_path)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.mp4"
+        path.write_bytes(b"x" * i)
+        cache.set_digest(path, f"d{i}")
+        paths.append(path)
+
+    assert not cache.index_path.exists()
+    cache.flush()
+
+    data = json.loads(cache.index_path.read_text())
+    assert [data[str(path)]["sha256"] for path in paths] == ["d0", "d1", "d2"]
+    assert cache.save_timer is None
+
+
+def test_keyframes_stay_in_memory(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    path = tmp_path / "a.mp4"
+    path.write_bytes(b"a")
+    monkeypatch.setattr(cache, "_run_keyframe_probe", lambda p: [0.0, 2.0, 4.0])
+
+    assert cache.get_keyframe_interval(path) == 2.0
+    cache.set_digest(path, "d")
+    cache.flush()
+
+    assert json.loads(cache.index_path.read_text())[str(path)] == {
+        "size": 1, "mtime_ns": path.stat().st_mtime_ns, "sha256": "d"
+    }
+    assert cache.get_keyframes(path) == [0.0, 2.0, 4.0]
+
+
+def test_delayed_save_writes_index(tmp_path):
+    cache = _cache(tmp_path, save_delay=0.01)
+    path = tmp_path / "a.mp4"
+    path.write_bytes(b"a")
+    cache.set_digest(path, "d")
+
+    timer = cache.save_timer
+    timer.join(1)
+
+    assert json.loads(cache.index_path.read_text())[str(path)]["sha256"] == "d"
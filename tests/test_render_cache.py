@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from services import video_service as video_service_module
+from services.render_cache import RenderCache
+from services.video_service import VideoService
+
+
+def _fake_ffmpeg(cmd, category="segment", job_id=None, **kwargs):
+    """模拟 ffmpeg -y：原地截断并写入输出文件，内容为concat列表"""
+    concat_file = Path(cmd[cmd.index("-i") + 1])
+    with open(cmd[-1], "wb") as f:
+        f.write(concat_file.read_bytes())
+
+
+def test_rerender_same_output_keeps_cached_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_service_module.ffmpeg_runner, "run", _fake_ffmpeg)
+    cache = RenderCache(tmp_path / "cache", max_bytes=1 << 30)
+    service = VideoService.__new__(VideoService)
+    output_path = tmp_path / "user" / "model-r.mp4"
+    output_path.parent.mkdir()
+
+    concat_file = tmp_path / "concat.txt"
+    concat_file.write_bytes(b"audio-a")
+    service._merge_video_segments(concat_file, output_path)
+    cache.store("key-a", output_path)
+
+    # 相同模特、不同音频再次渲染到同一路径
+    concat_file.write_bytes(b"audio-b")
+    service._merge_video_segments(concat_file, output_path)
+    cache.store("key-b", output_path)
+
+    fetched_a = tmp_path / "fetched-a.mp4"
+    fetched_b = tmp_path / "fetched-b.mp4"
+    assert cache.fetch("key-a", fetched_a)
+    assert cache.fetch("key-b", fetched_b)
+    assert fetched_a.read_bytes() == b"audio-a"
+    assert fetched_b.read_bytes() == b"audio-b"
+    assert output_path.read_bytes() == b"audio-b"
+    assert not list(output_path.parent.glob("*.tmp.mp4"))
@@ -0,0 +1,41 @@
+from config import SEGMENT_MAX_SECONDS
+from services.segment_planner import SegmentCostModel, plan_segments
+
+
+def test_one_segment_per_worker_when_overhead_is_small():
+    plan = plan_segments(600.0, 4, overhead=5.0, cost_per_second=1.0)
+
+    assert plan["segment_count"] == 4
+    assert plan["boundaries"][0] == (0.0, 150.0)
+    assert plan["boundaries"][-1] == (450.0, 600.0)
+    assert plan["estimated_seconds"] == 155.0
+
+
+def test_segments_are_aligned_to_keyframes():
+    plan = plan_segments(100.0, 4, keyframe_interval=7.0, overhead=1.0, cost_per_second=1.0)
+
+    assert plan["segment_length"] == 28.0
+    assert [end for _, end in plan["boundaries"]] == [28.0, 56.0, 84.0, 100.0]
+
+
+def test_segment_length_is_capped():
+    plan = plan_segments(1000.0, 1, overhead=5.0, cost_per_second=1.0)
+
+    assert plan["segment_length"] <= SEGMENT_MAX_SECONDS
+    assert plan["workers"] == 1
+    assert plan["boundaries"][-1][1] == 1000.0
+
+
+def test_empty_video_has_no_segments():
+    assert plan_segments(0.0, 4)["boundaries"] == []
+
+
+def test_cost_model_fits_overhead_and_rate():
+    model = SegmentCostModel()
+    for length in (10.0, 20.0, 30.0, 40.0):
+        model.record(length, 2.0 + 0.5 * length)
+
+    overhead, cost = model.estimate()
+
+    assert round(overhead, 6) == 2.0
+    assert round(cost, 6) == 0.5
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from config import STATUS_POLL_MAX_INTERVAL
+
+from services.status_poller import (
+    StatusPoller, _TrackedJob, STATUS_DONE, STATUS_FAILED, STATUS_PROCESSING, SUCCESS_CODE
+)
+
+
+class _FakeQueue:
+    def __init__(self):
+        self.updates = []
+
+    def update_task_progress(self, task_id, progress, result=None, error=None):
+        self.updates.append((task_id, progress, result, error))
+
+
+def _poller(fetch_status, task_queue=None):
+    poller = StatusPoller(fetch_status, task_queue=task_queue, max_errors=2)
+    poller.running = True  # 不启动后台线程，测试中手动轮询
+    return poller
+
+
+def _poll_until_done(poller, code, times):
+    for _ in range(times):
+        job = poller.jobs.get(code)
+        if job is None:
+            break
+        poller._poll_one(job)
+
+
+def test_transport_errors_keep_polling():
+    def fetch_status(code):
+        raise ConnectionError("backend restarting")
+
+    poller = _poller(fetch_status)
+    poller.track("code-1", "task-1")
+
+    _poll_until_done(poller, "code-1", 20)
+
+    assert poller.is_tracking("code-1")
+    assert poller.jobs["code-1"].interval == STATUS_POLL_MAX_INTERVAL
+
+
+def test_give_up_after_deadline_reports_failure():
+    task_queue = _FakeQueue()
+    finished = []
+    poller = _poller(lambda code: {"code": SUCCESS_CODE, "data": {"status": STATUS_PROCESSING}}, task_queue)
+    poller.deadline = 0.0
+    poller.add_listener(lambda code, status_data: finished.append((code, status_data)))
+    poller.track("code-1", "task-1")
+
+    _poll_until_done(poller, "code-1", 1)
+
+    assert not poller.is_tracking("code-1")
+    status = poller.wait("code-1", timeout=0.1)
+    assert status["code"] == SUCCESS_CODE
+    assert status["data"]["status"] == STATUS_FAILED
+    assert not poller.is_tracking("code-1")  # 已结束的任务等待时不重新跟踪
+    assert [code for code, _ in finished] == ["code-1"]
+    assert task_queue.updates[-1][0] == "task-1"
+    assert task_queue.updates[-1][3]
+
+
+def test_give_up_on_persistent_error_code():
+    poller = _poller(lambda code: {"code": 404, "msg": "任务不存在"})
+    poller.track("code-2")
+
+    _poll_until_done(poller, "code-2", 5)
+
+    status = poller.wait("code-2", timeout=0.1)
+    assert status["data"]["status"] == STATUS_FAILED
+    assert status["data"]["msg"] == "任务不存在"
+
+
+def test_track_listener_called_once_per_code():
+    tracked = []
+    poller = _poller(lambda code: {})
+    poller.add_track_listener(tracked.append)
+    poller.track("code-3")
+    poller.track("code-3", "task-3")
+    assert tracked == ["code-3"]
+    assert isinstance(poller.jobs["code-3"], _TrackedJob)
+
+
+def test_tracked_code_is_served_from_last_poll():
+    calls = []
+
+    def fetch_status(code):
+        calls.append(code)
+        return {"code": SUCCESS_CODE, "data": {"status": STATUS_PROCESSING, "progress": 10}}
+
+    poller = _poller(fetch_status)
+    poller.track("code-4")
+    poller._poll_one(poller.jobs["code-4"])
+
+    # 超过TTL后仍返回最近一次轮询结果，不再同步查询
+    cached_at, status_data = poller.cache["code-4"]
+    poller.cache["code-4"] = (cached_at - 60, status_data)
+    for _ in range(10):
+        assert poller.get_status("code-4")["data"]["progress"] == 10
+    assert calls == ["code-4"]
+
+
+def test_concurrent_misses_share_one_fetch():
+    release = threading.Event()
+    calls = []
+
+    def fetch_status(code):
+        calls.append(code)
+        release.wait(5)
+        return {"code": SUCCESS_CODE, "data": {"status": STATUS_DONE}}
+
+    poller = _poller(fetch_status)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(poller.get_status("code-5"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["code-5"]
+    assert [status["data"]["status"] for status in results] == [STATUS_DONE] * 4
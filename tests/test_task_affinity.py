@@ -0,0 +1,33 @@
+from services.task_service import Task, TaskQueue, TaskType
+
+
+def _task(task_id, key):
+    return Task(task_id, TaskType.AUDIO_SYNTHESIS, {}, "alice", affinity_key=key)
+
+
+def _queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(TaskQueue, "load_tasks", lambda self: None)
+    tasks = TaskQueue()
+    tasks.task_db_path = tmp_path / "tasks.json"
+    return tasks
+
+
+def test_affinity_is_recorded_only_when_task_starts(tmp_path, monkeypatch):
+    tasks = _queue(tmp_path, monkeypatch)
+    tasks.last_affinity_key = "voice-a"
+    tasks.task_queue.put(_task("t1", "voice-b"))
+    tasks.task_queue.put(_task("t2", "voice-a"))
+
+    chosen = tasks._next_task()
+
+    # 资源不足放回队列时，亲和状态不应变化
+    assert chosen.task_id == "t2"
+    assert tasks.last_affinity_key == "voice-a"
+    assert tasks.affinity_stats == {"switches": 0, "switches_saved": 0}
+
+    tasks._record_affinity(chosen)
+    assert tasks.affinity_stats["switches_saved"] == 1
+
+    tasks._record_affinity(tasks._next_task())
+    assert tasks.last_affinity_key == "voice-b"
+    assert tasks.affinity_stats == {"switches": 1, "switches_saved": 1}
@@ -0,0 +1,61 @@
+import time
+
+from services.task_service import DEFERRED, Task, TaskQueue, TaskStatus, TaskType
+
+
+def _queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(TaskQueue, "load_tasks", lambda self: None)
+    tasks = TaskQueue(max_concurrent_tasks=1)
+    tasks.task_db_path = tmp_path / "tasks.json"
+    return tasks
+
+
+def test_external_tasks_do_not_take_scheduling_slots(tmp_path, monkeypatch):
+    tasks = _queue(tmp_path, monkeypatch)
+    tasks.register_external_task(Task("local", TaskType.LOCAL_VIDEO_PROCESSING, {}, "alice"))
+
+    assert tasks.active_tasks == {}
+    assert tasks.find_task("local").status == TaskStatus.PROCESSING
+    assert tasks.get_task("local") is tasks.find_task("local")
+    assert tasks.get_queue_status()["active_count"] == 1
+
+    assert tasks.update_task_details("local", 50.0, segments_done=1)
+    assert tasks.update_task_progress("local", 100.0, result={"video_path": "out.mp4"})
+
+    assert tasks.external_tasks == {}
+    assert tasks.find_task("local").status == TaskStatus.COMPLETED
+
+
+def test_deferred_callback_frees_the_worker(tmp_path, monkeypatch):
+    tasks = _queue(tmp_path, monkeypatch)
+    ran = []
+
+    def submit(task):
+        ran.append(task.task_id)
+        return DEFERRED
+
+    def quick(task):
+        ran.append(task.task_id)
+        return {"ok": True}
+
+    tasks.add_task(Task("render", TaskType.VIDEO_GENERATION, {}, "alice", callback=submit))
+    tasks.add_task(Task("tts", TaskType.AUDIO_SYNTHESIS, {}, "alice", callback=quick))
+    # 只启动调度线程
+    tasks.running = True
+    tasks.worker_thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while tasks.find_task("tts") is None or tasks.find_task("tts").status != TaskStatus.COMPLETED:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        tasks.running = False
+        tasks.worker_thread.join(5)
+
+    assert ran == ["render", "tts"]
+    assert tasks.find_task("render").status == TaskStatus.PROCESSING
+    assert "render" in tasks.external_tasks
+
+    # 外部完成事件结束任务
+    tasks.update_task_progress("render", 100.0, result={"code": "c1"})
+    assert tasks.find_task("render").status == TaskStatus.COMPLETED
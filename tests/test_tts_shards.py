@@ -0,0 +1,25 @@
+from services.tts_shards import split_text
+
+
+def test_short_text_stays_in_one_shard():
+    assert split_text('你好。今天天气很好。', 180) == ['你好。今天天气很好。']
+
+
+def test_sentences_are_packed_up_to_max_chars():
+    text = '一二三。四五六七。八九。'
+
+    shards = split_text(text * 2, 10)
+
+    assert shards == ['一二三。四五六七。', '八九。一二三。', '四五六七。八九。']
+    assert ''.join(shards) == text * 2
+    assert all(len(shard) <= 10 for shard in shards)
+
+
+def test_overlong_sentence_is_split_at_clauses_then_hard_cut():
+    shards = split_text('甲' * 15 + '，' + '乙' * 7 + '。丙。', 12)
+
+    assert shards == ['甲' * 12, '甲' * 3 + '，' + '乙' * 7 + '。', '丙。']
+
+
+def test_whitespace_between_sentences_is_kept():
+    assert split_text('Hello there! How are you?\n\n', 100) == ['Hello there! How are you?']
@@ -0,0 +1,18 @@
+from services.voice_cache import VoiceModelCache
+
+
+def _result(url):
+    return {"asr_format_audio_url": url, "reference_audio_text": "你好"}
+
+
+def test_deleted_reference_invalidates_training_result(tmp_path):
+    cache = VoiceModelCache(tmp_path / "voice_models.json")
+    cache.put("alice/d1", _result("/code/data/processed_audio/20260101_a.wav"))
+    cache.put("alice/d2", _result("processed_audio\\20260101_b.wav"))
+
+    assert cache.invalidate_references(["20260101_b.wav", "unrelated.wav"]) == 1
+
+    assert cache.get("alice/d1")
+    assert cache.get("alice/d2") is None
+    # 索引已保存
+    assert VoiceModelCache(tmp_path / "voice_models.json").get("alice/d2") is None